@@ -1,23 +1,37 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_restx import Api
 import os
 
 db = SQLAlchemy()
+migrate = Migrate()
 
-def create_app():
+def create_app(config_name=None):
     app = Flask(__name__)
     
-    # 配置
-    app.config['SECRET_KEY'] = 'your-secret-key-here'
-    import os
-    db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'rd_cost_system.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 配置：按环境加载 config/config.py 中的配置类
+    from config.config import config
+    from app.database import build_engine_options, register_sqlite_profile, register_fork_handler
+    from app.middlewares.auth import register_auth_context
+    
+    config_name = config_name or os.environ.get('FLASK_ENV') or 'default'
+    app.config.from_object(config.get(config_name, config['default']))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+    
+    # 响应JSON使用 orjson 编码（除指数浮点数写法外与默认 provider 逐字节一致，见 app.json_provider）
+    from app.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
     
     # 初始化扩展
     db.init_app(app)
+    register_sqlite_profile(app, db)
+    register_fork_handler(app, db)
+    register_auth_context(app)
+    # SQLite不支持大部分ALTER TABLE，迁移统一使用batch模式（重建表）
+    migrations_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+    migrate.init_app(app, db, directory=migrations_dir, render_as_batch=True)
     CORS(app, supports_credentials=True)
     api = Api(app, doc='/apidocs/', title='研发成本统计系统 API', version='1.0')
     
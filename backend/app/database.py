@@ -0,0 +1,131 @@
+"""
+数据库引擎配置
+
+根据配置类生成 SQLAlchemy 引擎参数（连接池、预检测、语句超时），
+为 SQLite 设置连接级 PRAGMA 并识别锁冲突错误，并在进程 fork 后丢弃继承自父进程的连接；
+另提供迁移脚本中在线创建/删除索引的工具。
+"""
+import os
+import sqlite3
+import weakref
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.engine import make_url
+
+def build_engine_options(config):
+    """根据配置生成 SQLALCHEMY_ENGINE_OPTIONS"""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return options
+
+    backend = make_url(uri).get_backend_name()
+    if backend == 'sqlite':
+        # SQLite 使用默认连接池，连接参数见 SQLite 专用配置
+        return options
+
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT', 0)
+    if statement_timeout:
+        connect_args = dict(options.get('connect_args') or {})
+        if backend == 'postgresql':
+            connect_args.setdefault('options', f'-c statement_timeout={statement_timeout}')
+        elif backend in ('mysql', 'mariadb'):
+            connect_args.setdefault('init_command', f'SET SESSION max_execution_time={statement_timeout}')
+        options['connect_args'] = connect_args
+
+    return options
+
+# 各应用的数据库引擎（弱引用，不延长应用生命周期），fork 后在子进程中丢弃其连接池
+_fork_engines = weakref.WeakSet()
+
+def _dispose_engines_after_fork():
+    for engine in list(_fork_engines):
+        engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+def register_fork_handler(app, db):
+    """fork 后在子进程中丢弃继承的连接池，避免多个进程共享同一连接（fork 处理函数在模块加载时只注册一次）"""
+    with app.app_context():
+        _fork_engines.update(db.engines.values())
+
+DATABASE_BUSY_MESSAGE = '数据库繁忙，请稍后重试'
+
+def is_database_locked(error):
+    """判断是否为 SQLite 锁冲突错误（busy_timeout 内未获得锁），调用方回滚后返回503"""
+    error = getattr(error, 'orig', error)
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def _set_sqlite_pragmas(dbapi_connection, config):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT', 5000))}")
+        cursor.execute(f"PRAGMA journal_mode={config.get('SQLITE_JOURNAL_MODE', 'WAL')}")
+        cursor.execute(f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+        cursor.execute(f"PRAGMA cache_size={int(config.get('SQLITE_CACHE_SIZE', -64000))}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 268435456))}")
+        cursor.execute(f"PRAGMA temp_store={config.get('SQLITE_TEMP_STORE', 'MEMORY')}")
+    finally:
+        cursor.close()
+
+def register_sqlite_profile(app, db):
+    """为 SQLite 引擎注册连接 PRAGMA
+
+    锁冲突由 busy_timeout 等待；超时后不在语句级重试（每次重试都会再等待一个 busy_timeout，
+    且无法恢复事务内的快照冲突），由调用方回滚并返回503，客户端重试整个请求。
+    """
+    config = app.config
+
+    def on_connect(dbapi_connection, connection_record):
+        _set_sqlite_pragmas(dbapi_connection, config)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != 'sqlite':
+                continue
+            event.listen(engine, 'connect', on_connect)
+
+def _index_exists(bind, table_name, index_name):
+    return any(index['name'] == index_name for index in sa_inspect(bind).get_indexes(table_name))
+
+def create_index_online(index_name, table_name, columns, unique=False):
+    """在迁移中创建索引，尽量不阻塞线上读写
+
+    PostgreSQL 使用 CREATE INDEX CONCURRENTLY（在独立的自动提交块中执行），
+    MySQL/InnoDB 默认在线建索引，SQLite 直接建索引（不需要重建表）。
+    每个索引单独执行，已存在的索引会被跳过，可重复运行。
+    """
+    from alembic import op
+
+    bind = op.get_bind()
+    if _index_exists(bind, table_name, index_name):
+        return
+
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(index_name, table_name, columns, unique=unique, postgresql_concurrently=True)
+    else:
+        op.create_index(index_name, table_name, columns, unique=unique)
+
+def drop_index_online(index_name, table_name):
+    """在迁移中删除索引（create_index_online 的逆操作）"""
+    from alembic import op
+
+    bind = op.get_bind()
+    if not _index_exists(bind, table_name, index_name):
+        return
+
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+    else:
+        op.drop_index(index_name, table_name=table_name)
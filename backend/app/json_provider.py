@@ -0,0 +1,90 @@
+"""
+JSON 序列化
+
+使用 orjson 编码响应（未安装时退回标准库），原生处理 date、time、datetime 和 Decimal：
+日期时间输出 ISO 格式（与模型 to_dict 的输出相同，而非 Flask 默认的 HTTP 日期格式），
+Decimal 与 Flask 默认一致输出字符串。键排序、紧凑/缩进格式、结尾换行和非ASCII字符的 \\uXXXX 转义
+（ensure_ascii，默认开启）与 Flask 默认 provider 相同，字节差异只有浮点数写法（解析结果相同，见 test_json_provider.py）：
+绝对值 >= 1e16 或 < 1e-4 的浮点数写法不同，如 1e16 与 1e+16、7e-7 与 7e-07、0.000025 与 2.5e-05。
+配置 app.json.ensure_ascii = False 时非ASCII字符直接输出 UTF-8。
+"""
+import dataclasses
+import decimal
+import json
+import re
+import uuid
+from datetime import date, time
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+# json.dumps(ensure_ascii=True) 转义的字符：DEL 及全部非ASCII字符
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+_NON_ASCII_BYTES = re.compile(b'[\x7f-\xff]')
+
+def ascii_escape(text):
+    """将 JSON 文本中的非ASCII字符转义为 \\uXXXX（BMP以外的字符使用代理对），与 json.dumps 一致"""
+    return _NON_ASCII.sub(lambda match: json.dumps(match.group())[1:-1], text)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """基于 orjson 的 JSON provider"""
+    
+    def _orjson_options(self, indent):
+        """与 sort_keys/缩进设置对应的 orjson 选项"""
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    @staticmethod
+    def default(o):
+        """orjson 与标准库共用的类型转换（orjson 原生处理日期时间，这里供标准库回退使用）"""
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        if isinstance(o, (date, time)):
+            return o.isoformat()
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        if dataclasses.is_dataclass(o):
+            return dataclasses.asdict(o)
+        if hasattr(o, '__html__'):
+            return str(o.__html__())
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+    
+    def encode(self, obj, indent=False):
+        """序列化为 bytes；orjson 不支持的内容（非字符串键、超出64位的整数等）使用标准库
+
+        orjson 只输出 UTF-8：ensure_ascii 时若输出含非ASCII字符，再转义为 \\uXXXX（纯ASCII内容无额外开销）。
+        """
+        if orjson is not None:
+            try:
+                content = orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                if self.ensure_ascii and _NON_ASCII_BYTES.search(content):
+                    content = ascii_escape(content.decode('utf-8')).encode('ascii')
+                return content
+        
+        if indent:
+            content = super().dumps(obj, indent=2)
+        else:
+            content = super().dumps(obj, separators=(',', ':'))
+        return content.encode('utf-8')
+    
+    def dumps(self, obj, **kwargs):
+        """序列化为字符串；不带参数时为紧凑格式，indent=2 为缩进格式，其他参数使用标准库"""
+        if not kwargs or kwargs == {'separators': (',', ':')}:
+            return self.encode(obj).decode('utf-8')
+        if kwargs == {'indent': 2}:
+            return self.encode(obj, indent=True).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        """生成 JSON 响应，直接写入编码后的 bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.encode(obj, indent=indent) + b'\n', mimetype=self.mimetype)
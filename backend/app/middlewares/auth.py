@@ -1,16 +1,55 @@
 from functools import wraps
-from flask import request, jsonify, session
+from flask import request, jsonify, session, g
+from sqlalchemy.orm import selectinload
+from app import db
 from app.models import User
+from app.services.permission_cache import get_user_permissions
+from app.services.auth_tokens import verify_access_token
+
+# 鉴权过程中缓存在 g 上的请求内数据
+_REQUEST_AUTH_KEYS = ('token_user_id', 'user_permissions', 'current_user', 'current_user_id')
+
+def register_auth_context(app):
+    """每个请求开始时清除 g 上的鉴权缓存：多个请求共用同一应用上下文（测试、脚本）时 g 不随请求重建"""
+    @app.before_request
+    def reset_auth_context():
+        for key in _REQUEST_AUTH_KEYS:
+            g.pop(key, None)
+
+def _get_bearer_token():
+    """从Authorization请求头中获取Bearer令牌"""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[7:].strip()
+    return None
+
+def get_current_user_id():
+    """获取当前请求的用户ID：优先使用Bearer令牌，其次使用Session"""
+    if 'token_user_id' in g:
+        return g.token_user_id
+    
+    token = _get_bearer_token()
+    if token:
+        # 令牌内嵌角色和权限，校验通过后直接作为本请求的权限集合
+        user_permissions = verify_access_token(token)
+        g.token_user_id = user_permissions.user_id if user_permissions else None
+        if user_permissions:
+            g.user_permissions = user_permissions
+        return g.token_user_id
+    
+    return session.get('user_id')
 
 def login_required(fn):
-    """Session认证装饰器"""
+    """登录认证装饰器（Session或Bearer令牌）"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
+        user_id = get_current_user_id()
+        
         # 添加调试日志
-        print(f"DEBUG: Session user_id: {session.get('user_id')}")
+        print(f"DEBUG: Current user_id: {user_id}")
         
-        if 'user_id' not in session:
-            print("DEBUG: No user_id in session")
+        if user_id is None:
+            print("DEBUG: No user_id in session or token")
             return jsonify({'message': '请先登录'}), 401
         
         return fn(*args, **kwargs)
@@ -21,24 +60,23 @@ def role_required(role_name):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
+            user_id = get_current_user_id()
+            
             # 添加调试日志
-            print(f"DEBUG: Session user_id: {session.get('user_id')}")
+            print(f"DEBUG: Current user_id: {user_id}")
             
-            if 'user_id' not in session:
-                print("DEBUG: No user_id in session")
+            if user_id is None:
+                print("DEBUG: No user_id in session or token")
                 return jsonify({'message': '请先登录'}), 401
             
-            user_id = session['user_id']
-            user = User.query.get(user_id)
+            user_permissions = get_user_permissions(user_id)
             
-            if not user:
+            if not user_permissions:
                 print(f"DEBUG: User not found for id: {user_id}")
                 return jsonify({'message': '用户不存在'}), 401
             
-            print(f"DEBUG: User found: {user.username}, roles: {[role.name for role in user.roles]}")
-            
-            if not user.has_role(role_name):
-                print(f"DEBUG: User {user.username} does not have role: {role_name}")
+            if not user_permissions.has_role(role_name):
+                print(f"DEBUG: User {user_id} does not have role: {role_name}")
                 return jsonify({'message': '权限不足'}), 403
             return fn(*args, **kwargs)
         return wrapper
@@ -49,31 +87,35 @@ def permission_required(permission_name):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
+            user_id = get_current_user_id()
+            
             # 添加调试日志
-            print(f"DEBUG: Session user_id: {session.get('user_id')}")
+            print(f"DEBUG: Current user_id: {user_id}")
             
-            if 'user_id' not in session:
-                print("DEBUG: No user_id in session")
+            if user_id is None:
+                print("DEBUG: No user_id in session or token")
                 return jsonify({'message': '请先登录'}), 401
             
-            user_id = session['user_id']
-            user = User.query.get(user_id)
+            user_permissions = get_user_permissions(user_id)
             
-            if not user:
+            if not user_permissions:
                 print(f"DEBUG: User not found for id: {user_id}")
                 return jsonify({'message': '用户不存在'}), 401
             
-            if not user.has_permission(permission_name):
-                print(f"DEBUG: User {user.username} does not have permission: {permission_name}")
+            if not user_permissions.has_permission(permission_name):
+                print(f"DEBUG: User {user_id} does not have permission: {permission_name}")
                 return jsonify({'message': '权限不足'}), 403
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
 def get_current_user():
-    """获取当前用户"""
-    if 'user_id' not in session:
+    """获取当前用户（同一请求内只加载一次，并预加载角色）"""
+    user_id = get_current_user_id()
+    if user_id is None:
         return None
     
-    user_id = session['user_id']
-    return User.query.get(user_id) 
\ No newline at end of file
+    if g.get('current_user_id') != user_id:
+        g.current_user = db.session.get(User, user_id, options=[selectinload(User.roles)])
+        g.current_user_id = user_id
+    return g.current_user 
\ No newline at end of file
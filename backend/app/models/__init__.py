@@ -1,8 +1,8 @@
-from app.models.user import User
+from app.models.user import User, UserRateHistory
 from app.models.role import Role, Permission
 from app.models.project import Project, ProjectMember
-from app.models.time_record import TimeRecord, WorkType
+from app.models.time_record import TimeRecord, WorkType, DailyWorkRollup
 from app.models.report import DailyReport, WeeklyReport
-from app.models.cost import CostCalculation, ProjectCost, CostReport
+from app.models.cost import CostCalculation, ProjectCost, CostReport, CostReportJob
 
-__all__ = ['User', 'Role', 'Permission', 'Project', 'ProjectMember', 'TimeRecord', 'WorkType', 'DailyReport', 'WeeklyReport', 'CostCalculation', 'ProjectCost', 'CostReport'] 
\ No newline at end of file
+__all__ = ['User', 'UserRateHistory', 'Role', 'Permission', 'Project', 'ProjectMember', 'TimeRecord', 'WorkType', 'DailyWorkRollup', 'DailyReport', 'WeeklyReport', 'CostCalculation', 'ProjectCost', 'CostReport', 'CostReportJob'] 
\ No newline at end of file
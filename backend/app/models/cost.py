@@ -1,9 +1,16 @@
-from datetime import datetime, date
+from datetime import datetime
 from app import db
+from app.models.fields import FieldSet, column, related, iso, number, wants, select_fields
 
 class CostCalculation(db.Model):
     """成本计算模型"""
     __tablename__ = 'cost_calculations'
+    __table_args__ = (
+        db.Index('uq_cost_calculations_user_project_date', 'user_id', 'project_id', 'calculation_date', unique=True),
+        db.Index('ix_cost_calculations_project_date', 'project_id', 'calculation_date'),
+        db.Index('ix_cost_calculations_date', 'calculation_date'),
+        db.Index('ix_cost_calculations_date_created', 'calculation_date', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -15,22 +22,37 @@ class CostCalculation(db.Model):
     calculation_method = db.Column(db.String(20), default='hourly')  # hourly, monthly
     notes = db.Column(db.Text)  # 备注
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关联关系
     user = db.relationship('User', backref='cost_calculations')
     project = db.relationship('Project', backref='cost_calculations')
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'user_id': column('user_id'),
+        'user_name': related('user', 'name'),
+        'project_id': column('project_id'),
+        'project_name': related('project', 'name'),
+        'calculation_date': column('calculation_date', iso),
+        'work_hours': column('work_hours', number),
+        'hourly_rate': column('hourly_rate', number),
+        'total_cost': column('total_cost', number),
+        'calculation_method': column('calculation_method'),
+        'notes': column('notes'),
+        'created_at': column('created_at', iso)
+    })
+    
     def __repr__(self):
         return f'<CostCalculation {self.user_id}:{self.project_id}:{self.calculation_date}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'user_id': self.user_id,
-            'user_name': self.user.name if self.user else None,
             'project_id': self.project_id,
-            'project_name': self.project.name if self.project else None,
             'calculation_date': self.calculation_date.isoformat() if self.calculation_date else None,
             'work_hours': float(self.work_hours) if self.work_hours else None,
             'hourly_rate': float(self.hourly_rate) if self.hourly_rate else None,
@@ -39,10 +61,20 @@ class CostCalculation(db.Model):
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'user_name'):
+            data['user_name'] = self.user.name if self.user else None
+        if wants(fields, 'project_name'):
+            data['project_name'] = self.project.name if self.project else None
+        return select_fields(data, fields)
 
 class ProjectCost(db.Model):
     """项目成本模型"""
     __tablename__ = 'project_costs'
+    __table_args__ = (
+        db.Index('uq_project_costs_project_period', 'project_id', 'calculation_period', 'period_start', 'period_end', unique=True),
+        db.Index('ix_project_costs_project_start_created', 'project_id', 'period_start', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -59,15 +91,30 @@ class ProjectCost(db.Model):
     # 关联关系
     project = db.relationship('Project', backref='project_costs')
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'project_id': column('project_id'),
+        'project_name': related('project', 'name'),
+        'calculation_period': column('calculation_period'),
+        'period_start': column('period_start', iso),
+        'period_end': column('period_end', iso),
+        'total_hours': column('total_hours', number),
+        'total_cost': column('total_cost', number),
+        'member_count': column('member_count'),
+        'cost_per_hour': column('cost_per_hour', number),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<ProjectCost {self.project_id}:{self.calculation_period}:{self.period_start}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'project_id': self.project_id,
-            'project_name': self.project.name if self.project else None,
             'calculation_period': self.calculation_period,
             'period_start': self.period_start.isoformat() if self.period_start else None,
             'period_end': self.period_end.isoformat() if self.period_end else None,
@@ -78,6 +125,10 @@ class ProjectCost(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'project_name'):
+            data['project_name'] = self.project.name if self.project else None
+        return select_fields(data, fields)
 
 class CostReport(db.Model):
     """成本报表模型"""
@@ -92,19 +143,37 @@ class CostReport(db.Model):
     total_cost = db.Column(db.Numeric(12, 2), default=0)  # 总成本
     total_hours = db.Column(db.Numeric(8, 2), default=0)  # 总工作时长
     average_cost_per_hour = db.Column(db.Numeric(8, 2), default=0)  # 平均每小时成本
-    report_data = db.Column(db.Text)  # JSON格式的详细数据
+    # 详细数据：压缩的列式JSON（见 services.report_payload），延迟加载，列表查询不读取
+    report_payload = db.deferred(db.Column(db.LargeBinary))
     generated_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关联关系
     generator = db.relationship('User', backref='generated_reports')
     
+    # 输出字段及其依赖的列/关联关系（详细数据不在其中，见 services.report_payload）
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'report_name': column('report_name'),
+        'report_type': column('report_type'),
+        'report_period': column('report_period'),
+        'period_start': column('period_start', iso),
+        'period_end': column('period_end', iso),
+        'total_cost': column('total_cost', number),
+        'total_hours': column('total_hours', number),
+        'average_cost_per_hour': column('average_cost_per_hour', number),
+        'generated_by': column('generated_by'),
+        'generator_name': related('generator', 'name'),
+        'created_at': column('created_at', iso)
+    })
+    
     def __repr__(self):
         return f'<CostReport {self.report_name}:{self.report_type}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'report_name': self.report_name,
             'report_type': self.report_type,
@@ -114,8 +183,51 @@ class CostReport(db.Model):
             'total_cost': float(self.total_cost) if self.total_cost else None,
             'total_hours': float(self.total_hours) if self.total_hours else None,
             'average_cost_per_hour': float(self.average_cost_per_hour) if self.average_cost_per_hour else None,
-            'report_data': self.report_data,
             'generated_by': self.generated_by,
-            'generator_name': self.generator.name if self.generator else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+        }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'generator_name'):
+            data['generator_name'] = self.generator.name if self.generator else None
+        return select_fields(data, fields)
+
+class CostReportJob(db.Model):
+    """成本报表生成任务（后台线程池执行）"""
+    __tablename__ = 'cost_report_jobs'
+    __table_args__ = (
+        # 进行中的任务持有 active_key（请求参数摘要），完成后置空，用于合并相同的进行中请求
+        db.Index('uq_cost_report_jobs_active_key', 'active_key', unique=True),
+        db.Index('ix_cost_report_jobs_requested_by_created', 'requested_by', 'created_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # 任务ID
+    request_key = db.Column(db.String(64), nullable=False)  # 请求参数摘要
+    active_key = db.Column(db.String(64))  # 进行中时等于 request_key
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 进度（0-100）
+    message = db.Column(db.String(500))  # 失败原因
+    parameters = db.Column(db.Text, nullable=False)  # JSON格式的报表参数
+    report_id = db.Column(db.Integer, db.ForeignKey('cost_reports.id'))  # 生成的报表
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)  # 排队或执行任务的进程定期更新的心跳时间
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CostReportJob {self.id}:{self.status}>'
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'report_id': self.report_id,
+            'requested_by': self.requested_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,200 @@
+"""
+模型输出字段
+
+各模型的 to_dict(fields) 输出全部字段，或 fields 指定的子集（select_fields）；
+未请求的关联字段不访问关联对象，避免逐条加载。
+
+FieldSet 声明每个字段依赖的列和关联关系，用于：
+- 解析 fields= 参数（未定义的字段返回400）；
+- ORM 查询只预加载所需字段用到的关联（load_options）；
+- 只读列表接口直接选取所需列（read_query），多对一关联属性通过外连接取得，
+  结果为 Row 元组，不构造 ORM 对象，按字段的输出转换生成字典；
+- 条件请求的校验值包含所引用的关联表（related_models）。
+"""
+from sqlalchemy.orm import joinedload, selectinload, aliased
+
+def iso(value):
+    """日期/时间转换为ISO格式字符串"""
+    return value.isoformat() if value else None
+
+def hour_minute(value):
+    """时间转换为 HH:MM"""
+    return value.strftime('%H:%M') if value else None
+
+def number(value):
+    """Decimal 转换为 float（与 to_dict 一致，0 和空值输出 None）"""
+    return float(value) if value else None
+
+def wants(fields, name):
+    """是否需要输出字段 name（fields 为 None 表示全部字段）"""
+    return fields is None or name in fields
+
+def select_fields(data, fields):
+    """按 fields 的顺序筛选 to_dict 的输出；fields 为 None 时返回全部字段"""
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields}
+
+class UnknownFields(ValueError):
+    """请求了未定义的字段"""
+    
+    def __init__(self, names):
+        super().__init__(', '.join(names))
+        self.names = names
+
+# 只读查询按字段组合缓存的查询计划数量上限（fields= 的组合由请求决定）
+ROW_PLAN_CACHE_SIZE = 256
+
+class Field:
+    """一个输出字段
+
+    relations 为 ORM 查询需要预加载的关联：(关联关系, 加载方式, 所需属性|None)；
+    source 为字段在只读查询中对应的列：(列名,) 或 (关联关系, 属性)，为空时只能通过 to_dict 取值；
+    convert 为只读查询结果的输出转换（与 to_dict 中的转换相同）。
+    """
+    __slots__ = ('relations', 'source', 'convert')
+    
+    def __init__(self, relations=(), source=None, convert=None):
+        self.relations = tuple(relations)
+        self.source = source
+        self.convert = convert
+
+def column(name, convert=None):
+    """与同名列对应的字段，convert 为输出转换"""
+    return Field(source=(name,), convert=convert)
+
+def related(relation, attribute):
+    """多对一关联对象的属性（如 user.name），关联为空时为 None"""
+    return Field(relations=((relation, joinedload, (attribute,)),), source=(relation, attribute))
+
+def collection(relation):
+    """一对多/多对多关联集合"""
+    return Field(relations=((relation, selectinload, None),))
+
+def computed(relations=()):
+    """由 to_dict 计算的字段"""
+    return Field(relations=[(relation, joinedload, None) for relation in relations])
+
+class FieldSet:
+    """模型的输出字段集合（作为模型类属性声明）"""
+    
+    def __init__(self, fields):
+        self.fields = fields
+        self.model = None
+        self._row_plans = {}
+    
+    def __set_name__(self, owner, name):
+        self.model = owner
+    
+    def parse(self, value):
+        """解析逗号分隔的字段列表；为空时返回 None（全部字段），有未定义字段时抛出 UnknownFields"""
+        if not value:
+            return None
+        names = []
+        for name in value.split(','):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise UnknownFields(unknown)
+        return names or None
+    
+    def load_options(self, names=None):
+        """查询选项：预加载 names（None 为全部字段）用到的关联，指定字段时关联对象只加载所需属性"""
+        fields = self.fields.values() if names is None else [self.fields[name] for name in names]
+        relations = {}
+        for field in fields:
+            for relation, loader, attributes in field.relations:
+                current = relations.setdefault(relation, (loader, attributes))
+                if current[1] is not None and attributes != current[1]:
+                    # 同一关联被多个字段使用时合并所需属性，任一字段需要整个对象则加载全部列
+                    merged = None if attributes is None else current[1] + attributes
+                    relations[relation] = (loader, merged)
+        
+        options = []
+        for relation, (loader, attributes) in relations.items():
+            attr = getattr(self.model, relation)
+            option = loader(attr)
+            if names is not None and attributes is not None:
+                target = attr.property.mapper.class_
+                option = option.load_only(*[getattr(target, name) for name in attributes])
+            options.append(option)
+        return options
+    
+    def related_models(self, names=None):
+        """字段引用的关联模型（用于条件请求的校验值）"""
+        fields = self.fields.values() if names is None else [self.fields[name] for name in names]
+        models = []
+        for field in fields:
+            for relation, _, _ in field.relations:
+                target = getattr(self.model, relation).property.mapper.class_
+                if target not in models:
+                    models.append(target)
+        return models
+    
+    def read_query(self, query, names=None, columns=()):
+        """只读列表查询，返回 (query, serialize)
+
+        所需字段都有 source 时改为只选取这些列，关联属性通过外连接取得，结果为 Row 元组
+        （不构造 ORM 对象，也不进入 identity map）；否则查询 ORM 对象，serialize 调用 to_dict。
+        columns 为额外需要读取的列（如游标分页的排序键，Row 中可按列名访问）。
+        """
+        field_names = list(self.fields) if names is None else names
+        if any(self.fields[name].source is None for name in field_names):
+            query = query.options(*self.load_options(names))
+            return query, lambda obj: obj.to_dict(names)
+        
+        key = (tuple(field_names), tuple(columns))
+        plan = self._row_plans.get(key)
+        if plan is None:
+            plan = self._row_plan(field_names, columns)
+            if len(self._row_plans) < ROW_PLAN_CACHE_SIZE:
+                self._row_plans[key] = plan
+        
+        entities, joins, serialize = plan
+        query = query.with_entities(*entities)
+        for join in joins:
+            query = query.outerjoin(join)
+        return query, serialize
+    
+    def _row_plan(self, names, columns):
+        """只读查询的选取列、外连接及按位置读取 Row 的序列化函数"""
+        entities = []
+        positions = {}
+        aliases = {}
+        joins = []
+        
+        def add(key, entity):
+            if key not in positions:
+                positions[key] = len(entities)
+                entities.append(entity)
+            return positions[key]
+        
+        for name in [key.key for key in self.model.__mapper__.primary_key] + list(columns):
+            add((name,), getattr(self.model, name))
+        
+        outputs = []
+        for name in names:
+            field = self.fields[name]
+            source = field.source
+            if len(source) == 1:
+                position = add(source, getattr(self.model, source[0]))
+            else:
+                relation, attribute = source
+                alias = aliases.get(relation)
+                if alias is None:
+                    attr = getattr(self.model, relation)
+                    alias = aliases[relation] = aliased(attr.property.mapper.class_)
+                    joins.append(attr.of_type(alias))
+                position = add(source, getattr(alias, attribute).label(f'{relation}_{attribute}'))
+            # 日期时间保留原值，由 JSON provider 直接编码为与 iso() 相同的字符串
+            outputs.append((name, position, None if field.convert is iso else field.convert))
+        
+        def serialize(row):
+            return {
+                name: row[position] if convert is None else convert(row[position])
+                for name, position, convert in outputs
+            }
+        
+        return entities, joins, serialize
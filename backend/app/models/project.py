@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.models.fields import FieldSet, column, related, computed, iso, number, wants, select_fields
 
 class Project(db.Model):
     """项目模型"""
@@ -22,12 +23,30 @@ class Project(db.Model):
     manager = db.relationship('User', backref='managed_projects', foreign_keys=[manager_id])
     members = db.relationship('ProjectMember', backref='project', lazy='dynamic')
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'name': column('name'),
+        'code': column('code'),
+        'description': column('description'),
+        'start_date': column('start_date', iso),
+        'end_date': column('end_date', iso),
+        'status': column('status'),
+        'budget': column('budget', number),
+        'used_budget': column('used_budget', number),
+        'manager_id': column('manager_id'),
+        'manager_name': related('manager', 'name'),
+        'member_count': computed(),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<Project {self.name}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, member_count=None, fields=None):
+        """转换为字典，member_count 可由 get_member_counts 批量查询后传入；fields 为字段子集时只输出这些字段"""
+        data = {
             'id': self.id,
             'name': self.name,
             'code': self.code,
@@ -38,11 +57,29 @@ class Project(db.Model):
             'budget': float(self.budget) if self.budget else None,
             'used_budget': float(self.used_budget) if self.used_budget else None,
             'manager_id': self.manager_id,
-            'manager_name': self.manager.name if self.manager else None,
-            'member_count': self.members.count(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 关联字段和成员数只在需要时查询
+        if wants(fields, 'manager_name'):
+            data['manager_name'] = self.manager.name if self.manager else None
+        if wants(fields, 'member_count'):
+            data['member_count'] = self.members.count() if member_count is None else member_count
+        return select_fields(data, fields)
+    
+    @staticmethod
+    def get_member_counts(project_ids):
+        """一次分组查询多个项目的成员数，返回 {project_id: count}"""
+        if not project_ids:
+            return {}
+        
+        rows = db.session.query(
+            ProjectMember.project_id, db.func.count(ProjectMember.id)
+        ).filter(
+            ProjectMember.project_id.in_(project_ids)
+        ).group_by(ProjectMember.project_id).all()
+        
+        return {project_id: count for project_id, count in rows}
     
     def get_members(self):
         """获取项目成员列表"""
@@ -69,6 +106,9 @@ class Project(db.Model):
             end_date=end_date
         )
         
+        # 成员变化体现在项目的更新时间上（项目详情、成员数和成员列表的条件请求校验值）
+        self.updated_at = datetime.utcnow()
+        
         try:
             db.session.add(member)
             db.session.commit()
@@ -83,6 +123,8 @@ class Project(db.Model):
         if not member:
             return False, "用户不是项目成员"
         
+        self.updated_at = datetime.utcnow()
+        
         try:
             db.session.delete(member)
             db.session.commit()
@@ -94,6 +136,9 @@ class Project(db.Model):
 class ProjectMember(db.Model):
     """项目成员模型"""
     __tablename__ = 'project_members'
+    __table_args__ = (
+        db.Index('uq_project_members_project_user', 'project_id', 'user_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -107,20 +152,38 @@ class ProjectMember(db.Model):
     # 关联关系
     user = db.relationship('User', backref='project_memberships')
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'project_id': column('project_id'),
+        'user_id': column('user_id'),
+        'user_name': related('user', 'name'),
+        'user_username': related('user', 'username'),
+        'role': column('role'),
+        'start_date': column('start_date', iso),
+        'end_date': column('end_date', iso),
+        'status': column('status'),
+        'created_at': column('created_at', iso)
+    })
+    
     def __repr__(self):
         return f'<ProjectMember {self.project_id}:{self.user_id}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'project_id': self.project_id,
             'user_id': self.user_id,
-            'user_name': self.user.name if self.user else None,
-            'user_username': self.user.username if self.user else None,
             'role': self.role,
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        } 
\ No newline at end of file
+        }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'user_name'):
+            data['user_name'] = self.user.name if self.user else None
+        if wants(fields, 'user_username'):
+            data['user_username'] = self.user.username if self.user else None
+        return select_fields(data, fields)
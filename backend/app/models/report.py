@@ -1,9 +1,17 @@
-from datetime import datetime, date
+from datetime import datetime
+from sqlalchemy import func
 from app import db
+from app.database import is_database_locked
+from app.models.fields import FieldSet, column, related, iso, number, wants, select_fields
 
 class DailyReport(db.Model):
     """日报模型"""
     __tablename__ = 'daily_reports'
+    __table_args__ = (
+        db.Index('uq_daily_reports_user_date', 'user_id', 'report_date', unique=True),
+        db.Index('ix_daily_reports_status_date', 'status', 'report_date'),
+        db.Index('ix_daily_reports_date_created', 'report_date', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -24,15 +32,34 @@ class DailyReport(db.Model):
     user = db.relationship('User', backref='daily_reports', foreign_keys=[user_id])
     approver = db.relationship('User', backref='approved_daily_reports', foreign_keys=[approved_by])
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'user_id': column('user_id'),
+        'user_name': related('user', 'name'),
+        'report_date': column('report_date', iso),
+        'work_content': column('work_content'),
+        'progress': column('progress'),
+        'issues': column('issues'),
+        'plans': column('plans'),
+        'work_hours': column('work_hours', number),
+        'status': column('status'),
+        'approved_by': column('approved_by'),
+        'approver_name': related('approver', 'name'),
+        'approved_at': column('approved_at', iso),
+        'approval_comment': column('approval_comment'),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<DailyReport {self.user_id}:{self.report_date}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'user_id': self.user_id,
-            'user_name': self.user.name if self.user else None,
             'report_date': self.report_date.isoformat() if self.report_date else None,
             'work_content': self.work_content,
             'progress': self.progress,
@@ -41,12 +68,17 @@ class DailyReport(db.Model):
             'work_hours': float(self.work_hours) if self.work_hours else None,
             'status': self.status,
             'approved_by': self.approved_by,
-            'approver_name': self.approver.name if self.approver else None,
             'approved_at': self.approved_at.isoformat() if self.approved_at else None,
             'approval_comment': self.approval_comment,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'user_name'):
+            data['user_name'] = self.user.name if self.user else None
+        if wants(fields, 'approver_name'):
+            data['approver_name'] = self.approver.name if self.approver else None
+        return select_fields(data, fields)
     
     def approve(self, approver_id, comment=None):
         """审核通过"""
@@ -60,6 +92,8 @@ class DailyReport(db.Model):
             return True, "审核通过"
         except Exception as e:
             db.session.rollback()
+            if is_database_locked(e):
+                raise
             return False, f"审核失败: {str(e)}"
     
     def reject(self, approver_id, comment=None):
@@ -74,11 +108,19 @@ class DailyReport(db.Model):
             return True, "审核拒绝"
         except Exception as e:
             db.session.rollback()
+            if is_database_locked(e):
+                raise
             return False, f"审核失败: {str(e)}"
 
 class WeeklyReport(db.Model):
     """周报模型"""
     __tablename__ = 'weekly_reports'
+    __table_args__ = (
+        db.Index('uq_weekly_reports_user_week', 'user_id', 'week_start', unique=True),
+        db.Index('ix_weekly_reports_user_week_range', 'user_id', 'week_start', 'week_end'),
+        db.Index('ix_weekly_reports_status_week', 'status', 'week_start'),
+        db.Index('ix_weekly_reports_week_created', 'week_start', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -102,15 +144,37 @@ class WeeklyReport(db.Model):
     user = db.relationship('User', backref='weekly_reports', foreign_keys=[user_id])
     approver = db.relationship('User', backref='approved_weekly_reports', foreign_keys=[approved_by])
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'user_id': column('user_id'),
+        'user_name': related('user', 'name'),
+        'week_start': column('week_start', iso),
+        'week_end': column('week_end', iso),
+        'week_summary': column('week_summary'),
+        'completed_tasks': column('completed_tasks'),
+        'ongoing_tasks': column('ongoing_tasks'),
+        'next_week_plans': column('next_week_plans'),
+        'challenges': column('challenges'),
+        'suggestions': column('suggestions'),
+        'total_hours': column('total_hours', number),
+        'status': column('status'),
+        'approved_by': column('approved_by'),
+        'approver_name': related('approver', 'name'),
+        'approved_at': column('approved_at', iso),
+        'approval_comment': column('approval_comment'),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<WeeklyReport {self.user_id}:{self.week_start}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'user_id': self.user_id,
-            'user_name': self.user.name if self.user else None,
             'week_start': self.week_start.isoformat() if self.week_start else None,
             'week_end': self.week_end.isoformat() if self.week_end else None,
             'week_summary': self.week_summary,
@@ -122,12 +186,17 @@ class WeeklyReport(db.Model):
             'total_hours': float(self.total_hours) if self.total_hours else None,
             'status': self.status,
             'approved_by': self.approved_by,
-            'approver_name': self.approver.name if self.approver else None,
             'approved_at': self.approved_at.isoformat() if self.approved_at else None,
             'approval_comment': self.approval_comment,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'user_name'):
+            data['user_name'] = self.user.name if self.user else None
+        if wants(fields, 'approver_name'):
+            data['approver_name'] = self.approver.name if self.approver else None
+        return select_fields(data, fields)
     
     def approve(self, approver_id, comment=None):
         """审核通过"""
@@ -141,6 +210,8 @@ class WeeklyReport(db.Model):
             return True, "审核通过"
         except Exception as e:
             db.session.rollback()
+            if is_database_locked(e):
+                raise
             return False, f"审核失败: {str(e)}"
     
     def reject(self, approver_id, comment=None):
@@ -155,21 +226,21 @@ class WeeklyReport(db.Model):
             return True, "审核拒绝"
         except Exception as e:
             db.session.rollback()
+            if is_database_locked(e):
+                raise
             return False, f"审核失败: {str(e)}"
     
     def calculate_total_hours(self):
         """计算本周总工作时长"""
-        from app.models import TimeRecord
-        
-        # 获取本周的时间记录
-        time_records = TimeRecord.query.filter(
-            TimeRecord.user_id == self.user_id,
-            TimeRecord.work_date >= self.week_start,
-            TimeRecord.work_date <= self.week_end,
-            TimeRecord.status == 'approved'
-        ).all()
+        from app.models import DailyWorkRollup
         
-        total_hours = sum(float(record.hours) for record in time_records)
+        # 从已审批工时日汇总中汇总本周工时
+        total_hours = db.session.query(func.coalesce(func.sum(DailyWorkRollup.hours), 0)).filter(
+            DailyWorkRollup.user_id == self.user_id,
+            DailyWorkRollup.work_date >= self.week_start,
+            DailyWorkRollup.work_date <= self.week_end
+        ).scalar()
+        total_hours = float(total_hours)
         self.total_hours = total_hours
         
         try:
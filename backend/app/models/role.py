@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.models.fields import FieldSet, column, collection, iso, wants, select_fields
 
 class Role(db.Model):
     """角色模型"""
@@ -15,20 +16,34 @@ class Role(db.Model):
     # 关联权限
     permissions = db.relationship('Permission', secondary='role_permissions', backref=db.backref('roles', lazy='dynamic'))
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'name': column('name'),
+        'description': column('description'),
+        'is_active': column('is_active'),
+        'permissions': collection('permissions'),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<Role {self.name}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'name': self.name,
             'description': self.description,
             'is_active': self.is_active,
-            'permissions': [permission.name for permission in self.permissions],
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 权限列表只在需要时加载
+        if wants(fields, 'permissions'):
+            data['permissions'] = [permission.name for permission in self.permissions]
+        return select_fields(data, fields)
 
 class Permission(db.Model):
     """权限模型"""
@@ -1,9 +1,18 @@
-from datetime import datetime, date
+from datetime import datetime
 from app import db
+from app.database import is_database_locked
+from app.models.fields import FieldSet, column, related, iso, number, hour_minute, wants, select_fields
 
 class TimeRecord(db.Model):
     """时间记录模型"""
     __tablename__ = 'time_records'
+    __table_args__ = (
+        db.Index('uq_time_records_user_project_date', 'user_id', 'project_id', 'work_date', unique=True),
+        db.Index('ix_time_records_user_date', 'user_id', 'work_date'),
+        db.Index('ix_time_records_project_status_date', 'project_id', 'status', 'work_date'),
+        db.Index('ix_time_records_status_date', 'status', 'work_date'),
+        db.Index('ix_time_records_date_created', 'work_date', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -26,17 +35,37 @@ class TimeRecord(db.Model):
     project = db.relationship('Project', backref='time_records')
     approver = db.relationship('User', backref='approved_records', foreign_keys=[approved_by])
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'user_id': column('user_id'),
+        'user_name': related('user', 'name'),
+        'project_id': column('project_id'),
+        'project_name': related('project', 'name'),
+        'work_date': column('work_date', iso),
+        'start_time': column('start_time', hour_minute),
+        'end_time': column('end_time', hour_minute),
+        'hours': column('hours', number),
+        'work_content': column('work_content'),
+        'work_type': column('work_type'),
+        'status': column('status'),
+        'approved_by': column('approved_by'),
+        'approver_name': related('approver', 'name'),
+        'approved_at': column('approved_at', iso),
+        'approval_comment': column('approval_comment'),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<TimeRecord {self.user_id}:{self.project_id}:{self.work_date}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'user_id': self.user_id,
-            'user_name': self.user.name if self.user else None,
             'project_id': self.project_id,
-            'project_name': self.project.name if self.project else None,
             'work_date': self.work_date.isoformat() if self.work_date else None,
             'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
             'end_time': self.end_time.strftime('%H:%M') if self.end_time else None,
@@ -45,12 +74,19 @@ class TimeRecord(db.Model):
             'work_type': self.work_type,
             'status': self.status,
             'approved_by': self.approved_by,
-            'approver_name': self.approver.name if self.approver else None,
             'approved_at': self.approved_at.isoformat() if self.approved_at else None,
             'approval_comment': self.approval_comment,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 关联字段只在需要时访问关联对象
+        if wants(fields, 'user_name'):
+            data['user_name'] = self.user.name if self.user else None
+        if wants(fields, 'project_name'):
+            data['project_name'] = self.project.name if self.project else None
+        if wants(fields, 'approver_name'):
+            data['approver_name'] = self.approver.name if self.approver else None
+        return select_fields(data, fields)
     
     def calculate_hours(self):
         """计算工作时长"""
@@ -62,33 +98,69 @@ class TimeRecord(db.Model):
         return 0
     
     def approve(self, approver_id, comment=None):
-        """审核通过"""
+        """审核通过（同一事务内更新日汇总）"""
+        from app.services.work_rollup import refresh_rollups
+        
         self.status = 'approved'
         self.approved_by = approver_id
         self.approved_at = datetime.utcnow()
         self.approval_comment = comment
         
         try:
+            refresh_rollups([self.user_id], self.work_date, self.work_date)
             db.session.commit()
             return True, "审核通过"
         except Exception as e:
             db.session.rollback()
+            if is_database_locked(e):
+                raise
             return False, f"审核失败: {str(e)}"
     
     def reject(self, approver_id, comment=None):
-        """审核拒绝"""
+        """审核拒绝（撤销已审批记录时在同一事务内更新日汇总）"""
+        from app.services.work_rollup import refresh_rollups
+        
+        # 日汇总只包含已审批记录，拒绝待审核记录不影响汇总
+        was_approved = self.status == 'approved'
         self.status = 'rejected'
         self.approved_by = approver_id
         self.approved_at = datetime.utcnow()
         self.approval_comment = comment
         
         try:
+            if was_approved:
+                refresh_rollups([self.user_id], self.work_date, self.work_date)
             db.session.commit()
             return True, "审核拒绝"
         except Exception as e:
             db.session.rollback()
+            if is_database_locked(e):
+                raise
             return False, f"审核失败: {str(e)}"
 
+class DailyWorkRollup(db.Model):
+    """已审批工时日汇总（按用户、项目、日期、工作类型），由 services.work_rollup 维护"""
+    __tablename__ = 'daily_work_rollups'
+    __table_args__ = (
+        db.Index('uq_daily_work_rollups_key', 'user_id', 'project_id', 'work_date', 'work_type', unique=True),
+        db.Index('ix_daily_work_rollups_project_date', 'project_id', 'work_date'),
+        db.Index('ix_daily_work_rollups_user_date', 'user_id', 'work_date'),
+        db.Index('ix_daily_work_rollups_date', 'work_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    work_date = db.Column(db.Date, nullable=False)
+    work_type = db.Column(db.String(50), nullable=False, default='')  # 未填写工作类型时为空字符串
+    hours = db.Column(db.Numeric(8, 2), nullable=False, default=0)  # 已审批工时
+    record_count = db.Column(db.Integer, nullable=False, default=0)  # 已审批记录数
+    cost = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # 成本（按时薪或月薪分摊）
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyWorkRollup {self.user_id}:{self.project_id}:{self.work_date}:{self.work_type}>'
+
 class WorkType(db.Model):
     """工作类型模型"""
     __tablename__ = 'work_types'
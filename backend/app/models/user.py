@@ -1,10 +1,15 @@
 from datetime import datetime
 from app import db
+from app.models.fields import FieldSet, column, computed, collection, iso, number, wants, select_fields
 from app.models.role import Role
 
 class User(db.Model):
     """用户模型"""
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_department_status', 'department', 'status'),
+        db.Index('ix_users_name', 'name'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -23,18 +28,39 @@ class User(db.Model):
     
     # 关联角色
     roles = db.relationship('Role', secondary='user_roles', backref=db.backref('users', lazy='dynamic'))
+    # 时薪/月薪历史
+    rate_history = db.relationship('UserRateHistory', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     @property
     def is_active(self):
         """检查用户是否激活"""
         return self.status == 'active'
     
+    # 输出字段及其依赖的列/关联关系
+    serialized_fields = FieldSet({
+        'id': column('id'),
+        'username': column('username'),
+        'email': column('email'),
+        'name': column('name'),
+        'employee_id': column('employee_id'),
+        'department': column('department'),
+        'position': column('position'),
+        'status': column('status'),
+        'is_active': computed(),
+        'hourly_rate': column('hourly_rate', number),
+        'monthly_salary': column('monthly_salary', number),
+        'cost_calculation_method': column('cost_calculation_method'),
+        'roles': collection('roles'),
+        'created_at': column('created_at', iso),
+        'updated_at': column('updated_at', iso)
+    })
+    
     def __repr__(self):
         return f'<User {self.username}>'
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
+    def to_dict(self, fields=None):
+        """转换为字典，fields 为字段子集（见 serialized_fields）时只输出这些字段"""
+        data = {
             'id': self.id,
             'username': self.username,
             'email': self.email,
@@ -47,10 +73,13 @@ class User(db.Model):
             'hourly_rate': float(self.hourly_rate) if self.hourly_rate else None,
             'monthly_salary': float(self.monthly_salary) if self.monthly_salary else None,
             'cost_calculation_method': self.cost_calculation_method,
-            'roles': [{'id': role.id, 'name': role.name, 'description': role.description} for role in self.roles],
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        # 角色列表只在需要时加载
+        if wants(fields, 'roles'):
+            data['roles'] = [{'id': role.id, 'name': role.name, 'description': role.description} for role in self.roles]
+        return select_fields(data, fields)
     
     def has_role(self, role_name):
         """检查用户是否有指定角色"""
@@ -68,4 +97,34 @@ class User(db.Model):
 user_roles = db.Table('user_roles',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('role_id', db.Integer, db.ForeignKey('roles.id'), primary_key=True)
-) 
\ No newline at end of file
+)
+
+class UserRateHistory(db.Model):
+    """用户时薪/月薪历史（按生效日期区间）"""
+    __tablename__ = 'user_rate_history'
+    __table_args__ = (
+        db.Index('uq_user_rate_history_user_from', 'user_id', 'effective_from', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    hourly_rate = db.Column(db.Numeric(10, 2))  # 时薪
+    monthly_salary = db.Column(db.Numeric(10, 2))  # 月薪
+    effective_from = db.Column(db.Date, nullable=False)  # 生效日期（含）
+    effective_to = db.Column(db.Date)  # 失效日期（含），为空表示至今有效
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserRateHistory {self.user_id}:{self.effective_from}>'
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'hourly_rate': float(self.hourly_rate) if self.hourly_rate else None,
+            'monthly_salary': float(self.monthly_salary) if self.monthly_salary else None,
+            'effective_from': self.effective_from.isoformat(),
+            'effective_to': self.effective_to.isoformat() if self.effective_to else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
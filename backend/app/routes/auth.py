@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify, session
 from werkzeug.security import check_password_hash
 from app.models import User
+from app.middlewares.auth import get_current_user, get_current_user_id
+from app.services.permission_cache import load_user_permissions
+from app.services.auth_tokens import issue_tokens, verify_refresh_token
 from app import db
 
 auth_bp = Blueprint('auth', __name__)
@@ -24,6 +27,23 @@ def login():
     if not user.is_active:
         return jsonify({'message': '账户已被禁用'}), 401
     
+    user_data = {
+        'id': user.id,
+        'username': user.username,
+        'name': user.name,
+        'email': user.email,
+        'roles': [role.name for role in user.roles]
+    }
+    
+    # 令牌模式：签发访问令牌和刷新令牌，不建立session
+    if data.get('mode') == 'token':
+        tokens = issue_tokens(load_user_permissions(user.id))
+        return jsonify({
+            'message': '登录成功',
+            'user': user_data,
+            **tokens
+        }), 200
+    
     # 设置session
     session['user_id'] = user.id
     session['username'] = user.username
@@ -32,13 +52,33 @@ def login():
     
     return jsonify({
         'message': '登录成功',
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'name': user.name,
-            'email': user.email,
-            'roles': [role.name for role in user.roles]
-        }
+        'user': user_data
+    }), 200
+
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh_token():
+    """使用刷新令牌换取新的访问令牌"""
+    data = request.get_json()
+    
+    if not data or not data.get('refresh_token'):
+        return jsonify({'message': '刷新令牌不能为空'}), 400
+    
+    user_id = verify_refresh_token(data['refresh_token'])
+    if user_id is None:
+        return jsonify({'message': '刷新令牌无效或已过期'}), 401
+    
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'message': '用户不存在'}), 401
+    
+    if not user.is_active:
+        return jsonify({'message': '账户已被禁用'}), 401
+    
+    # 重新解析权限，使角色变更在下一个访问令牌中生效
+    tokens = issue_tokens(load_user_permissions(user.id))
+    return jsonify({
+        'message': '令牌刷新成功',
+        **tokens
     }), 200
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -50,10 +90,10 @@ def logout():
 @auth_bp.route('/profile', methods=['GET'])
 def get_profile():
     """获取用户信息"""
-    if 'user_id' not in session:
+    if get_current_user_id() is None:
         return jsonify({'message': '请先登录'}), 401
     
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if not user:
         return jsonify({'message': '用户不存在'}), 401
     
@@ -1,12 +1,34 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from datetime import datetime, date, timedelta
+from sqlalchemy.orm import undefer
 from app import db
-from app.models import CostCalculation, ProjectCost, CostReport, User, Project, TimeRecord
+from app.models import CostCalculation, ProjectCost, CostReport, CostReportJob, Project, TimeRecord, DailyWorkRollup
+from app.models.fields import UnknownFields
 from app.middlewares.auth import login_required, role_required, permission_required, get_current_user
-import json
+from app.services.conditional import conditional
+from app.services.cost_aggregates import summarize, summarize_project_costs, average_cost_per_hour, to_json_numbers
+from app.services.cost_calculation import bulk_calculate_costs
+from app.services.cost_allocation import allocate_costs
+from app.services.work_rollup import project_member_costs
+from app.services.report_jobs import submit_report_job, ReportQueueFull
+from app.json_provider import ascii_escape
+from app.services.report_payload import decode_report_data, read_payload_chunks, iter_report_json, section_summary, section_rows
+from app.services.pagination import keyset_paginate, InvalidPagination
 
 costs_bp = Blueprint('costs', __name__)
 
+def _id_list(data, plural, singular):
+    """读取ID筛选条件：plural 为整数列表，或 singular 为单个整数；均未提供时返回 None，格式错误时抛出 ValueError"""
+    if data.get(plural):
+        ids = data[plural]
+    elif data.get(singular):
+        ids = [data[singular]]
+    else:
+        return None
+    if not isinstance(ids, list) or not all(isinstance(item, int) and not isinstance(item, bool) for item in ids):
+        raise ValueError(f'{plural}必须是整数ID列表')
+    return ids
+
 # ==================== 成本计算相关接口 ====================
 
 @costs_bp.route('/calculate', methods=['POST'])
@@ -45,12 +67,10 @@ def calculate_cost():
     if not time_record:
         return jsonify({'message': '该日期没有已审核的时间记录'}), 400
     
-    # 获取用户时薪
-    hourly_rate = float(current_user.hourly_rate) if current_user.hourly_rate else 0
-    
-    # 计算成本
-    work_hours = float(time_record.hours)
-    total_cost = work_hours * hourly_rate
+    # 计算成本：按时薪员工使用该日期适用的时薪，按月薪员工按当月工时比例分摊月薪
+    allocation = allocate_costs(calculation_date, calculation_date, user_ids=[current_user.id]) \
+        .within(calculation_date, calculation_date, [time_record.project_id])
+    _, _, _, work_hours, hourly_rate, total_cost, calculation_method = next(allocation.records())
     
     # 检查是否已有该日期的成本计算
     existing_calculation = CostCalculation.query.filter(
@@ -69,7 +89,7 @@ def calculate_cost():
         work_hours=work_hours,
         hourly_rate=hourly_rate,
         total_cost=total_cost,
-        calculation_method=current_user.cost_calculation_method or 'hourly',
+        calculation_method=calculation_method,
         notes=data.get('notes', '')
     )
     
@@ -85,6 +105,53 @@ def calculate_cost():
         db.session.rollback()
         return jsonify({'message': '成本计算失败'}), 500
 
+@costs_bp.route('/calculate/bulk', methods=['POST'])
+@login_required
+@permission_required('cost_calculate')
+def bulk_calculate_cost():
+    """批量计算个人成本：按日期范围及用户/项目/部门筛选，已有记录更新，缺失记录新增"""
+    data = request.get_json() or {}
+    
+    # 验证必填字段
+    required_fields = ['start_date', 'end_date']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({'message': f'{field}不能为空'}), 400
+    
+    # 解析日期
+    try:
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': '日期格式错误，请使用YYYY-MM-DD格式'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'message': '开始日期不能晚于结束日期'}), 400
+    
+    try:
+        user_ids = _id_list(data, 'user_ids', 'user_id')
+        project_ids = _id_list(data, 'project_ids', 'project_id')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        result = bulk_calculate_costs(
+            start_date, end_date,
+            user_ids=user_ids,
+            project_ids=project_ids,
+            department=data.get('department'),
+            notes=data.get('notes', '')
+        )
+        db.session.commit()
+        
+        return jsonify({
+            'message': '批量成本计算完成',
+            **result
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': '批量成本计算失败'}), 500
+
 @costs_bp.route('/calculations', methods=['GET'])
 @login_required
 @permission_required('cost_read')
@@ -97,6 +164,11 @@ def get_cost_calculations():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
+    try:
+        fields = CostCalculation.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
     query = CostCalculation.query
     
     if user_id:
@@ -121,20 +193,42 @@ def get_cost_calculations():
     
     # 按日期倒序排列
     query = query.order_by(CostCalculation.calculation_date.desc(), CostCalculation.created_at.desc())
+    query, serialize = CostCalculation.serialized_fields.read_query(query, fields, columns=('calculation_date', 'created_at'))
+    
+    if 'cursor' in request.args:
+        # 游标模式：按排序键（末尾补ID）翻页，不使用 OFFSET；count=exact/capped 时统计总数
+        try:
+            result = keyset_paginate(
+                query,
+                [(CostCalculation.calculation_date, True), (CostCalculation.created_at, True), (CostCalculation.id, True)],
+                per_page, request.args.get('cursor'), request.args.get('count')
+            )
+        except InvalidPagination as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({
+            'calculations': [serialize(calc) for calc in result.items],
+            **result.metadata()
+        }), 200
+    
+    validators = conditional(query, CostCalculation, CostCalculation.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
     
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    calculations = [calc.to_dict() for calc in pagination.items]
+    calculations = [serialize(calc) for calc in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'calculations': calculations,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 # ==================== 项目成本相关接口 ====================
 
@@ -173,31 +267,16 @@ def calculate_project_cost(project_id):
         period_start = start_date
         period_end = end_date
     
-    # 获取项目成员在该期间的时间记录
-    time_records = TimeRecord.query.filter(
-        TimeRecord.project_id == project_id,
-        TimeRecord.work_date >= period_start,
-        TimeRecord.work_date <= period_end,
-        TimeRecord.status == 'approved'
-    ).all()
+    # 从工时日汇总按成员汇总该期间已审批的工时和成本
+    members = project_member_costs(project_id, period_start, period_end)
     
-    if not time_records:
+    if not members:
         return jsonify({'message': '该期间没有时间记录'}), 400
     
-    # 计算总工作时长和成本
-    total_hours = sum(float(record.hours) for record in time_records)
-    total_cost = 0
-    member_ids = set()
-    
-    for record in time_records:
-        user = User.query.get(record.user_id)
-        if user and user.hourly_rate:
-            cost = float(record.hours) * float(user.hourly_rate)
-            total_cost += cost
-        member_ids.add(record.user_id)
-    
-    member_count = len(member_ids)
-    cost_per_hour = total_cost / total_hours if total_hours > 0 else 0
+    total_hours = sum(member['total_hours'] for member in members)
+    total_cost = sum(member['total_cost'] for member in members)
+    member_count = len(members)
+    cost_per_hour = average_cost_per_hour(total_cost, total_hours)
     
     # 检查是否已有该期间的项目成本记录
     existing_cost = ProjectCost.query.filter(
@@ -225,10 +304,14 @@ def calculate_project_cost(project_id):
         db.session.add(project_cost)
         db.session.commit()
         
-        return jsonify({
+        result = {
             'message': '项目成本计算成功',
             'project_cost': project_cost.to_dict()
-        }), 201
+        }
+        if data.get('include_members'):
+            result['members'] = to_json_numbers(members)
+        
+        return jsonify(result), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': '项目成本计算失败'}), 500
@@ -242,6 +325,11 @@ def get_project_costs(project_id):
     per_page = request.args.get('per_page', 10, type=int)
     calculation_period = request.args.get('calculation_period', '')
     
+    try:
+        fields = ProjectCost.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
     query = ProjectCost.query.filter(ProjectCost.project_id == project_id)
     
     if calculation_period:
@@ -249,20 +337,42 @@ def get_project_costs(project_id):
     
     # 按期间开始日期倒序排列
     query = query.order_by(ProjectCost.period_start.desc(), ProjectCost.created_at.desc())
+    query, serialize = ProjectCost.serialized_fields.read_query(query, fields, columns=('period_start', 'created_at'))
+    
+    if 'cursor' in request.args:
+        # 游标模式：按排序键（末尾补ID）翻页，不使用 OFFSET；count=exact/capped 时统计总数
+        try:
+            result = keyset_paginate(
+                query,
+                [(ProjectCost.period_start, True), (ProjectCost.created_at, True), (ProjectCost.id, True)],
+                per_page, request.args.get('cursor'), request.args.get('count')
+            )
+        except InvalidPagination as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({
+            'costs': [serialize(cost) for cost in result.items],
+            **result.metadata()
+        }), 200
+    
+    validators = conditional(query, ProjectCost, ProjectCost.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
     
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    costs = [cost.to_dict() for cost in pagination.items]
+    costs = [serialize(cost) for cost in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'costs': costs,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 # ==================== 成本报表相关接口 ====================
 
@@ -275,6 +385,11 @@ def get_cost_reports():
     per_page = request.args.get('per_page', 10, type=int)
     report_type = request.args.get('report_type', '')
     
+    try:
+        fields = CostReport.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
     query = CostReport.query
     
     if report_type:
@@ -282,26 +397,32 @@ def get_cost_reports():
     
     # 按创建时间倒序排列
     query = query.order_by(CostReport.created_at.desc())
+    validators = conditional(query, CostReport, CostReport.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
+    
+    query, serialize = CostReport.serialized_fields.read_query(query, fields)
     
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    reports = [report.to_dict() for report in pagination.items]
+    reports = [serialize(report) for report in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'reports': reports,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 @costs_bp.route('/reports', methods=['POST'])
 @login_required
 @permission_required('report_generate')
 def generate_cost_report():
-    """生成成本报表"""
+    """提交成本报表生成任务（后台生成，通过任务状态接口轮询结果）"""
     current_user = get_current_user()
     data = request.get_json()
     
@@ -313,131 +434,134 @@ def generate_cost_report():
     
     # 解析日期
     try:
-        period_start = datetime.strptime(data['period_start'], '%Y-%m-%d').date()
-        period_end = datetime.strptime(data['period_end'], '%Y-%m-%d').date()
+        datetime.strptime(data['period_start'], '%Y-%m-%d')
+        datetime.strptime(data['period_end'], '%Y-%m-%d')
     except ValueError:
         return jsonify({'message': '日期格式错误，请使用YYYY-MM-DD格式'}), 400
     
-    # 根据报表类型生成数据
-    report_data = {}
-    total_cost = 0
-    total_hours = 0
+    params = {field: data[field] for field in required_fields}
     
     if data['report_type'] == 'personal':
-        # 个人成本报表
-        user_id = data.get('user_id', current_user.id)
-        calculations = CostCalculation.query.filter(
-            CostCalculation.user_id == user_id,
-            CostCalculation.calculation_date >= period_start,
-            CostCalculation.calculation_date <= period_end
-        ).all()
-        
-        total_cost = sum(float(calc.total_cost) for calc in calculations)
-        total_hours = sum(float(calc.work_hours) for calc in calculations)
-        
-        report_data = {
-            'user_id': user_id,
-            'calculations': [calc.to_dict() for calc in calculations]
-        }
-    
+        params['user_id'] = data.get('user_id', current_user.id)
     elif data['report_type'] == 'project':
-        # 项目成本报表
-        project_id = data.get('project_id')
-        if not project_id:
+        if not data.get('project_id'):
             return jsonify({'message': '项目ID不能为空'}), 400
-        
-        project_costs = ProjectCost.query.filter(
-            ProjectCost.project_id == project_id,
-            ProjectCost.period_start >= period_start,
-            ProjectCost.period_end <= period_end
-        ).all()
-        
-        total_cost = sum(float(cost.total_cost) for cost in project_costs)
-        total_hours = sum(float(cost.total_hours) for cost in project_costs)
-        
-        report_data = {
-            'project_id': project_id,
-            'project_costs': [cost.to_dict() for cost in project_costs]
-        }
-    
+        params['project_id'] = data['project_id']
     elif data['report_type'] == 'department':
-        # 部门成本报表
-        department = data.get('department')
-        if not department:
+        if not data.get('department'):
             return jsonify({'message': '部门不能为空'}), 400
-        
-        users = User.query.filter_by(department=department).all()
-        user_ids = [user.id for user in users]
-        
-        calculations = CostCalculation.query.filter(
-            CostCalculation.user_id.in_(user_ids),
-            CostCalculation.calculation_date >= period_start,
-            CostCalculation.calculation_date <= period_end
-        ).all()
-        
-        total_cost = sum(float(calc.total_cost) for calc in calculations)
-        total_hours = sum(float(calc.work_hours) for calc in calculations)
-        
-        report_data = {
-            'department': department,
-            'user_count': len(users),
-            'calculations': [calc.to_dict() for calc in calculations]
-        }
-    
-    else:  # company
-        # 公司成本报表
-        calculations = CostCalculation.query.filter(
-            CostCalculation.calculation_date >= period_start,
-            CostCalculation.calculation_date <= period_end
-        ).all()
-        
-        total_cost = sum(float(calc.total_cost) for calc in calculations)
-        total_hours = sum(float(calc.work_hours) for calc in calculations)
-        
-        report_data = {
-            'calculations': [calc.to_dict() for calc in calculations]
-        }
-    
-    average_cost_per_hour = total_cost / total_hours if total_hours > 0 else 0
-    
-    report = CostReport(
-        report_name=data['report_name'],
-        report_type=data['report_type'],
-        report_period=data['report_period'],
-        period_start=period_start,
-        period_end=period_end,
-        total_cost=total_cost,
-        total_hours=total_hours,
-        average_cost_per_hour=average_cost_per_hour,
-        report_data=json.dumps(report_data),
-        generated_by=current_user.id
-    )
+        params['department'] = data['department']
     
     try:
-        db.session.add(report)
-        db.session.commit()
-        
-        return jsonify({
-            'message': '成本报表生成成功',
-            'report': report.to_dict()
-        }), 201
+        job, created = submit_report_job(params, current_user.id)
+    except ReportQueueFull:
+        return jsonify({'message': '报表生成任务过多，请稍后再试'}), 503
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': '成本报表生成失败'}), 500
+        return jsonify({'message': '成本报表任务提交失败'}), 500
+    
+    return jsonify({
+        'message': '成本报表生成任务已提交' if created else '相同的成本报表正在生成',
+        'job': job.to_dict()
+    }), 202
+
+@costs_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@login_required
+@permission_required('report_generate')
+def get_cost_report_job(job_id):
+    """获取成本报表生成任务状态"""
+    current_user = get_current_user()
+    job = db.session.get(CostReportJob, job_id)
+    
+    if not job or (job.requested_by != current_user.id and not current_user.has_role('admin')):
+        return jsonify({'message': '报表任务不存在'}), 404
+    
+    return jsonify({
+        'job': job.to_dict()
+    }), 200
 
 @costs_bp.route('/reports/<int:report_id>', methods=['GET'])
 @login_required
 @permission_required('report_read')
 def get_cost_report(report_id):
-    """获取成本报表详情"""
-    report = CostReport.query.get(report_id)
+    """获取成本报表详情
+    
+    默认流式输出报表信息及完整的列式详细数据（report_data）；
+    指定 section（如 by_day）时分页返回该分区的明细行；data=none 时只返回报表信息和各分区行数。
+    fields 只影响报表信息部分。
+    """
+    try:
+        fields = CostReport.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    # 报表生成后基本不变，未变化时不读取、不解压详细数据
+    query = CostReport.query.filter(CostReport.id == report_id)
+    validators = conditional(query, CostReport, CostReport.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
+    
+    section = request.args.get('section', '')
+    summary_only = request.args.get('data') == 'none'
+    
+    # 流式输出时详细数据分段读取，不随报表信息一起加载
+    options = CostReport.serialized_fields.load_options(fields)
+    if section or summary_only:
+        options.append(undefer(CostReport.report_payload))
+    report = query.options(*options).first()
     
     if not report:
         return jsonify({'message': '成本报表不存在'}), 404
     
-    return jsonify({
-        'report': report.to_dict()
-    }), 200
+    if section or summary_only:
+        layout = decode_report_data(report.report_payload)
+        result = report.to_dict(fields)
+        result['fields'] = layout['fields']
+        result['sections'] = section_summary(layout)
+        if not section:
+            return validators.apply(jsonify({'report': result})), 200
+        
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 100, type=int), 1000)
+        if page < 1 or per_page < 1:
+            return jsonify({'message': '分页参数错误'}), 400
+        
+        rows = section_rows(layout, section, (page - 1) * per_page, per_page)
+        if rows is None:
+            return jsonify({'message': f'报表分区不存在: {section}'}), 404
+        
+        rows, total = rows
+        return validators.apply(jsonify({
+            'report': result,
+            'section': section,
+            'rows': rows,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'current_page': page,
+            'per_page': per_page
+        })), 200
+    
+    # 逐个成员编码报表信息（紧凑格式、按键排序、按配置转义非ASCII字符，与其他接口一致），
+    # 在 report_data 的位置接上逐块解压的详细数据
+    encode = current_app.json.encode
+    result = report.to_dict(fields)
+    result['report_data'] = None
+    names = sorted(result) if current_app.json.sort_keys else list(result)
+    position = names.index('report_data')
+    
+    def member(name):
+        return encode(name) + b':' + encode(result[name])
+    
+    head = b'{"report":{' + b''.join(member(name) + b',' for name in names[:position]) + b'"report_data":'
+    tail = b''.join(b',' + member(name) for name in names[position + 1:]) + b'}}\n'
+    escape = ascii_escape if current_app.json.ensure_ascii else None
+    
+    def generate():
+        yield head
+        yield from iter_report_json(read_payload_chunks(report_id), escape)
+        yield tail
+    
+    return validators.apply(Response(stream_with_context(generate()), mimetype='application/json')), 200
 
 # ==================== 成本统计接口 ====================
 
@@ -451,28 +575,26 @@ def get_cost_statistics():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
-    # 个人成本统计
-    personal_query = CostCalculation.query
+    # 个人成本统计（读取工时日汇总）
+    personal_query = DailyWorkRollup.query
     if user_id:
-        personal_query = personal_query.filter(CostCalculation.user_id == user_id)
+        personal_query = personal_query.filter(DailyWorkRollup.user_id == user_id)
     if project_id:
-        personal_query = personal_query.filter(CostCalculation.project_id == project_id)
+        personal_query = personal_query.filter(DailyWorkRollup.project_id == project_id)
     if start_date:
         try:
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            personal_query = personal_query.filter(CostCalculation.calculation_date >= start_date_obj)
+            personal_query = personal_query.filter(DailyWorkRollup.work_date >= start_date_obj)
         except ValueError:
             pass
     if end_date:
         try:
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            personal_query = personal_query.filter(CostCalculation.calculation_date <= end_date_obj)
+            personal_query = personal_query.filter(DailyWorkRollup.work_date <= end_date_obj)
         except ValueError:
             pass
     
-    calculations = personal_query.all()
-    total_personal_cost = sum(float(calc.total_cost) for calc in calculations)
-    total_personal_hours = sum(float(calc.work_hours) for calc in calculations)
+    personal_summary = summarize(personal_query, DailyWorkRollup.cost, DailyWorkRollup.hours)
     
     # 项目成本统计
     project_query = ProjectCost.query
@@ -491,19 +613,17 @@ def get_cost_statistics():
         except ValueError:
             pass
     
-    project_costs = project_query.all()
-    total_project_cost = sum(float(cost.total_cost) for cost in project_costs)
-    total_project_hours = sum(float(cost.total_hours) for cost in project_costs)
+    project_summary = summarize_project_costs(project_query)
     
     return jsonify({
         'personal_costs': {
-            'total_cost': total_personal_cost,
-            'total_hours': total_personal_hours,
-            'average_cost_per_hour': total_personal_cost / total_personal_hours if total_personal_hours > 0 else 0
+            'total_cost': float(personal_summary['total_cost']),
+            'total_hours': float(personal_summary['total_hours']),
+            'average_cost_per_hour': float(personal_summary['average_cost_per_hour'])
         },
         'project_costs': {
-            'total_cost': total_project_cost,
-            'total_hours': total_project_hours,
-            'average_cost_per_hour': total_project_cost / total_project_hours if total_project_hours > 0 else 0
+            'total_cost': float(project_summary['total_cost']),
+            'total_hours': float(project_summary['total_hours']),
+            'average_cost_per_hour': float(project_summary['average_cost_per_hour'])
         }
     }), 200 
\ No newline at end of file
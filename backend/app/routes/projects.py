@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 from app import db
 from app.models import Project, ProjectMember, User
+from app.models.fields import UnknownFields
 from app.middlewares.auth import login_required, role_required
+from app.services.conditional import conditional
 
 projects_bp = Blueprint('projects', __name__)
 
@@ -16,7 +18,12 @@ def get_projects():
     status = request.args.get('status', '')
     manager_id = request.args.get('manager_id', type=int)
     
-    query = Project.query
+    try:
+        fields = Project.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = Project.query.options(*Project.serialized_fields.load_options(fields))
     
     if search:
         query = query.filter(
@@ -31,35 +38,56 @@ def get_projects():
     if manager_id:
         query = query.filter(Project.manager_id == manager_id)
     
+    validators = conditional(query, Project, Project.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    projects = [project.to_dict() for project in pagination.items]
+    # 整页项目的成员数一次分组查询
+    if fields is None or 'member_count' in fields:
+        member_counts = Project.get_member_counts([project.id for project in pagination.items])
+        projects = [project.to_dict(member_count=member_counts.get(project.id, 0), fields=fields) for project in pagination.items]
+    else:
+        projects = [project.to_dict(fields=fields) for project in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'projects': projects,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 @projects_bp.route('/<int:project_id>', methods=['GET'])
 @login_required
 def get_project(project_id):
-    """获取项目详情"""
-    project = Project.query.get(project_id)
+    """获取项目详情（指定 fields 时只返回这些项目字段，不含成员列表）"""
+    try:
+        fields = Project.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = Project.query.filter(Project.id == project_id)
+    validators = conditional(query, Project, Project.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
+    project = query.options(*Project.serialized_fields.load_options(fields)).first()
     
     if not project:
         return jsonify({'message': '项目不存在'}), 404
     
-    project_data = project.to_dict()
-    project_data['members'] = project.get_members()
+    project_data = project.to_dict(fields=fields)
+    if fields is None:
+        project_data['members'] = project.get_members()
     
-    return jsonify({
+    return validators.apply(jsonify({
         'project': project_data
-    }), 200
+    })), 200
 
 @projects_bp.route('/', methods=['POST'])
 @login_required
@@ -176,17 +204,28 @@ def delete_project(project_id):
 @login_required
 def get_project_members(project_id):
     """获取项目成员列表"""
-    project = Project.query.get(project_id)
+    try:
+        fields = ProjectMember.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = Project.query.filter(Project.id == project_id)
+    validators = conditional(query, Project, ProjectMember.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
+    project = query.first()
     
     if not project:
         return jsonify({'message': '项目不存在'}), 404
     
-    members = project.get_members()
+    members = project.members.options(*ProjectMember.serialized_fields.load_options(fields)).all()
+    members = [member.to_dict(fields) for member in members]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'members': members,
         'total': len(members)
-    }), 200
+    })), 200
 
 @projects_bp.route('/<int:project_id>/members', methods=['POST'])
 @login_required
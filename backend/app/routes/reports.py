@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, date, timedelta
+from sqlalchemy import func, case
+from sqlalchemy.exc import OperationalError
 from app import db
+from app.database import is_database_locked, DATABASE_BUSY_MESSAGE
 from app.models import DailyReport, WeeklyReport, User, TimeRecord
+from app.models.fields import UnknownFields
 from app.middlewares.auth import login_required, role_required, permission_required, get_current_user
+from app.services.conditional import conditional
+from app.services.pagination import keyset_paginate, InvalidPagination
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -20,6 +26,11 @@ def get_daily_reports():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
+    try:
+        fields = DailyReport.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
     query = DailyReport.query
     
     if user_id:
@@ -44,34 +55,66 @@ def get_daily_reports():
     
     # 按日期倒序排列
     query = query.order_by(DailyReport.report_date.desc(), DailyReport.created_at.desc())
+    query, serialize = DailyReport.serialized_fields.read_query(query, fields, columns=('report_date', 'created_at'))
+    
+    if 'cursor' in request.args:
+        # 游标模式：按排序键（末尾补ID）翻页，不使用 OFFSET；count=exact/capped 时统计总数
+        try:
+            result = keyset_paginate(
+                query,
+                [(DailyReport.report_date, True), (DailyReport.created_at, True), (DailyReport.id, True)],
+                per_page, request.args.get('cursor'), request.args.get('count')
+            )
+        except InvalidPagination as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({
+            'reports': [serialize(report) for report in result.items],
+            **result.metadata()
+        }), 200
+    
+    validators = conditional(query, DailyReport, DailyReport.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
     
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    reports = [report.to_dict() for report in pagination.items]
+    reports = [serialize(report) for report in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'reports': reports,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 @reports_bp.route('/daily/<int:report_id>', methods=['GET'])
 @login_required
 @permission_required('report_read')
 def get_daily_report(report_id):
     """获取日报详情"""
-    report = DailyReport.query.get(report_id)
+    try:
+        fields = DailyReport.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = DailyReport.query.filter(DailyReport.id == report_id)
+    validators = conditional(query, DailyReport, DailyReport.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
+    
+    report = query.options(*DailyReport.serialized_fields.load_options(fields)).first()
     
     if not report:
         return jsonify({'message': '日报不存在'}), 404
     
-    return jsonify({
-        'report': report.to_dict()
-    }), 200
+    return validators.apply(jsonify({
+        'report': report.to_dict(fields)
+    })), 200
 
 @reports_bp.route('/daily', methods=['POST'])
 @login_required
@@ -135,6 +178,8 @@ def create_daily_report():
         }), 201
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
         return jsonify({'message': '日报创建失败'}), 500
 
 @reports_bp.route('/daily/<int:report_id>', methods=['PUT'])
@@ -185,6 +230,8 @@ def update_daily_report(report_id):
         }), 200
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
         return jsonify({'message': '日报更新失败'}), 500
 
 @reports_bp.route('/daily/<int:report_id>/approve', methods=['POST'])
@@ -205,13 +252,19 @@ def approve_daily_report(report_id):
     action = data.get('action')  # approve 或 reject
     comment = data.get('comment', '')
     
-    if action == 'approve':
-        success, message = report.approve(current_user.id, comment)
-    elif action == 'reject':
-        success, message = report.reject(current_user.id, comment)
-    else:
+    if action not in ('approve', 'reject'):
         return jsonify({'message': '无效的审核操作'}), 400
     
+    try:
+        if action == 'approve':
+            success, message = report.approve(current_user.id, comment)
+        else:
+            success, message = report.reject(current_user.id, comment)
+    except OperationalError as e:
+        if not is_database_locked(e):
+            raise
+        return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
+    
     if success:
         return jsonify({'message': message}), 200
     else:
@@ -231,6 +284,11 @@ def get_weekly_reports():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
+    try:
+        fields = WeeklyReport.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
     query = WeeklyReport.query
     
     if user_id:
@@ -255,34 +313,66 @@ def get_weekly_reports():
     
     # 按周开始日期倒序排列
     query = query.order_by(WeeklyReport.week_start.desc(), WeeklyReport.created_at.desc())
+    query, serialize = WeeklyReport.serialized_fields.read_query(query, fields, columns=('week_start', 'created_at'))
+    
+    if 'cursor' in request.args:
+        # 游标模式：按排序键（末尾补ID）翻页，不使用 OFFSET；count=exact/capped 时统计总数
+        try:
+            result = keyset_paginate(
+                query,
+                [(WeeklyReport.week_start, True), (WeeklyReport.created_at, True), (WeeklyReport.id, True)],
+                per_page, request.args.get('cursor'), request.args.get('count')
+            )
+        except InvalidPagination as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({
+            'reports': [serialize(report) for report in result.items],
+            **result.metadata()
+        }), 200
+    
+    validators = conditional(query, WeeklyReport, WeeklyReport.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
     
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    reports = [report.to_dict() for report in pagination.items]
+    reports = [serialize(report) for report in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'reports': reports,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 @reports_bp.route('/weekly/<int:report_id>', methods=['GET'])
 @login_required
 @permission_required('report_read')
 def get_weekly_report(report_id):
     """获取周报详情"""
-    report = WeeklyReport.query.get(report_id)
+    try:
+        fields = WeeklyReport.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = WeeklyReport.query.filter(WeeklyReport.id == report_id)
+    validators = conditional(query, WeeklyReport, WeeklyReport.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
+    
+    report = query.options(*WeeklyReport.serialized_fields.load_options(fields)).first()
     
     if not report:
         return jsonify({'message': '周报不存在'}), 404
     
-    return jsonify({
-        'report': report.to_dict()
-    }), 200
+    return validators.apply(jsonify({
+        'report': report.to_dict(fields)
+    })), 200
 
 @reports_bp.route('/weekly', methods=['POST'])
 @login_required
@@ -360,6 +450,8 @@ def create_weekly_report():
         }), 201
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
         return jsonify({'message': '周报创建失败'}), 500
 
 @reports_bp.route('/weekly/<int:report_id>', methods=['PUT'])
@@ -397,6 +489,8 @@ def update_weekly_report(report_id):
         }), 200
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
         return jsonify({'message': '周报更新失败'}), 500
 
 @reports_bp.route('/weekly/<int:report_id>/approve', methods=['POST'])
@@ -417,13 +511,19 @@ def approve_weekly_report(report_id):
     action = data.get('action')  # approve 或 reject
     comment = data.get('comment', '')
     
-    if action == 'approve':
-        success, message = report.approve(current_user.id, comment)
-    elif action == 'reject':
-        success, message = report.reject(current_user.id, comment)
-    else:
+    if action not in ('approve', 'reject'):
         return jsonify({'message': '无效的审核操作'}), 400
     
+    try:
+        if action == 'approve':
+            success, message = report.approve(current_user.id, comment)
+        else:
+            success, message = report.reject(current_user.id, comment)
+    except OperationalError as e:
+        if not is_database_locked(e):
+            raise
+        return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
+    
     if success:
         return jsonify({'message': message}), 200
     else:
@@ -431,70 +531,118 @@ def approve_weekly_report(report_id):
 
 # ==================== 报告统计接口 ====================
 
+def _parse_date(value):
+    """解析 YYYY-MM-DD 日期，格式错误时返回None（忽略该筛选条件）"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _week_start(column):
+    """日期所在周的周一（按数据库方言生成SQL表达式）"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return func.date(func.date_trunc('week', column))
+    if dialect in ('mysql', 'mariadb'):
+        return func.subdate(column, func.weekday(column))
+    # SQLite：先移到本周日，再回退6天
+    return func.date(column, 'weekday 0', '-6 days')
+
+def _status_summary(counts):
+    """将 {status: count} 汇总为 total/approved/pending/rejected"""
+    total = sum(counts.values())
+    approved = counts.get('approved', 0)
+    pending = counts.get('pending', 0)
+    return {
+        'total': total,
+        'approved': approved,
+        'pending': pending,
+        'rejected': total - approved - pending
+    }
+
+def _grouped_status_summary(query, model, *key_columns):
+    """按 key_columns 和状态分组计数，返回 {key元组: 状态汇总}"""
+    rows = query.with_entities(*key_columns, model.status, func.count(model.id)) \
+        .group_by(*key_columns, model.status).all()
+    
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(tuple(row[:-2]), {})[row[-2]] = row[-1]
+    return {key: _status_summary(counts) for key, counts in grouped.items()}
+
+def _report_statistics(query, model, week_column, breakdown, active_users_query):
+    """单类报告的统计：状态计数、可选的按用户/按周分组，以及启用用户提交率"""
+    counts = dict(query.with_entities(model.status, func.count(model.id)).group_by(model.status).all())
+    result = _status_summary(counts)
+    
+    if 'user' in breakdown:
+        by_user = _grouped_status_summary(query.join(User, model.user_id == User.id), model, model.user_id, User.name)
+        result['by_user'] = [
+            dict(user_id=user_id, user_name=user_name, **summary)
+            for (user_id, user_name), summary in sorted(by_user.items())
+        ]
+    
+    if 'week' in breakdown:
+        by_week = _grouped_status_summary(query, model, _week_start(week_column))
+        result['by_week'] = [
+            dict(week_start=str(week_start), **summary)
+            for (week_start,), summary in sorted(by_week.items())
+        ]
+    
+    # 提交率：启用用户中在筛选范围内没有任何报告的用户通过反连接（NOT EXISTS）统计
+    submitted = query.filter(model.user_id == User.id).exists()
+    active_users, missing_users = active_users_query.with_entities(
+        func.count(User.id),
+        func.coalesce(func.sum(case((~submitted, 1), else_=0)), 0)
+    ).one()
+    result['submission'] = {
+        'active_users': active_users,
+        'submitted_users': active_users - missing_users,
+        'missing_users': missing_users,
+        'rate': round((active_users - missing_users) / active_users, 4) if active_users else 0
+    }
+    return result
+
 @reports_bp.route('/statistics', methods=['GET'])
 @login_required
 @permission_required('report_read')
 def get_report_statistics():
-    """获取报告统计"""
+    """获取报告统计
+    
+    breakdown 参数可选 user、week（逗号分隔），返回按用户/按周的分组统计
+    """
     user_id = request.args.get('user_id', type=int)
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
+    start_date = _parse_date(request.args.get('start_date', ''))
+    end_date = _parse_date(request.args.get('end_date', ''))
+    breakdown = {item.strip() for item in request.args.get('breakdown', '').split(',') if item.strip()}
+    
+    active_users_query = User.query.filter(User.status == 'active')
+    if user_id:
+        active_users_query = active_users_query.filter(User.id == user_id)
     
     # 日报统计
     daily_query = DailyReport.query
     if user_id:
         daily_query = daily_query.filter(DailyReport.user_id == user_id)
     if start_date:
-        try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            daily_query = daily_query.filter(DailyReport.report_date >= start_date_obj)
-        except ValueError:
-            pass
+        daily_query = daily_query.filter(DailyReport.report_date >= start_date)
     if end_date:
-        try:
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            daily_query = daily_query.filter(DailyReport.report_date <= end_date_obj)
-        except ValueError:
-            pass
-    
-    daily_reports = daily_query.all()
-    daily_count = len(daily_reports)
-    daily_approved = len([r for r in daily_reports if r.status == 'approved'])
-    daily_pending = len([r for r in daily_reports if r.status == 'pending'])
+        daily_query = daily_query.filter(DailyReport.report_date <= end_date)
     
     # 周报统计
     weekly_query = WeeklyReport.query
     if user_id:
         weekly_query = weekly_query.filter(WeeklyReport.user_id == user_id)
     if start_date:
-        try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            weekly_query = weekly_query.filter(WeeklyReport.week_start >= start_date_obj)
-        except ValueError:
-            pass
+        weekly_query = weekly_query.filter(WeeklyReport.week_start >= start_date)
     if end_date:
-        try:
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            weekly_query = weekly_query.filter(WeeklyReport.week_end <= end_date_obj)
-        except ValueError:
-            pass
-    
-    weekly_reports = weekly_query.all()
-    weekly_count = len(weekly_reports)
-    weekly_approved = len([r for r in weekly_reports if r.status == 'approved'])
-    weekly_pending = len([r for r in weekly_reports if r.status == 'pending'])
+        weekly_query = weekly_query.filter(WeeklyReport.week_end <= end_date)
     
     return jsonify({
-        'daily_reports': {
-            'total': daily_count,
-            'approved': daily_approved,
-            'pending': daily_pending,
-            'rejected': daily_count - daily_approved - daily_pending
-        },
-        'weekly_reports': {
-            'total': weekly_count,
-            'approved': weekly_approved,
-            'pending': weekly_pending,
-            'rejected': weekly_count - weekly_approved - weekly_pending
-        }
+        'daily_reports': _report_statistics(daily_query, DailyReport, DailyReport.report_date,
+                                            breakdown, active_users_query),
+        'weekly_reports': _report_statistics(weekly_query, WeeklyReport, WeeklyReport.week_start,
+                                             breakdown, active_users_query)
     }), 200 
\ No newline at end of file
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
+from datetime import datetime
 from app import db
 from app.models import Role, Permission
+from app.models.fields import UnknownFields
 from app.middlewares.auth import login_required, role_required
+from app.services.conditional import conditional
+from app.services.permission_cache import invalidate_user_permissions, invalidate_permission_index
 
 roles_bp = Blueprint('roles', __name__)
 
@@ -10,25 +14,44 @@ roles_bp = Blueprint('roles', __name__)
 @role_required('admin')
 def get_roles():
     """获取角色列表"""
-    roles = Role.query.all()
+    try:
+        fields = Role.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
     
-    return jsonify({
-        'roles': [role.to_dict() for role in roles]
-    }), 200
+    validators = conditional(Role.query, Role, Role.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
+    roles = Role.query.options(*Role.serialized_fields.load_options(fields)).all()
+    
+    return validators.apply(jsonify({
+        'roles': [role.to_dict(fields) for role in roles]
+    })), 200
 
 @roles_bp.route('/<int:role_id>', methods=['GET'])
 @login_required
 @role_required('admin')
 def get_role(role_id):
     """获取角色详情"""
-    role = Role.query.get(role_id)
+    try:
+        fields = Role.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = Role.query.filter(Role.id == role_id)
+    validators = conditional(query, Role, Role.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
+    role = query.options(*Role.serialized_fields.load_options(fields)).first()
     
     if not role:
         return jsonify({'message': '角色不存在'}), 404
     
-    return jsonify({
-        'role': role.to_dict()
-    }), 200
+    return validators.apply(jsonify({
+        'role': role.to_dict(fields)
+    })), 200
 
 @roles_bp.route('/', methods=['POST'])
 @login_required
@@ -99,9 +122,11 @@ def update_role(role_id):
             Permission.name.in_(data['permissions'])
         ).all()
         role.permissions = permissions
+        role.updated_at = datetime.utcnow()  # 关联表变化不触发 onupdate
     
     try:
         db.session.commit()
+        invalidate_user_permissions()
         return jsonify({
             'message': '角色更新成功',
             'role': role.to_dict()
@@ -127,6 +152,7 @@ def delete_role(role_id):
     try:
         db.session.delete(role)
         db.session.commit()
+        invalidate_user_permissions()
         return jsonify({'message': '角色删除成功'}), 200
     except Exception as e:
         db.session.rollback()
@@ -166,6 +192,7 @@ def create_permission():
     try:
         db.session.add(permission)
         db.session.commit()
+        invalidate_permission_index()
         
         return jsonify({
             'message': '权限创建成功',
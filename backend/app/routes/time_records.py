@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, date, timedelta
+from sqlalchemy import func, distinct
+from sqlalchemy.exc import OperationalError
 from app import db
-from app.models import TimeRecord, WorkType, User, Project
-from app.middlewares.auth import login_required, role_required
+from app.database import is_database_locked, DATABASE_BUSY_MESSAGE
+from app.models import TimeRecord, WorkType, Project, DailyWorkRollup
+from app.models.fields import UnknownFields
+from app.middlewares.auth import login_required, role_required, get_current_user
+from app.services.conditional import conditional
+from app.services.pagination import keyset_paginate, InvalidPagination
 
 time_records_bp = Blueprint('time_records', __name__)
 
@@ -18,6 +24,11 @@ def get_time_records():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
+    try:
+        fields = TimeRecord.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
     query = TimeRecord.query
     
     if user_id:
@@ -45,39 +56,72 @@ def get_time_records():
     
     # 按日期倒序排列
     query = query.order_by(TimeRecord.work_date.desc(), TimeRecord.created_at.desc())
+    query, serialize = TimeRecord.serialized_fields.read_query(query, fields, columns=('work_date', 'created_at'))
+    
+    if 'cursor' in request.args:
+        # 游标模式：按排序键（末尾补ID）翻页，不使用 OFFSET；count=exact/capped 时统计总数
+        try:
+            result = keyset_paginate(
+                query,
+                [(TimeRecord.work_date, True), (TimeRecord.created_at, True), (TimeRecord.id, True)],
+                per_page, request.args.get('cursor'), request.args.get('count')
+            )
+        except InvalidPagination as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({
+            'records': [serialize(record) for record in result.items],
+            **result.metadata()
+        }), 200
+    
+    # 结果集未变化时直接返回304；校验值查询同时得到分页总数（游标模式不统计结果集，不做条件请求）
+    validators = conditional(query, TimeRecord, TimeRecord.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
     
     pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
+    pagination.total = validators.total
     
-    records = [record.to_dict() for record in pagination.items]
+    records = [serialize(record) for record in pagination.items]
     
-    return jsonify({
+    return validators.apply(jsonify({
         'records': records,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page,
         'per_page': per_page
-    }), 200
+    })), 200
 
 @time_records_bp.route('/<int:record_id>', methods=['GET'])
 @login_required
 def get_time_record(record_id):
     """获取时间记录详情"""
-    record = TimeRecord.query.get(record_id)
+    try:
+        fields = TimeRecord.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = TimeRecord.query.filter(TimeRecord.id == record_id)
+    validators = conditional(query, TimeRecord, TimeRecord.serialized_fields.related_models(fields))
+    if validators.matches():
+        return validators.not_modified()
+    
+    record = query.options(*TimeRecord.serialized_fields.load_options(fields)).first()
     
     if not record:
         return jsonify({'message': '时间记录不存在'}), 404
     
-    return jsonify({
-        'record': record.to_dict()
-    }), 200
+    return validators.apply(jsonify({
+        'record': record.to_dict(fields)
+    })), 200
 
 @time_records_bp.route('/', methods=['POST'])
 @login_required
 def create_time_record():
     """创建时间记录"""
-    current_user = request.current_user
+    current_user = get_current_user()
     data = request.get_json()
     
     # 验证必填字段
@@ -143,13 +187,15 @@ def create_time_record():
         }), 201
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
         return jsonify({'message': '时间记录创建失败'}), 500
 
 @time_records_bp.route('/<int:record_id>', methods=['PUT'])
 @login_required
 def update_time_record(record_id):
     """更新时间记录"""
-    current_user = request.current_user
+    current_user = get_current_user()
     record = TimeRecord.query.get(record_id)
     
     if not record:
@@ -196,7 +242,7 @@ def update_time_record(record_id):
 @login_required
 def delete_time_record(record_id):
     """删除时间记录"""
-    current_user = request.current_user
+    current_user = get_current_user()
     record = TimeRecord.query.get(record_id)
     
     if not record:
@@ -210,6 +256,7 @@ def delete_time_record(record_id):
         return jsonify({'message': '已审核的记录不能删除'}), 400
     
     try:
+        # 只能删除待审核记录，日汇总不受影响
         db.session.delete(record)
         db.session.commit()
         return jsonify({'message': '时间记录删除成功'}), 200
@@ -221,7 +268,7 @@ def delete_time_record(record_id):
 @login_required
 def approve_time_record(record_id):
     """审核时间记录"""
-    current_user = request.current_user
+    current_user = get_current_user()
     record = TimeRecord.query.get(record_id)
     
     if not record:
@@ -234,13 +281,19 @@ def approve_time_record(record_id):
     action = data.get('action')  # approve 或 reject
     comment = data.get('comment', '')
     
-    if action == 'approve':
-        success, message = record.approve(current_user.id, comment)
-    elif action == 'reject':
-        success, message = record.reject(current_user.id, comment)
-    else:
+    if action not in ('approve', 'reject'):
         return jsonify({'message': '无效的审核操作'}), 400
     
+    try:
+        if action == 'approve':
+            success, message = record.approve(current_user.id, comment)
+        else:
+            success, message = record.reject(current_user.id, comment)
+    except OperationalError as e:
+        if not is_database_locked(e):
+            raise
+        return jsonify({'message': DATABASE_BUSY_MESSAGE}), 503
+    
     if success:
         return jsonify({'message': message}), 200
     else:
@@ -255,45 +308,46 @@ def get_time_statistics():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
-    query = TimeRecord.query.filter(TimeRecord.status == 'approved')
+    # 读取已审批工时日汇总，开销与日期范围内的天数成正比
+    query = DailyWorkRollup.query
     
     if user_id:
-        query = query.filter(TimeRecord.user_id == user_id)
+        query = query.filter(DailyWorkRollup.user_id == user_id)
     
     if project_id:
-        query = query.filter(TimeRecord.project_id == project_id)
+        query = query.filter(DailyWorkRollup.project_id == project_id)
     
     if start_date:
         try:
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(TimeRecord.work_date >= start_date_obj)
+            query = query.filter(DailyWorkRollup.work_date >= start_date_obj)
         except ValueError:
             pass
     
     if end_date:
         try:
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(TimeRecord.work_date <= end_date_obj)
+            query = query.filter(DailyWorkRollup.work_date <= end_date_obj)
         except ValueError:
             pass
     
-    records = query.all()
+    totals = query.with_entities(
+        func.coalesce(func.sum(DailyWorkRollup.hours), 0),
+        func.count(distinct(DailyWorkRollup.work_date))
+    ).one()
+    total_hours = float(totals[0])
+    total_days = totals[1]
     
-    # 计算统计信息
-    total_hours = sum(float(record.hours) for record in records)
-    total_days = len(set(record.work_date for record in records))
+    # 按项目名称统计（工作天数按项目名称去重，与原逻辑一致）
+    project_rows = query.outerjoin(Project, DailyWorkRollup.project_id == Project.id).with_entities(
+        Project.name,
+        func.sum(DailyWorkRollup.hours),
+        func.count(distinct(DailyWorkRollup.work_date))
+    ).group_by(Project.name).all()
     
-    # 按项目统计
     project_stats = {}
-    for record in records:
-        project_name = record.project.name if record.project else '未知项目'
-        if project_name not in project_stats:
-            project_stats[project_name] = {'hours': 0, 'days': set()}
-        project_stats[project_name]['hours'] += float(record.hours)
-        project_stats[project_name]['days'].add(record.work_date)
-    
-    for project_name in project_stats:
-        project_stats[project_name]['days'] = len(project_stats[project_name]['days'])
+    for project_name, hours, days in project_rows:
+        project_stats[project_name or '未知项目'] = {'hours': float(hours or 0), 'days': days}
     
     return jsonify({
         'total_hours': total_hours,
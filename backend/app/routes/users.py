@@ -1,32 +1,126 @@
 from flask import Blueprint, request, jsonify
+from datetime import datetime
+from sqlalchemy import or_
 from app import db
-from app.models import User, Role
+from app.models import User, Role, UserRateHistory
+from app.models.fields import UnknownFields
 from app.middlewares.auth import login_required, role_required
+from app.services.conditional import conditional
+from app.services.permission_cache import invalidate_user_permissions
+from app.services.user_directory import get_user_directory, invalidate_user_directory, DEFAULT_PICKER_LIMIT, MAX_PICKER_LIMIT
+from app.services.rate_history import record_rate_change, apply_rate_fields, invalidate_rate_index, HISTORY_START
+from app.services.work_rollup import refresh_user_rollups
 
 users_bp = Blueprint('users', __name__)
 
 @users_bp.route('/', methods=['GET'])
 @login_required
 def get_users():
-    """获取用户列表 - 所有登录用户都可以访问"""
-    users = User.query.all()
+    """获取用户列表（分页、筛选）- 所有登录用户都可以访问"""
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    after_id = request.args.get('after_id', type=int)  # 游标模式：返回ID大于after_id的用户
+    department = request.args.get('department', '')
+    status = request.args.get('status', '')
+    role = request.args.get('role', '')
+    search = request.args.get('search', '')
+    
+    try:
+        fields = User.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = User.query.options(*User.serialized_fields.load_options(fields))
+    
+    if department:
+        query = query.filter(User.department == department)
+    
+    if status:
+        query = query.filter(User.status == status)
+    
+    if role:
+        query = query.filter(User.roles.any(Role.name == role))
+    
+    if search:
+        # 姓名/用户名/工号前缀匹配
+        prefix = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(or_(
+            User.name.like(prefix, escape='\\'),
+            User.username.like(prefix, escape='\\'),
+            User.employee_id.like(prefix, escape='\\')
+        ))
+    
+    query = query.order_by(User.id)
+    
+    validators = conditional(query, User, User.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
+    if after_id is not None:
+        users = query.filter(User.id > after_id).limit(per_page + 1).all()
+        has_more = len(users) > per_page
+        users = users[:per_page]
+        return validators.apply(jsonify({
+            'users': [user.to_dict(fields) for user in users],
+            'per_page': per_page,
+            'next_cursor': users[-1].id if has_more else None
+        })), 200
+    
+    pagination = query.paginate(
+        page=page, per_page=per_page, error_out=False, count=False
+    )
+    pagination.total = validators.total
+    
+    return validators.apply(jsonify({
+        'users': [user.to_dict(fields) for user in pagination.items],
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'current_page': page,
+        'per_page': per_page
+    })), 200
+
+@users_bp.route('/picker', methods=['GET'])
+@login_required
+def get_user_picker():
+    """用户选择器：仅返回启用用户的ID、姓名、部门
+
+    每页最多 MAX_PICKER_LIMIT 个，按ID排序；has_more 为 true 时以本页最后一个ID作为 after_id 获取下一页。
+    """
+    search = request.args.get('q', '')
+    department = request.args.get('department', '')
+    limit = min(max(request.args.get('limit', DEFAULT_PICKER_LIMIT, type=int), 1), MAX_PICKER_LIMIT)
+    after_id = request.args.get('after_id', type=int)
+    
+    # 多取一个用户判断是否还有下一页
+    users = get_user_directory().search(prefix=search, department=department, limit=limit + 1, after_id=after_id)
     
     return jsonify({
-        'users': [user.to_dict() for user in users]
+        'users': users[:limit],
+        'has_more': len(users) > limit
     }), 200
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
 @login_required
 def get_user(user_id):
     """获取用户详情 - 所有登录用户都可以访问"""
-    user = User.query.get(user_id)
+    try:
+        fields = User.serialized_fields.parse(request.args.get('fields'))
+    except UnknownFields as e:
+        return jsonify({'message': f'未知字段: {e}'}), 400
+    
+    query = User.query.filter(User.id == user_id)
+    validators = conditional(query, User, User.serialized_fields.related_models(fields), reference=True)
+    if validators.matches():
+        return validators.not_modified()
+    
+    user = query.options(*User.serialized_fields.load_options(fields)).first()
     
     if not user:
         return jsonify({'message': '用户不存在'}), 404
     
-    return jsonify({
-        'user': user.to_dict()
-    }), 200
+    return validators.apply(jsonify({
+        'user': user.to_dict(fields)
+    })), 200
 
 @users_bp.route('/', methods=['POST'])
 @login_required
@@ -74,9 +168,19 @@ def create_user():
         roles = Role.query.filter(Role.name.in_(data['roles'])).all()
         user.roles = roles
     
+    # 登记初始费率
+    if user.hourly_rate is not None or user.monthly_salary is not None:
+        try:
+            record_rate_change(user, user.hourly_rate, user.monthly_salary)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'message': str(e)}), 400
+    
     try:
         db.session.add(user)
         db.session.commit()
+        invalidate_user_directory()
+        invalidate_rate_index()
         
         return jsonify({
             'message': '用户创建成功',
@@ -104,9 +208,13 @@ def update_user(user_id):
         'hourly_rate', 'monthly_salary', 'cost_calculation_method'
     ]
     
-    for field in allowed_fields:
-        if field in data:
-            setattr(user, field, data[field])
+    # 时薪/月薪变更同时登记费率历史
+    previous_method = user.cost_calculation_method
+    try:
+        rate_changed = apply_rate_fields(user, data, allowed_fields)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     
     # 更新角色
     if 'roles' in data:
@@ -115,9 +223,19 @@ def update_user(user_id):
             user.roles = roles
         else:
             user.roles = []  # 清空角色
+        user.updated_at = datetime.utcnow()  # 关联表变化不触发 onupdate
     
     try:
+        # 费率或成本计算方式变化后重算受影响月份的工时日汇总
+        rollup_from = HISTORY_START if user.cost_calculation_method != previous_method else rate_changed
+        if rollup_from:
+            refresh_user_rollups(user.id, rollup_from)
         db.session.commit()
+        if 'roles' in data:
+            invalidate_user_permissions(user_id)
+        invalidate_user_directory()
+        if rate_changed:
+            invalidate_rate_index()
         return jsonify({
             'message': '用户更新成功',
             'user': user.to_dict()
@@ -139,11 +257,30 @@ def delete_user(user_id):
     try:
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_permissions(user_id)
+        invalidate_user_directory()
+        invalidate_rate_index()
         return jsonify({'message': '用户删除成功'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': '用户删除失败'}), 500
 
+@users_bp.route('/<int:user_id>/rate-history', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_user_rate_history(user_id):
+    """获取用户时薪/月薪历史"""
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'message': '用户不存在'}), 404
+    
+    history = user.rate_history.order_by(UserRateHistory.effective_from).all()
+    
+    return jsonify({
+        'rate_history': [item.to_dict() for item in history]
+    }), 200
+
 @users_bp.route('/<int:user_id>/status', methods=['PUT'])
 @login_required
 @role_required('admin')
@@ -164,6 +301,7 @@ def update_user_status(user_id):
     
     try:
         db.session.commit()
+        invalidate_user_directory()
         return jsonify({
             'message': '用户状态更新成功',
             'user': user.to_dict()
@@ -211,12 +349,19 @@ def update_profile():
     # 允许更新的字段
     allowed_fields = ['name', 'email', 'department', 'position', 'hourly_rate', 'monthly_salary']
     
-    for field in allowed_fields:
-        if field in data:
-            setattr(current_user, field, data[field])
+    try:
+        rate_changed = apply_rate_fields(current_user, data, allowed_fields)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     
     try:
+        if rate_changed:
+            refresh_user_rollups(current_user.id, rate_changed)
         db.session.commit()
+        invalidate_user_directory()
+        if rate_changed:
+            invalidate_rate_index()
         return jsonify({
             'message': '个人资料更新成功',
             'profile': current_user.to_dict()
@@ -296,12 +441,21 @@ def update_settings():
     # 允许更新的设置字段
     allowed_fields = ['cost_calculation_method', 'hourly_rate', 'monthly_salary']
     
-    for field in allowed_fields:
-        if field in data:
-            setattr(current_user, field, data[field])
+    previous_method = current_user.cost_calculation_method
+    try:
+        rate_changed = apply_rate_fields(current_user, data, allowed_fields)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     
     try:
+        # 费率或成本计算方式变化后重算受影响月份的工时日汇总
+        rollup_from = HISTORY_START if current_user.cost_calculation_method != previous_method else rate_changed
+        if rollup_from:
+            refresh_user_rollups(current_user.id, rollup_from)
         db.session.commit()
+        if rate_changed:
+            invalidate_rate_index()
         return jsonify({
             'message': '设置更新成功',
             'settings': {
@@ -0,0 +1,88 @@
+"""
+访问令牌服务
+
+签发/校验带签名的 Bearer 令牌。访问令牌内嵌用户ID、角色名和权限位图，
+鉴权时无需访问数据库；刷新令牌只携带用户ID，用于换取新的访问令牌。
+"""
+from datetime import timedelta
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from app.services.permission_cache import UserPermissions, get_permission_index
+
+ACCESS_TOKEN_SALT = 'access-token'
+REFRESH_TOKEN_SALT = 'refresh-token'
+
+DEFAULT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=30)
+DEFAULT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
+def _serializer(salt):
+    secret_key = current_app.config.get('JWT_SECRET_KEY') or current_app.config['SECRET_KEY']
+    return URLSafeTimedSerializer(secret_key, salt=salt)
+
+def _expires_seconds(key, default):
+    return int(current_app.config.get(key, default).total_seconds())
+
+def encode_permission_bitmap(permission_names):
+    """将权限名称集合编码为按权限ID置位的十六进制位图"""
+    name_to_id, _ = get_permission_index()
+    bitmap = 0
+    for name in permission_names:
+        permission_id = name_to_id.get(name)
+        if permission_id is None:
+            name_to_id, _ = get_permission_index(refresh=True)
+            permission_id = name_to_id.get(name)
+        if permission_id is not None:
+            bitmap |= 1 << permission_id
+    return format(bitmap, 'x')
+
+def decode_permission_bitmap(bitmap):
+    """将十六进制位图解码为权限名称集合"""
+    bitmap = int(bitmap, 16)
+    _, id_to_name = get_permission_index()
+    if bitmap >> (max(id_to_name, default=0) + 1):
+        # 令牌中含有本进程尚未见过的权限ID
+        _, id_to_name = get_permission_index(refresh=True)
+
+    permissions = set()
+    permission_id = 0
+    while bitmap:
+        if bitmap & 1 and permission_id in id_to_name:
+            permissions.add(id_to_name[permission_id])
+        bitmap >>= 1
+        permission_id += 1
+    return permissions
+
+def issue_tokens(user_permissions):
+    """为用户签发访问令牌和刷新令牌"""
+    access_token = _serializer(ACCESS_TOKEN_SALT).dumps({
+        'uid': user_permissions.user_id,
+        'roles': sorted(user_permissions.roles),
+        'perms': encode_permission_bitmap(user_permissions.permissions)
+    })
+    refresh_token = _serializer(REFRESH_TOKEN_SALT).dumps({
+        'uid': user_permissions.user_id
+    })
+    return {
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'token_type': 'Bearer',
+        'expires_in': _expires_seconds('JWT_ACCESS_TOKEN_EXPIRES', DEFAULT_ACCESS_TOKEN_EXPIRES)
+    }
+
+def verify_access_token(token):
+    """校验访问令牌，成功返回 UserPermissions，失败返回None"""
+    max_age = _expires_seconds('JWT_ACCESS_TOKEN_EXPIRES', DEFAULT_ACCESS_TOKEN_EXPIRES)
+    try:
+        claims = _serializer(ACCESS_TOKEN_SALT).loads(token, max_age=max_age)
+        return UserPermissions(claims['uid'], claims['roles'], decode_permission_bitmap(claims['perms']))
+    except (BadSignature, SignatureExpired, KeyError, TypeError, ValueError):
+        return None
+
+def verify_refresh_token(token):
+    """校验刷新令牌，成功返回用户ID，失败返回None"""
+    max_age = _expires_seconds('JWT_REFRESH_TOKEN_EXPIRES', DEFAULT_REFRESH_TOKEN_EXPIRES)
+    try:
+        claims = _serializer(REFRESH_TOKEN_SALT).loads(token, max_age=max_age)
+        return claims['uid']
+    except (BadSignature, SignatureExpired, KeyError, TypeError):
+        return None
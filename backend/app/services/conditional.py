@@ -0,0 +1,67 @@
+"""
+条件请求（ETag）
+
+列表和详情接口先用一次聚合查询取得结果集的校验值：max(updated_at) 与行数，
+以及响应中引用的其他表（关联名称、角色、权限等）的 max(updated_at) 与行数；
+没有 updated_at 的表使用行数与最大ID。校验值连同请求路径、参数和当前用户生成弱 ETag。
+客户端的 If-None-Match 匹配时直接返回 304，不再查询明细、不序列化。
+不提供 Last-Modified / If-Modified-Since：最大更新时间（秒级）无法反映删除行或同一秒内的写入，
+只有同时包含行数的 ETag 能可靠判断结果集是否变化。
+
+Cache-Control 区分基础数据（用户、角色、项目）与业务数据（工时、日报周报、成本），
+取值见配置 CACHE_CONTROL_REFERENCE / CACHE_CONTROL_TRANSACTIONAL。
+"""
+import hashlib
+from flask import current_app, request
+from sqlalchemy import func, select
+from app.middlewares.auth import get_current_user_id
+
+DEFAULT_CACHE_CONTROL_REFERENCE = 'private, no-cache, stale-if-error=3600'
+DEFAULT_CACHE_CONTROL_TRANSACTIONAL = 'private, no-cache'
+
+def _table_expressions(model):
+    """表级校验值（标量子查询）"""
+    if hasattr(model, 'updated_at'):
+        latest = select(func.max(model.updated_at)).scalar_subquery()
+    else:
+        latest = select(func.max(model.id)).scalar_subquery()
+    return [latest, select(func.count()).select_from(model).scalar_subquery()]
+
+class Validators:
+    """一次请求的校验值及对应的响应头"""
+
+    def __init__(self, values, total, reference):
+        self.total = total
+        self.reference = reference
+
+        content = repr((request.full_path, get_current_user_id(), values))
+        self.etag = hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+
+    def matches(self):
+        """请求携带的 ETag 与当前一致（可以返回304）"""
+        return bool(request.if_none_match) and request.if_none_match.contains_weak(self.etag)
+
+    def apply(self, response):
+        """为响应设置 ETag 和 Cache-Control"""
+        response.set_etag(self.etag, weak=True)
+        key = 'CACHE_CONTROL_REFERENCE' if self.reference else 'CACHE_CONTROL_TRANSACTIONAL'
+        default = DEFAULT_CACHE_CONTROL_REFERENCE if self.reference else DEFAULT_CACHE_CONTROL_TRANSACTIONAL
+        response.headers['Cache-Control'] = current_app.config.get(key, default)
+        return response
+
+    def not_modified(self):
+        """304 响应"""
+        return self.apply(current_app.response_class(status=304))
+
+def conditional(query, model, related=(), reference=False):
+    """按查询的结果集（过滤条件之后、分页之前）计算校验值
+
+    related 为响应中还引用了的模型（如关联名称所在的 users 表），其变化同样使校验值改变。
+    reference 为 True 表示基础数据。返回的 Validators.total 为结果集行数，可直接作为分页总数。
+    """
+    expressions = [func.max(model.updated_at), func.count()]
+    for related_model in dict.fromkeys(related):
+        expressions += _table_expressions(related_model)
+
+    values = tuple(query.order_by(None).with_entities(*expressions).one())
+    return Validators(values, values[1], reference)
@@ -0,0 +1,124 @@
+"""
+成本聚合服务
+
+在数据库中汇总成本计算和项目成本（总额、工时、平均时薪及按用户/项目/日期分组），
+避免将全部明细加载为ORM对象。金额按列的小数位换算为整数后求和，
+保证在 SQLite（浮点存储）下同样得到精确的十进制结果。
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import func, cast, BigInteger
+from app.models import CostCalculation, ProjectCost, User, Project
+
+CENT = Decimal('0.01')
+
+def scaled_integer(column):
+    """按列小数位放大并取整的SQL表达式（64位整数：PostgreSQL 的 INTEGER 为32位，金额放大后可能溢出）"""
+    return cast(func.round(column * 10 ** (column.type.scale or 0)), BigInteger)
+
+def exact_sum(column):
+    """按列小数位放大为整数后求和的SQL表达式"""
+    return func.coalesce(func.sum(scaled_integer(column)), 0)
+
+def from_scaled(value, column):
+    """将 exact_sum 的结果还原为 Decimal"""
+    return Decimal(int(value or 0)).scaleb(-(column.type.scale or 0))
+
+def average_cost_per_hour(total_cost, total_hours):
+    """平均每小时成本，保留两位小数"""
+    if not total_hours:
+        return Decimal('0')
+    return (total_cost / total_hours).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def summarize(query, cost_column, hours_column):
+    """汇总查询范围内的总成本、总工时、记录数和平均时薪"""
+    cost, hours, count = query.with_entities(
+        exact_sum(cost_column), exact_sum(hours_column), func.count()
+    ).order_by(None).one()
+    total_cost = from_scaled(cost, cost_column)
+    total_hours = from_scaled(hours, hours_column)
+    return {
+        'total_cost': total_cost,
+        'total_hours': total_hours,
+        'record_count': count,
+        'average_cost_per_hour': average_cost_per_hour(total_cost, total_hours)
+    }
+
+def summarize_calculations(query):
+    """汇总成本计算记录"""
+    return summarize(query, CostCalculation.total_cost, CostCalculation.work_hours)
+
+def breakdown_calculations(query, dimension):
+    """按用户(user)、项目(project)或日期(day)分组汇总成本计算记录"""
+    if dimension == 'user':
+        query = query.outerjoin(User, CostCalculation.user_id == User.id)
+        keys = [CostCalculation.user_id, User.name]
+        names = ('user_id', 'user_name')
+    elif dimension == 'project':
+        query = query.outerjoin(Project, CostCalculation.project_id == Project.id)
+        keys = [CostCalculation.project_id, Project.name]
+        names = ('project_id', 'project_name')
+    elif dimension == 'day':
+        keys = [CostCalculation.calculation_date]
+        names = ('date',)
+    else:
+        raise ValueError(f'不支持的分组维度: {dimension}')
+
+    rows = query.with_entities(
+        *keys,
+        exact_sum(CostCalculation.total_cost),
+        exact_sum(CostCalculation.work_hours),
+        func.count()
+    ).group_by(*keys).order_by(keys[0]).all()
+
+    results = []
+    for row in rows:
+        item = dict(zip(names, row[:len(keys)]))
+        if 'date' in item:
+            item['date'] = item['date'].isoformat()
+        total_cost = from_scaled(row[-3], CostCalculation.total_cost)
+        total_hours = from_scaled(row[-2], CostCalculation.work_hours)
+        item.update({
+            'total_cost': total_cost,
+            'total_hours': total_hours,
+            'record_count': row[-1],
+            'average_cost_per_hour': average_cost_per_hour(total_cost, total_hours)
+        })
+        results.append(item)
+    return results
+
+def summarize_project_costs(query):
+    """汇总项目成本记录"""
+    return summarize(query, ProjectCost.total_cost, ProjectCost.total_hours)
+
+def breakdown_project_costs(query):
+    """按统计周期分组汇总项目成本记录"""
+    keys = [ProjectCost.calculation_period, ProjectCost.period_start, ProjectCost.period_end]
+    rows = query.with_entities(
+        *keys,
+        exact_sum(ProjectCost.total_cost),
+        exact_sum(ProjectCost.total_hours)
+    ).group_by(*keys).order_by(ProjectCost.period_start).all()
+
+    results = []
+    for calculation_period, period_start, period_end, cost, hours in rows:
+        total_cost = from_scaled(cost, ProjectCost.total_cost)
+        total_hours = from_scaled(hours, ProjectCost.total_hours)
+        results.append({
+            'calculation_period': calculation_period,
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat(),
+            'total_cost': total_cost,
+            'total_hours': total_hours,
+            'average_cost_per_hour': average_cost_per_hour(total_cost, total_hours)
+        })
+    return results
+
+def to_json_numbers(value):
+    """将结果中的 Decimal 转换为 float，便于 JSON 序列化（与各模型 to_dict 一致）"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return {key: to_json_numbers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_json_numbers(item) for item in value]
+    return value
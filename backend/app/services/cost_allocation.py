@@ -0,0 +1,201 @@
+"""
+成本分摊引擎
+
+按自然月将已审批工时记录加载为列式数组（NumPy），计算每条工时记录的成本：
+- 按时薪计算的员工：工时 × 工作日期当时的时薪
+- 按月薪计算的员工：当月月薪按各条记录工时占当月总工时的比例分摊到项目
+
+金额全部以“分”为单位的整数运算，月薪分摊的尾差按最大余数法补齐，
+保证每位月薪员工每月分摊合计恰好等于月薪。结果用于成本计算记录和项目成本。
+"""
+import calendar
+from decimal import Decimal
+import numpy as np
+from sqlalchemy import select, cast, String
+from app import db
+from app.models import TimeRecord, User
+from app.services.cost_aggregates import scaled_integer
+from app.services.rate_history import load_rate_index
+
+def month_start(day):
+    """所在月第一天"""
+    return day.replace(day=1)
+
+def month_end(day):
+    """所在月最后一天"""
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+def _cents(value):
+    """金额/工时转换为以0.01为单位的整数"""
+    if value is None:
+        return 0
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+class CostAllocation:
+    """分摊结果：每条工时记录一行的列式数组"""
+
+    def __init__(self, record_ids, user_ids, project_ids, work_dates, hours, rates, costs, monthly):
+        self.record_ids = record_ids    # int64，工时记录ID
+        self.user_ids = user_ids        # int64
+        self.project_ids = project_ids  # int64
+        self.work_dates = work_dates    # datetime64[D]
+        self.hours = hours              # int64，单位0.01小时
+        self.rates = rates              # int64，时薪，单位分（月薪分摊为折算时薪）
+        self.costs = costs              # int64，单位分
+        self.monthly = monthly          # bool，是否按月薪分摊
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def select(self, mask):
+        """按布尔掩码筛选行"""
+        return CostAllocation(self.record_ids[mask], self.user_ids[mask], self.project_ids[mask], self.work_dates[mask],
+                              self.hours[mask], self.rates[mask], self.costs[mask], self.monthly[mask])
+
+    def within(self, start_date, end_date, project_ids=None):
+        """筛选日期范围（及项目）内的行"""
+        mask = (self.work_dates >= np.datetime64(start_date, 'D')) & (self.work_dates <= np.datetime64(end_date, 'D'))
+        if project_ids:
+            mask &= np.isin(self.project_ids, list(project_ids))
+        return self.select(mask)
+
+    def records(self):
+        """逐行返回 (user_id, project_id, work_date, 工时, 时薪, 成本, 计算方式)，金额为 Decimal"""
+        for user_id, project_id, work_date, hours, rate, cost, monthly in zip(
+                self.user_ids.tolist(), self.project_ids.tolist(), self.work_dates.tolist(),
+                self.hours.tolist(), self.rates.tolist(), self.costs.tolist(), self.monthly.tolist()):
+            yield (user_id, project_id, work_date, Decimal(hours).scaleb(-2), Decimal(rate).scaleb(-2),
+                   Decimal(cost).scaleb(-2), 'monthly' if monthly else 'hourly')
+
+class _RateLookup:
+    """将费率历史区间展开为按（用户序号, 起始日期）排序的数组，批量二分查找每行适用的费率"""
+
+    # 用户序号与日期编码为同一个整数键：用户序号 * _DAY_SPAN + 日期偏移
+    _DAY_SPAN = 1 << 32
+    _DAY_OFFSET = 1 << 31
+
+    def __init__(self, rate_index, unique_users):
+        keys, hourly, salaries = [], [], []
+        self.first = np.full(len(unique_users), -1, dtype=np.int64)
+        for position, user_id in enumerate(unique_users.tolist()):
+            intervals = rate_index.intervals(user_id)
+            if not intervals:
+                continue
+            self.first[position] = len(keys)
+            starts = np.array(intervals[0], dtype='datetime64[D]').astype(np.int64)
+            keys.extend((position * self._DAY_SPAN + starts + self._DAY_OFFSET).tolist())
+            hourly.extend(_cents(rate[0]) for rate in intervals[1])
+            salaries.extend(_cents(rate[1]) for rate in intervals[1])
+        self.keys = np.array(keys, dtype=np.int64)
+        self.hourly = np.array(hourly, dtype=np.int64)
+        self.salaries = np.array(salaries, dtype=np.int64)
+
+    def values(self, user_index, dates, table, defaults):
+        """返回每行（用户序号, 日期）适用的费率；早于第一个区间时取最早的费率，没有历史时取 defaults"""
+        if not len(self.keys):
+            return defaults[user_index].copy()
+        keys = user_index * self._DAY_SPAN + dates.astype(np.int64) + self._DAY_OFFSET
+        positions = np.searchsorted(self.keys, keys, side='right') - 1
+        # 找到的区间属于其他用户（日期早于该用户第一个区间）时改用该用户的第一个区间
+        owner_start = user_index * self._DAY_SPAN
+        positions = np.where((positions >= 0) & (self.keys[np.maximum(positions, 0)] >= owner_start),
+                             positions, self.first[user_index])
+        return np.where(positions >= 0, table[np.maximum(positions, 0)], defaults[user_index])
+
+def _empty():
+    empty = np.array([], dtype=np.int64)
+    return CostAllocation(empty, empty, empty, np.array([], dtype='datetime64[D]'), empty, empty, empty, np.array([], dtype=bool))
+
+def allocate_costs(start_date, end_date, user_ids=None, department=None, rate_index=None):
+    """计算 start_date 至 end_date 所在各自然月内已审批工时记录的成本
+
+    月薪分摊需要整月的工时，因此总是加载完整月份；调用方可用 within() 截取所需范围。
+    结果会写入成本计算记录和日汇总，因此默认从数据库加载所涉及用户的费率历史（不使用进程内缓存，
+    其他进程的费率变更立即生效）；rate_index 可传入已加载的索引。
+    """
+    range_start = month_start(start_date)
+    range_end = month_end(end_date)
+
+    # 使用 Core 查询直接取元组，日期以 ISO 字符串返回，由 NumPy 批量解析
+    query = select(
+        TimeRecord.id,
+        TimeRecord.user_id,
+        TimeRecord.project_id,
+        cast(TimeRecord.work_date, String),
+        scaled_integer(TimeRecord.hours)
+    ).where(
+        TimeRecord.status == 'approved',
+        TimeRecord.work_date >= range_start,
+        TimeRecord.work_date <= range_end
+    )
+    if user_ids is not None:
+        query = query.where(TimeRecord.user_id.in_(user_ids))
+    if department:
+        query = query.join(User, TimeRecord.user_id == User.id).where(User.department == department)
+
+    rows = db.session.connection().execute(query).all()
+    if not rows:
+        return _empty()
+
+    record_ids, record_users, record_projects, record_dates, record_hours = zip(*rows)
+    record_ids = np.array(record_ids, dtype=np.int64)
+    record_users = np.array(record_users, dtype=np.int64)
+    record_projects = np.array(record_projects, dtype=np.int64)
+    record_dates = np.array(record_dates, dtype='datetime64[D]')
+    record_hours = np.array(record_hours, dtype=np.int64)
+
+    # 用户信息：计算方式和当前费率（没有费率历史时使用）
+    unique_users, user_index = np.unique(record_users, return_inverse=True)
+    users = {
+        user_id: (method, hourly_rate, monthly_salary)
+        for user_id, method, hourly_rate, monthly_salary in db.session.query(
+            User.id, User.cost_calculation_method, User.hourly_rate, User.monthly_salary
+        ).filter(User.id.in_(unique_users.tolist()))
+    }
+    user_info = [users.get(user_id, ('hourly', None, None)) for user_id in unique_users.tolist()]
+    monthly_users = np.array([method == 'monthly' for method, _, _ in user_info], dtype=bool)
+    current_hourly = np.array([_cents(hourly_rate) for _, hourly_rate, _ in user_info], dtype=np.int64)
+    current_salary = np.array([_cents(monthly_salary) for _, _, monthly_salary in user_info], dtype=np.int64)
+
+    lookup = _RateLookup(rate_index or load_rate_index(unique_users.tolist()), unique_users)
+
+    # 月薪员工当月月薪（取月末生效的月薪），没有月薪的月份按时薪计算
+    record_months = record_dates.astype('datetime64[M]')
+    month_ends = (record_months + 1).astype('datetime64[D]') - 1
+    salaries = lookup.values(user_index, month_ends, lookup.salaries, current_salary)
+    monthly = monthly_users[user_index] & (salaries > 0)
+
+    # 按时薪：工作日期当时的时薪；工时(0.01h) × 时薪(分) 为万分之一元，四舍五入到分
+    rates = lookup.values(user_index, record_dates, lookup.hourly, current_hourly)
+    costs = (record_hours * rates + 50) // 100
+
+    if monthly.any():
+        positions = np.flatnonzero(monthly)
+        hours = record_hours[positions]
+        # 每个（用户, 月份）为一个分摊组
+        month_numbers = record_months[positions].astype(np.int64)
+        _, group = np.unique(user_index[positions] * (month_numbers.max() + 1) + month_numbers - month_numbers.min(),
+                             return_inverse=True)
+        group_count = group.max() + 1
+        group_salaries = np.zeros(group_count, dtype=np.int64)
+        group_salaries[group] = salaries[positions]
+        group_hours = np.bincount(group, weights=hours, minlength=group_count).astype(np.int64)
+
+        numerators = hours * group_salaries[group]
+        denominators = np.maximum(group_hours[group], 1)
+        shares = numerators // denominators
+        remainders = numerators % denominators
+
+        # 最大余数法：每组剩余的分按余数从大到小逐条补1分
+        missing = group_salaries - np.bincount(group, weights=shares, minlength=group_count).astype(np.int64)
+        missing[group_hours == 0] = 0
+        ranked = np.lexsort((-remainders, group))
+        group_starts = np.searchsorted(group[ranked], np.arange(group_count))
+        rank = np.arange(len(ranked)) - group_starts[group[ranked]]
+        shares[ranked] += (rank < missing[group[ranked]]).astype(np.int64)
+
+        costs[positions] = shares
+        # 月薪分摊记录的时薪为折算值
+        rates[positions] = np.where(hours > 0, shares * 100 // np.maximum(hours, 1), 0)
+
+    return CostAllocation(record_ids, record_users, record_projects, record_dates, record_hours, rates, costs, monthly)
@@ -0,0 +1,91 @@
+"""
+批量个人成本计算服务
+
+按日期范围及可选的用户/项目/部门筛选，由成本分摊引擎一次计算所有已审批工时记录的成本
+（时薪按工作日期取费率历史，月薪按工时比例分摊），
+与已有的成本计算记录比对后批量新增或更新（upsert），不逐条往返数据库。
+"""
+from decimal import Decimal
+from sqlalchemy import insert, update
+from app import db
+from app.models import CostCalculation, User
+from app.services.cost_allocation import allocate_costs
+
+def _to_decimal(value):
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def bulk_calculate_costs(start_date, end_date, user_ids=None, project_ids=None, department=None, notes=''):
+    """计算日期范围内已审批工时记录对应的成本计算记录
+
+    已存在且金额一致的记录计为 skipped，金额变化的更新，缺失的新增。
+    只写入会话，由调用方提交事务。返回 {'created', 'updated', 'skipped'}。
+    """
+    # 月薪分摊依赖整月工时，不按项目筛选加载，计算后再截取范围和项目
+    allocation = allocate_costs(start_date, end_date, user_ids=user_ids or None, department=department) \
+        .within(start_date, end_date, project_ids)
+
+    existing_query = db.session.query(
+        CostCalculation.id,
+        CostCalculation.user_id,
+        CostCalculation.project_id,
+        CostCalculation.calculation_date,
+        CostCalculation.work_hours,
+        CostCalculation.hourly_rate,
+        CostCalculation.total_cost,
+        CostCalculation.calculation_method
+    ).filter(
+        CostCalculation.calculation_date >= start_date,
+        CostCalculation.calculation_date <= end_date
+    )
+
+    if user_ids:
+        existing_query = existing_query.filter(CostCalculation.user_id.in_(user_ids))
+    if project_ids:
+        existing_query = existing_query.filter(CostCalculation.project_id.in_(project_ids))
+    if department:
+        existing_query = existing_query.filter(
+            CostCalculation.user_id.in_(db.session.query(User.id).filter(User.department == department))
+        )
+
+    existing = {(row.user_id, row.project_id, row.calculation_date): row for row in existing_query}
+
+    to_create = []
+    to_update = []
+    skipped = 0
+    for user_id, project_id, work_date, work_hours, rate, total_cost, method in allocation.records():
+        current = existing.get((user_id, project_id, work_date))
+        if current is None:
+            to_create.append({
+                'user_id': user_id,
+                'project_id': project_id,
+                'calculation_date': work_date,
+                'work_hours': work_hours,
+                'hourly_rate': rate,
+                'total_cost': total_cost,
+                'calculation_method': method,
+                'notes': notes
+            })
+        elif (_to_decimal(current.work_hours) != work_hours or _to_decimal(current.hourly_rate) != rate
+              or _to_decimal(current.total_cost) != total_cost or current.calculation_method != method):
+            to_update.append({
+                'id': current.id,
+                'work_hours': work_hours,
+                'hourly_rate': rate,
+                'total_cost': total_cost,
+                'calculation_method': method
+            })
+        else:
+            skipped += 1
+
+    if to_create:
+        db.session.execute(insert(CostCalculation), to_create)
+    if to_update:
+        db.session.execute(update(CostCalculation), to_update)
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'skipped': skipped
+    }
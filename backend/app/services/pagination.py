@@ -0,0 +1,149 @@
+"""
+游标（keyset）分页
+
+按列表原有的排序键（末尾补主键保证唯一）比较上一页最后/第一行的键值取下一页/上一页，
+不使用 OFFSET，翻到多深都只读取一页的行；总数默认不统计，可选精确统计或上限统计。
+游标为排序键值的 base64url 编码，对客户端不透明。
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_, tuple_, func, literal, select
+
+# 上限统计最多数到的行数
+COUNT_CAPPED_LIMIT = 10000
+# 每页最多行数，超出时按此值截取
+MAX_PER_PAGE = 1000
+
+COUNT_MODES = ('exact', 'capped')
+
+class InvalidPagination(ValueError):
+    """分页参数无效，异常消息可直接返回给客户端"""
+
+class InvalidCursor(InvalidPagination):
+    """游标无法解析或与排序键不匹配"""
+
+    def __init__(self, cursor=None):
+        super().__init__('分页游标无效')
+        self.cursor = cursor
+
+class CursorPage:
+    """一页结果及前后页游标"""
+
+    def __init__(self, items, per_page, next_cursor, prev_cursor, total=None, total_capped=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_capped = total_capped
+
+    def metadata(self):
+        """分页信息（未统计总数时不包含 total）"""
+        result = {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor
+        }
+        if self.total is not None:
+            result['total'] = self.total
+            result['total_capped'] = self.total_capped
+        return result
+
+def _encode(direction, values):
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    content = json.dumps([direction] + values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(content.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode(cursor, columns):
+    try:
+        content = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *values = json.loads(content)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if direction not in ('n', 'p') or len(values) != len(columns):
+        raise InvalidCursor(cursor)
+
+    parsed = []
+    for (column, _), value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+            if value is not None and python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif value is not None and python_type is date:
+                value = date.fromisoformat(value)
+            elif value is not None and not isinstance(value, python_type):
+                raise InvalidCursor(cursor)
+        except (ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        parsed.append(value)
+    return direction, parsed
+
+def _after(columns, values, reverse):
+    """排序在 values 之后（reverse 时为之前）的行的条件"""
+    descending = {desc != reverse for _, desc in columns}
+    if len(descending) == 1:
+        # 各列方向一致时使用行值比较，可直接利用复合索引
+        keys = tuple_(*[column for column, _ in columns])
+        bound = tuple_(*[literal(value, column.type) for (column, _), value in zip(columns, values)])
+        return keys < bound if descending.pop() else keys > bound
+
+    conditions = []
+    for position, (column, desc) in enumerate(columns):
+        equal = [columns[index][0] == values[index] for index in range(position)]
+        compare = column < values[position] if desc != reverse else column > values[position]
+        conditions.append(and_(*equal, compare))
+    return or_(*conditions)
+
+def _count(query, mode, unique_column):
+    if mode == 'exact':
+        return query.order_by(None).count(), False
+    if mode == 'capped':
+        subquery = query.order_by(None).with_entities(unique_column).limit(COUNT_CAPPED_LIMIT + 1).subquery()
+        total = query.session.execute(select(func.count()).select_from(subquery)).scalar()
+        return min(total, COUNT_CAPPED_LIMIT), total > COUNT_CAPPED_LIMIT
+    return None, False
+
+def keyset_paginate(query, columns, per_page, cursor=None, count=None):
+    """按 columns（[(列, 是否倒序), ...]，各列不为空，最后一列唯一）游标分页
+
+    cursor 为空时返回第一页；count 为 'exact' 统计精确总数，'capped' 最多统计 COUNT_CAPPED_LIMIT 行。
+    per_page 超过 MAX_PER_PAGE 时按 MAX_PER_PAGE 截取。
+    游标无效时抛出 InvalidCursor，per_page 小于1或 count 取值未知时抛出 InvalidPagination。
+    """
+    if per_page is None or per_page < 1:
+        raise InvalidPagination('每页条数必须为正整数')
+    per_page = min(per_page, MAX_PER_PAGE)
+    if count and count not in COUNT_MODES:
+        raise InvalidPagination('count 只能为 exact 或 capped')
+
+    direction, values = _decode(cursor, columns) if cursor else ('n', None)
+    reverse = direction == 'p'
+
+    total, total_capped = _count(query, count, columns[-1][0])
+
+    page_query = query.order_by(None)
+    if values is not None:
+        page_query = page_query.filter(_after(columns, values, reverse))
+    page_query = page_query.order_by(*[
+        column.desc() if desc != reverse else column.asc() for column, desc in columns
+    ])
+
+    items = page_query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if reverse:
+        items.reverse()
+
+    def key(item):
+        return [getattr(item, column.key) for column, _ in columns]
+
+    if reverse:
+        next_cursor = _encode('n', key(items[-1])) if items else None
+        prev_cursor = _encode('p', key(items[0])) if items and has_more else None
+    else:
+        next_cursor = _encode('n', key(items[-1])) if items and has_more else None
+        prev_cursor = _encode('p', key(items[0])) if items and values is not None else None
+
+    return CursorPage(items, per_page, next_cursor, prev_cursor, total, total_capped)
@@ -0,0 +1,111 @@
+"""
+用户权限缓存服务
+
+按用户缓存已解析的角色/权限集合（进程内 + TTL），并在请求内复用，
+避免每次鉴权都加载 User 及其 roles × permissions。
+"""
+import threading
+import time
+from flask import current_app, g, has_request_context
+from app import db
+from app.models.user import User, user_roles
+from app.models.role import Role, Permission, role_permissions
+
+# 默认缓存有效期（秒）
+DEFAULT_PERMISSION_CACHE_TTL = 300
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+# 权限名称 <-> ID 索引，用于令牌中的权限位图
+_permission_index = None
+
+class UserPermissions:
+    """已解析的用户角色/权限集合"""
+    __slots__ = ('user_id', 'roles', 'permissions')
+
+    def __init__(self, user_id, roles, permissions):
+        self.user_id = user_id
+        self.roles = frozenset(roles)
+        self.permissions = frozenset(permissions)
+
+    def has_role(self, role_name):
+        """检查是否有指定角色"""
+        return role_name in self.roles
+
+    def has_permission(self, permission_name):
+        """检查是否有指定权限"""
+        return permission_name in self.permissions
+
+def _cache_ttl():
+    return current_app.config.get('PERMISSION_CACHE_TTL', DEFAULT_PERMISSION_CACHE_TTL)
+
+def load_user_permissions(user_id):
+    """从数据库一次性加载用户的角色和权限，用户不存在时返回None"""
+    rows = db.session.query(User.id, Role.name, Permission.name).select_from(User).outerjoin(
+        user_roles, user_roles.c.user_id == User.id
+    ).outerjoin(
+        Role, Role.id == user_roles.c.role_id
+    ).outerjoin(
+        role_permissions, role_permissions.c.role_id == Role.id
+    ).outerjoin(
+        Permission, Permission.id == role_permissions.c.permission_id
+    ).filter(User.id == user_id).all()
+
+    if not rows:
+        return None
+
+    roles = {role_name for _, role_name, _ in rows if role_name}
+    permissions = {permission_name for _, _, permission_name in rows if permission_name}
+    return UserPermissions(user_id, roles, permissions)
+
+def get_user_permissions(user_id):
+    """获取用户权限集合：先查请求内缓存，再查进程内缓存，最后查数据库"""
+    if has_request_context():
+        cached = g.get('user_permissions')
+        if cached is not None and cached.user_id == user_id:
+            return cached
+
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(user_id)
+    if entry and entry[0] > now:
+        permissions = entry[1]
+    else:
+        permissions = load_user_permissions(user_id)
+        if permissions is not None:
+            with _cache_lock:
+                _cache[user_id] = (now + _cache_ttl(), permissions)
+
+    if has_request_context():
+        g.user_permissions = permissions
+    return permissions
+
+def invalidate_user_permissions(user_id=None):
+    """使权限缓存失效，不指定用户时清空全部缓存"""
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+    if has_request_context():
+        cached = g.get('user_permissions')
+        if cached is not None and (user_id is None or cached.user_id == user_id):
+            g.pop('user_permissions', None)
+
+def get_permission_index(refresh=False):
+    """获取权限索引 (name -> id, id -> name)，进程内只加载一次"""
+    global _permission_index
+    index = _permission_index
+    if index is None or refresh:
+        rows = db.session.query(Permission.id, Permission.name).all()
+        index = ({name: permission_id for permission_id, name in rows},
+                 {permission_id: name for permission_id, name in rows})
+        _permission_index = index
+    return index
+
+def invalidate_permission_index():
+    """权限新增或变更后使权限索引失效"""
+    global _permission_index
+    _permission_index = None
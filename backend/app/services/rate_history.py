@@ -0,0 +1,202 @@
+"""
+时薪历史服务
+
+维护按生效日期划分的用户时薪/月薪区间（user_rate_history），
+按用户加载区间起始日期有序列表，按工作日期二分查找适用的费率，
+使成本重算使用当时的费率而不是当前费率。只读场景可使用带过期时间的进程内缓存。
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from sqlalchemy import or_
+from app import db
+from app.models.user import User, UserRateHistory
+
+DEFAULT_RATE_HISTORY_TTL = 300
+
+# 首条历史记录的生效日期：最早的费率适用于其之前的所有日期
+HISTORY_START = date(1970, 1, 1)
+
+_index = None
+_index_lock = threading.Lock()
+
+def _to_decimal(value):
+    """金额转换为 Decimal，格式错误时抛出 ValueError"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, Decimal):
+        return value
+    try:
+        result = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('时薪/月薪格式错误')
+    if not result.is_finite():
+        raise ValueError('时薪/月薪格式错误')
+    return result
+
+class RateIndex:
+    """每个用户的费率区间索引：{user_id: ([起始日期...], [(时薪, 月薪)...])}"""
+
+    def __init__(self, rows):
+        # rows: (user_id, effective_from, hourly_rate, monthly_salary)，按用户、起始日期排序
+        self._intervals = {}
+        for user_id, effective_from, hourly_rate, monthly_salary in rows:
+            starts, rates = self._intervals.setdefault(user_id, ([], []))
+            starts.append(effective_from)
+            rates.append((hourly_rate, monthly_salary))
+
+    def intervals(self, user_id):
+        """返回用户的 ([起始日期...], [(时薪, 月薪)...])，没有历史记录时返回None"""
+        return self._intervals.get(user_id)
+
+    def resolve(self, user_id, work_date, default=None):
+        """返回 work_date 适用的 (时薪, 月薪)；用户没有历史记录时返回 default"""
+        intervals = self._intervals.get(user_id)
+        if not intervals:
+            return default
+        starts, rates = intervals
+        # 早于第一条记录的日期使用最早的费率
+        position = max(bisect_right(starts, work_date) - 1, 0)
+        return rates[position]
+
+    def hourly_rate(self, user_id, work_date, default=None):
+        """返回 work_date 适用的时薪"""
+        rates = self.resolve(user_id, work_date)
+        return rates[0] if rates else default
+
+def load_rate_index(user_ids=None):
+    """从数据库加载费率区间索引（不使用缓存），user_ids 指定时只加载这些用户
+
+    计算结果需要保存的场景（成本计算、日汇总）使用此函数，读取本事务内最新的费率历史。
+    """
+    query = db.session.query(
+        UserRateHistory.user_id,
+        UserRateHistory.effective_from,
+        UserRateHistory.hourly_rate,
+        UserRateHistory.monthly_salary
+    )
+    if user_ids is not None:
+        query = query.filter(UserRateHistory.user_id.in_(user_ids))
+    return RateIndex(query.order_by(UserRateHistory.user_id, UserRateHistory.effective_from).all())
+
+def get_rate_index():
+    """获取费率区间索引，过期后重新加载
+
+    缓存按进程保存，其他进程的费率变更在过期前不可见，只用于只读展示；写入路径使用 load_rate_index()。
+    """
+    global _index
+    ttl = current_app.config.get('RATE_HISTORY_TTL', DEFAULT_RATE_HISTORY_TTL)
+    now = time.monotonic()
+
+    with _index_lock:
+        cached = _index
+    if cached and cached[0] > now:
+        return cached[1]
+
+    index = load_rate_index()
+    with _index_lock:
+        _index = (now + ttl, index)
+    return index
+
+def invalidate_rate_index():
+    """费率历史变更后使索引失效"""
+    global _index
+    with _index_lock:
+        _index = None
+
+def record_rate_change(user, hourly_rate, monthly_salary, effective_from=None, previous=None):
+    """记录用户费率变更：从 effective_from（默认今天）起使用新费率，直到下一次已登记的变更
+
+    previous 为变更前的 (时薪, 月薪)，用户首次变更时用于补录变更前的费率。
+    只写入会话，由调用方提交事务并调用 invalidate_rate_index()。
+    """
+    effective_from = effective_from or date.today()
+    hourly_rate = _to_decimal(hourly_rate)
+    monthly_salary = _to_decimal(monthly_salary)
+
+    rows = user.rate_history.order_by(UserRateHistory.effective_from).all() if user.id else []
+    if not rows:
+        previous_hourly, previous_monthly = previous or (None, None)
+        if (previous_hourly is not None or previous_monthly is not None) and effective_from > HISTORY_START:
+            rows.append(UserRateHistory(
+                user=user, hourly_rate=previous_hourly, monthly_salary=previous_monthly,
+                effective_from=HISTORY_START, effective_to=effective_from - timedelta(days=1)
+            ))
+            db.session.add(rows[0])
+        else:
+            # 没有变更前的费率，新费率适用于所有日期
+            effective_from = HISTORY_START
+
+    for row in rows:
+        if row.effective_from == effective_from:
+            row.hourly_rate = hourly_rate
+            row.monthly_salary = monthly_salary
+            return row
+
+    # 拆分包含 effective_from 的区间；早于所有区间时新区间截止到第一个区间之前
+    following = [row for row in rows if row.effective_from > effective_from]
+    effective_to = following[0].effective_from - timedelta(days=1) if following else None
+    for row in rows:
+        if row.effective_from < effective_from and (row.effective_to is None or row.effective_to >= effective_from):
+            effective_to = row.effective_to
+            row.effective_to = effective_from - timedelta(days=1)
+
+    history = UserRateHistory(
+        user=user, hourly_rate=hourly_rate, monthly_salary=monthly_salary,
+        effective_from=effective_from, effective_to=effective_to
+    )
+    db.session.add(history)
+    return history
+
+def apply_rate_fields(user, data, fields):
+    """更新用户字段；时薪或月薪发生变化时登记费率历史
+
+    data 中可选 rate_effective_from（YYYY-MM-DD）指定新费率的生效日期。生效日期在今天之后时
+    只登记历史，用户的当前时薪/月薪保持不变，到期后由 apply_due_rate_changes() 同步。
+    返回新费率的生效日期，费率未变化时返回None。金额或日期格式错误时抛出 ValueError。
+    """
+    previous = (_to_decimal(user.hourly_rate), _to_decimal(user.monthly_salary))
+    effective_from = data.get('rate_effective_from')
+    if effective_from:
+        try:
+            effective_from = datetime.strptime(effective_from, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError('生效日期格式错误，请使用YYYY-MM-DD格式')
+
+    for field in fields:
+        if field in data:
+            value = _to_decimal(data[field]) if field in ('hourly_rate', 'monthly_salary') else data[field]
+            setattr(user, field, value)
+
+    current = (_to_decimal(user.hourly_rate), _to_decimal(user.monthly_salary))
+    if current == previous:
+        return None
+
+    history = record_rate_change(user, current[0], current[1], effective_from=effective_from, previous=previous)
+    if history.effective_from > date.today():
+        user.hourly_rate, user.monthly_salary = previous
+    return history.effective_from
+
+def apply_due_rate_changes(today=None):
+    """将今天适用的费率历史同步到用户的当前时薪/月薪（未来生效的变更到期后执行），返回更新的用户数
+
+    只写入会话，由调用方提交事务。
+    """
+    today = today or date.today()
+    rows = db.session.query(User, UserRateHistory.hourly_rate, UserRateHistory.monthly_salary).join(
+        UserRateHistory, UserRateHistory.user_id == User.id
+    ).filter(
+        UserRateHistory.effective_from <= today,
+        or_(UserRateHistory.effective_to.is_(None), UserRateHistory.effective_to >= today)
+    ).all()
+
+    count = 0
+    for user, hourly_rate, monthly_salary in rows:
+        if (_to_decimal(user.hourly_rate), _to_decimal(user.monthly_salary)) != (hourly_rate, monthly_salary):
+            user.hourly_rate = hourly_rate
+            user.monthly_salary = monthly_salary
+            count += 1
+    return count
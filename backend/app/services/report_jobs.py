@@ -0,0 +1,296 @@
+"""
+成本报表生成任务服务
+
+POST /costs/reports 只登记任务并立即返回任务ID，报表由进程内有界线程池在后台生成，
+进度与生成的报表ID记录在 cost_report_jobs 中供轮询（多进程部署时任意进程都可查询）。
+参数相同且仍在进行中的请求合并为同一个任务：进行中的任务持有唯一的 active_key，完成后释放。
+各进程的心跳线程定期更新本进程排队和执行中任务的 heartbeat_at；进程退出后心跳停止，
+超时没有心跳的任务在下次提交相同请求时标记为失败并释放。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import CostCalculation, ProjectCost, CostReport, CostReportJob, User
+from app.services.cost_aggregates import (summarize_calculations, breakdown_calculations, summarize_project_costs,
+                                          breakdown_project_costs, to_json_numbers)
+from app.services.report_payload import encode_report_data
+
+DEFAULT_REPORT_JOB_WORKERS = 2
+DEFAULT_REPORT_JOB_QUEUE_LIMIT = 20
+DEFAULT_REPORT_JOB_HEARTBEAT_SECONDS = 30
+DEFAULT_REPORT_JOB_STALE_SECONDS = 300
+
+_executor = None
+_executor_pid = None
+_queued = 0
+_owned_jobs = set()  # 本进程排队或执行中的任务ID（心跳线程更新这些任务）
+_executor_lock = threading.Lock()
+
+class ReportQueueFull(Exception):
+    """本进程排队中的报表任务已达上限"""
+
+def build_cost_report(params, generated_by, progress=None):
+    """按参数生成成本报表（未提交），progress(百分比) 在每个汇总步骤后回调"""
+    def report_progress(value):
+        if progress:
+            progress(value)
+    
+    period_start = datetime.strptime(params['period_start'], '%Y-%m-%d').date()
+    period_end = datetime.strptime(params['period_end'], '%Y-%m-%d').date()
+    report_type = params['report_type']
+    
+    # 根据报表类型生成数据（在数据库中分组汇总，不逐条导出明细）
+    calculations = CostCalculation.query.filter(
+        CostCalculation.calculation_date >= period_start,
+        CostCalculation.calculation_date <= period_end
+    )
+    
+    if report_type == 'personal':
+        # 个人成本报表
+        calculations = calculations.filter(CostCalculation.user_id == params['user_id'])
+        summary = summarize_calculations(calculations)
+        report_data = {'user_id': params['user_id']}
+        breakdowns = ('project', 'day')
+    
+    elif report_type == 'project':
+        # 项目成本报表
+        project_costs = ProjectCost.query.filter(
+            ProjectCost.project_id == params['project_id'],
+            ProjectCost.period_start >= period_start,
+            ProjectCost.period_end <= period_end
+        )
+        summary = summarize_project_costs(project_costs)
+        report_progress(50)
+        report_data = {
+            'project_id': params['project_id'],
+            'by_period': breakdown_project_costs(project_costs)
+        }
+        breakdowns = ()
+    
+    elif report_type == 'department':
+        # 部门成本报表
+        department_users = User.query.filter_by(department=params['department'])
+        calculations = calculations.filter(
+            CostCalculation.user_id.in_(department_users.with_entities(User.id))
+        )
+        summary = summarize_calculations(calculations)
+        report_data = {
+            'department': params['department'],
+            'user_count': department_users.count()
+        }
+        breakdowns = ('user', 'project', 'day')
+    
+    else:  # company
+        # 公司成本报表
+        summary = summarize_calculations(calculations)
+        report_data = {}
+        breakdowns = ('user', 'project', 'day')
+    
+    for position, breakdown in enumerate(breakdowns, 1):
+        report_progress(10 + 80 * position // (len(breakdowns) + 1))
+        report_data[f'by_{breakdown}'] = breakdown_calculations(calculations, breakdown)
+    
+    report_data['record_count'] = summary['record_count']
+    report_progress(90)
+    
+    return CostReport(
+        report_name=params['report_name'],
+        report_type=report_type,
+        report_period=params['report_period'],
+        period_start=period_start,
+        period_end=period_end,
+        total_cost=summary['total_cost'],
+        total_hours=summary['total_hours'],
+        average_cost_per_hour=summary['average_cost_per_hour'],
+        report_payload=encode_report_data(to_json_numbers(report_data)),
+        generated_by=generated_by
+    )
+
+def _request_key(params, requested_by):
+    """请求参数摘要：同一用户的相同参数视为同一请求"""
+    payload = json.dumps({'params': params, 'requested_by': requested_by}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _get_executor():
+    """获取本进程的线程池并启动心跳线程（fork 后的子进程重新创建）"""
+    global _executor, _executor_pid, _queued
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            workers = current_app.config.get('REPORT_JOB_WORKERS', DEFAULT_REPORT_JOB_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cost-report')
+            _executor_pid = os.getpid()
+            _queued = 0
+            _owned_jobs.clear()
+            interval = current_app.config.get('REPORT_JOB_HEARTBEAT_SECONDS', DEFAULT_REPORT_JOB_HEARTBEAT_SECONDS)
+            threading.Thread(target=_heartbeat_loop, args=(current_app._get_current_object(), interval),
+                             name='cost-report-heartbeat', daemon=True).start()
+        return _executor
+
+def _heartbeat_loop(app, interval):
+    """定期更新本进程排队和执行中任务的心跳时间"""
+    pid = os.getpid()
+    while _executor_pid == pid:
+        time.sleep(interval)
+        with _executor_lock:
+            job_ids = list(_owned_jobs)
+        if not job_ids:
+            continue
+        with app.app_context():
+            try:
+                CostReportJob.query.filter(
+                    CostReportJob.id.in_(job_ids),
+                    CostReportJob.active_key.isnot(None)
+                ).update({CostReportJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('成本报表任务心跳更新失败')
+
+def _reserve_slot():
+    global _queued
+    limit = current_app.config.get('REPORT_JOB_QUEUE_LIMIT', DEFAULT_REPORT_JOB_QUEUE_LIMIT)
+    executor = _get_executor()
+    with _executor_lock:
+        if _queued >= limit:
+            raise ReportQueueFull()
+        _queued += 1
+    return executor
+
+def _release_slot():
+    global _queued
+    with _executor_lock:
+        _queued = max(_queued - 1, 0)
+
+def _find_active_job(request_key):
+    """查找进行中的相同任务；超时没有心跳（执行的进程已退出）的任务标记为失败并释放
+
+    仍在排队或执行的任务由所在进程持续更新心跳，无论已运行多久都不会被释放。
+    """
+    job = CostReportJob.query.filter_by(active_key=request_key).first()
+    if job is None:
+        return None
+    
+    stale_seconds = current_app.config.get('REPORT_JOB_STALE_SECONDS', DEFAULT_REPORT_JOB_STALE_SECONDS)
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    if (job.heartbeat_at or job.created_at) >= cutoff:
+        return job
+    
+    # 条件更新：读取后刚更新过心跳（或已完成）的任务不受影响
+    released = CostReportJob.query.filter(
+        CostReportJob.id == job.id,
+        CostReportJob.active_key == request_key,
+        func.coalesce(CostReportJob.heartbeat_at, CostReportJob.created_at) < cutoff
+    ).update({
+        CostReportJob.status: 'failed',
+        CostReportJob.message: '任务中断（超时没有心跳）',
+        CostReportJob.active_key: None,
+        CostReportJob.finished_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    if released:
+        return None
+    db.session.refresh(job)
+    return job if job.active_key == request_key else None
+
+def submit_report_job(params, requested_by):
+    """登记报表生成任务并提交到线程池
+
+    返回 (任务, 是否新建)；相同参数的任务仍在进行中时直接返回该任务。
+    本进程排队任务已达上限时抛出 ReportQueueFull。
+    """
+    request_key = _request_key(params, requested_by)
+    job = _find_active_job(request_key)
+    if job is not None:
+        return job, False
+    
+    # 同步执行（REPORT_JOB_EAGER）时不启动线程池和心跳线程，也不占用排队名额
+    eager = current_app.config.get('REPORT_JOB_EAGER')
+    executor = None if eager else _reserve_slot()
+    job = CostReportJob(
+        id=uuid.uuid4().hex,
+        request_key=request_key,
+        active_key=request_key,
+        parameters=json.dumps(params, ensure_ascii=False),
+        requested_by=requested_by
+    )
+    try:
+        db.session.add(job)
+        db.session.commit()
+    except IntegrityError:
+        # 其他请求（或进程）同时登记了相同任务
+        db.session.rollback()
+        if not eager:
+            _release_slot()
+        job = CostReportJob.query.filter_by(active_key=request_key).first()
+        if job is None:
+            raise
+        return job, False
+    except Exception:
+        if not eager:
+            _release_slot()
+        raise
+    
+    if eager:
+        # 测试环境在请求内同步执行，结果可预期
+        _run_job(current_app._get_current_object(), job.id, push_context=False)
+        db.session.refresh(job)
+    else:
+        with _executor_lock:
+            _owned_jobs.add(job.id)
+        executor.submit(_run_job, current_app._get_current_object(), job.id)
+    return job, True
+
+def _run_job(app, job_id, push_context=True):
+    if push_context:
+        with app.app_context():
+            try:
+                _execute_job(job_id)
+            finally:
+                with _executor_lock:
+                    _owned_jobs.discard(job_id)
+                _release_slot()
+    else:
+        _execute_job(job_id)
+
+def _execute_job(job_id):
+    job = db.session.get(CostReportJob, job_id)
+    if job is None:
+        return
+    
+    job.status = 'running'
+    job.started_at = job.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+    
+    def update_progress(value):
+        job.progress = value
+        db.session.commit()
+    
+    try:
+        report = build_cost_report(json.loads(job.parameters), job.requested_by, update_progress)
+        db.session.add(report)
+        db.session.flush()
+        
+        job.report_id = report.id
+        job.status = 'completed'
+        job.progress = 100
+        job.active_key = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('成本报表任务 %s 失败', job_id)
+        job = db.session.get(CostReportJob, job_id)
+        job.status = 'failed'
+        job.message = str(e)[:500]
+        job.active_key = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
@@ -0,0 +1,104 @@
+"""
+成本报表数据存储格式
+
+报表数据以紧凑的列式 JSON 压缩（zlib）后存入 cost_reports.report_payload：
+    {"fields": {标量字段...}, "sections": {"by_user": {"columns": [...], "values": [[列1...], [列2...]]}, ...}}
+由字典组成的列表（明细行）按列存储，列名只出现一次；其余字段原样放在 fields 中。
+读取时可将整个 JSON 从数据库分段读取、流式解压输出，或只解出某个分区的一段明细行。
+"""
+import codecs
+import json
+import zlib
+from sqlalchemy import func
+from app import db
+from app.models import CostReport
+
+COMPRESSION_LEVEL = 6
+# 流式输出时每次从数据库读取的压缩数据字节数
+STREAM_CHUNK_SIZE = 256 * 1024
+
+def _is_rows(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+def _to_columns(rows):
+    """行列表转换为列式结构，列顺序为各列首次出现的顺序"""
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return {
+        'columns': columns,
+        'values': [[row.get(column) for row in rows] for column in columns]
+    }
+
+def encode_report_data(data):
+    """将报表数据（字典）编码为压缩的列式 JSON"""
+    layout = {'fields': {}, 'sections': {}}
+    for key, value in (data or {}).items():
+        if _is_rows(value):
+            layout['sections'][key] = _to_columns(value)
+        else:
+            layout['fields'][key] = value
+    content = json.dumps(layout, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(content.encode('utf-8'), COMPRESSION_LEVEL)
+
+def decode_report_data(payload):
+    """解压报表数据，返回列式结构 {'fields': ..., 'sections': ...}"""
+    if not payload:
+        return {'fields': {}, 'sections': {}}
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+def read_payload_chunks(report_id, chunk_size=STREAM_CHUNK_SIZE):
+    """按块从数据库读取报表的压缩数据（substr 分段读取，不一次加载整个 BLOB）"""
+    size = db.session.query(func.length(CostReport.report_payload)).filter(CostReport.id == report_id).scalar()
+    for start in range(0, size or 0, chunk_size):
+        yield db.session.query(
+            func.substr(CostReport.report_payload, start + 1, chunk_size)
+        ).filter(CostReport.id == report_id).scalar()
+
+def iter_report_json(chunks, escape=None):
+    """逐块解压报表数据（压缩数据块的可迭代对象），输出列式 JSON 文本，不在内存中展开整个报表
+
+    escape 为 str -> str 的转换（如 ensure_ascii 转义），按完整的 UTF-8 字符分块调用。
+    """
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder('utf-8')() if escape else None
+    empty = True
+
+    def output(data, final=False):
+        if decoder is not None:
+            data = escape(decoder.decode(data, final)).encode('utf-8')
+        return data
+
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            empty = False
+            yield output(data)
+    tail = decompressor.flush()
+    if tail:
+        empty = False
+    if empty:
+        yield b'{"fields":{},"sections":{}}'
+    elif tail or decoder is not None:
+        yield output(tail, final=True)
+
+def section_summary(layout):
+    """各分区的明细行数"""
+    return {
+        name: len(section['values'][0]) if section['values'] else 0
+        for name, section in layout['sections'].items()
+    }
+
+def section_rows(layout, name, offset=0, limit=None):
+    """返回分区中 [offset, offset+limit) 的明细行（字典列表）及总行数；分区不存在时返回 None"""
+    section = layout['sections'].get(name)
+    if section is None:
+        return None
+    columns = section['columns']
+    total = len(section['values'][0]) if section['values'] else 0
+    end = total if limit is None else min(offset + limit, total)
+    values = [column_values[offset:end] for column_values in section['values']]
+    rows = [dict(zip(columns, row)) for row in zip(*values)]
+    return rows, total
@@ -0,0 +1,90 @@
+"""
+用户选择器索引服务
+
+在进程内缓存启用用户的精简信息（id、姓名、部门），并按姓名/用户名/工号建立
+有序前缀索引，供选择项目经理、成员等下拉框使用，避免每次加载完整用户列表。
+"""
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app
+from app import db
+from app.models.user import User
+
+DEFAULT_USER_DIRECTORY_TTL = 300
+# 选择器每次返回的用户数：未指定时的默认值及上限
+DEFAULT_PICKER_LIMIT = 50
+MAX_PICKER_LIMIT = 200
+
+_directory = None
+_directory_lock = threading.Lock()
+
+class UserDirectory:
+    """用户精简信息及前缀索引"""
+
+    def __init__(self, rows):
+        # rows: (id, name, department, username, employee_id)，按ID排序
+        self.entries = [{'id': user_id, 'name': name, 'department': department}
+                        for user_id, name, department, _, _ in rows]
+        self.departments = [department for _, _, department, _, _ in rows]
+
+        keys = []
+        for position, (_, name, _, username, employee_id) in enumerate(rows):
+            for key in {name, username, employee_id}:
+                if key:
+                    keys.append((key.lower(), position))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._positions = [position for _, position in keys]
+
+    def search(self, prefix=None, department=None, limit=None, after_id=None):
+        """按前缀（姓名/用户名/工号）和部门筛选，结果按用户ID排序；after_id 指定时只返回ID大于它的用户"""
+        if prefix:
+            prefix = prefix.lower()
+            positions = set()
+            index = bisect_left(self._keys, prefix)
+            while index < len(self._keys) and self._keys[index].startswith(prefix):
+                positions.add(self._positions[index])
+                index += 1
+            positions = sorted(positions)
+        else:
+            positions = range(len(self.entries))
+
+        results = []
+        for position in positions:
+            if department and self.departments[position] != department:
+                continue
+            if after_id is not None and self.entries[position]['id'] <= after_id:
+                continue
+            results.append(self.entries[position])
+            if limit and len(results) >= limit:
+                break
+        return results
+
+def _load_directory():
+    rows = db.session.query(
+        User.id, User.name, User.department, User.username, User.employee_id
+    ).filter(User.status == 'active').order_by(User.id).all()
+    return UserDirectory(rows)
+
+def get_user_directory():
+    """获取用户选择器索引，过期后重新加载"""
+    global _directory
+    ttl = current_app.config.get('USER_DIRECTORY_TTL', DEFAULT_USER_DIRECTORY_TTL)
+    now = time.monotonic()
+
+    with _directory_lock:
+        cached = _directory
+    if cached and cached[0] > now:
+        return cached[1]
+
+    directory = _load_directory()
+    with _directory_lock:
+        _directory = (now + ttl, directory)
+    return directory
+
+def invalidate_user_directory():
+    """用户新增、删除或姓名/部门/状态变更后使索引失效"""
+    global _directory
+    with _directory_lock:
+        _directory = None
@@ -0,0 +1,132 @@
+"""
+工时日汇总服务
+
+维护 daily_work_rollups：按（用户, 项目, 日期, 工作类型）汇总已审批工时、记录数和成本。
+月薪分摊以整月为单位，因此按“用户 × 自然月”整体重算并替换汇总行；
+在审批工时记录和费率变更时于同一事务内调用（按用户加锁串行化），统计接口直接读取汇总表。
+"""
+from datetime import date
+from sqlalchemy import insert, func
+from app import db
+from app.models import TimeRecord, DailyWorkRollup, User
+from app.services.cost_aggregates import exact_sum, from_scaled, average_cost_per_hour
+from app.services.cost_allocation import allocate_costs, month_start, month_end
+from app.services.rate_history import load_rate_index
+
+def _rollup_rows(allocation, work_types):
+    """将分摊结果按汇总键合并为待插入的行"""
+    rows = {}
+    for record_id, (user_id, project_id, work_date, hours, _, cost, _) in zip(
+            allocation.record_ids.tolist(), allocation.records()):
+        work_type = work_types.get(record_id) or ''
+        key = (user_id, project_id, work_date, work_type)
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {
+                'user_id': user_id,
+                'project_id': project_id,
+                'work_date': work_date,
+                'work_type': work_type,
+                'hours': hours,
+                'record_count': 1,
+                'cost': cost
+            }
+        else:
+            row['hours'] += hours
+            row['record_count'] += 1
+            row['cost'] += cost
+    return list(rows.values())
+
+def _work_types(range_start, range_end, user_ids=None):
+    """已审批工时记录ID到工作类型的映射"""
+    query = db.session.query(TimeRecord.id, TimeRecord.work_type).filter(
+        TimeRecord.status == 'approved',
+        TimeRecord.work_date >= range_start,
+        TimeRecord.work_date <= range_end
+    )
+    if user_ids is not None:
+        query = query.filter(TimeRecord.user_id.in_(user_ids))
+    return dict(query.all())
+
+def refresh_rollups(user_ids, start_date, end_date=None, rate_index=None):
+    """重算指定用户在 start_date 至 end_date（默认今天）所在各自然月的日汇总
+
+    只写入会话，由调用方提交事务。rate_index 可传入已加载的费率索引（默认从数据库加载）。
+    返回写入的汇总行数。
+    """
+    user_ids = sorted(set(user_ids))
+    # 分摊引擎使用 Core 查询，不会自动刷新会话中未写入的变更
+    db.session.flush()
+    # 锁定用户行，同一用户的重算串行执行：后到的事务等待前者提交后再读取工时并替换汇总行，
+    # 避免唯一键冲突或写入按旧数据计算的汇总（SQLite 不支持 FOR UPDATE，上面的写入已持有数据库写锁）
+    db.session.query(User.id).filter(User.id.in_(user_ids)).order_by(User.id).with_for_update().all()
+    range_start = month_start(start_date)
+    range_end = month_end(end_date or max(start_date, date.today()))
+
+    DailyWorkRollup.query.filter(
+        DailyWorkRollup.user_id.in_(user_ids),
+        DailyWorkRollup.work_date >= range_start,
+        DailyWorkRollup.work_date <= range_end
+    ).delete(synchronize_session=False)
+
+    allocation = allocate_costs(range_start, range_end, user_ids=user_ids, rate_index=rate_index)
+    rows = _rollup_rows(allocation, _work_types(range_start, range_end, user_ids))
+    if rows:
+        db.session.execute(insert(DailyWorkRollup), rows)
+    return len(rows)
+
+def rebuild_rollups():
+    """清空并按月重建全部日汇总，返回写入的汇总行数"""
+    DailyWorkRollup.query.delete(synchronize_session=False)
+
+    first_date, last_date = db.session.query(
+        func.min(TimeRecord.work_date), func.max(TimeRecord.work_date)
+    ).filter(TimeRecord.status == 'approved').one()
+    if first_date is None:
+        return 0
+
+    total = 0
+    rate_index = load_rate_index()
+    current = month_start(first_date)
+    while current <= last_date:
+        current_end = month_end(current)
+        allocation = allocate_costs(current, current_end, rate_index=rate_index)
+        rows = _rollup_rows(allocation, _work_types(current, current_end))
+        if rows:
+            db.session.execute(insert(DailyWorkRollup), rows)
+        total += len(rows)
+        current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+    return total
+
+def refresh_user_rollups(user_id, start_date):
+    """用户费率或成本计算方式变更后，重算 start_date 起的日汇总（读取本事务内尚未提交的费率历史）"""
+    return refresh_rollups([user_id], start_date)
+
+def project_member_costs(project_id, period_start, period_end):
+    """从日汇总按成员汇总项目在期间内的已审批工时和成本
+
+    返回按用户ID排序的成员列表，hourly_rate 为期间内按工时加权的平均时薪。
+    """
+    rows = db.session.query(
+        DailyWorkRollup.user_id,
+        User.name,
+        exact_sum(DailyWorkRollup.hours),
+        exact_sum(DailyWorkRollup.cost)
+    ).outerjoin(User, DailyWorkRollup.user_id == User.id).filter(
+        DailyWorkRollup.project_id == project_id,
+        DailyWorkRollup.work_date >= period_start,
+        DailyWorkRollup.work_date <= period_end
+    ).group_by(DailyWorkRollup.user_id, User.name).order_by(DailyWorkRollup.user_id).all()
+
+    members = []
+    for user_id, name, hours, cost in rows:
+        total_hours = from_scaled(hours, DailyWorkRollup.hours)
+        total_cost = from_scaled(cost, DailyWorkRollup.cost)
+        members.append({
+            'user_id': user_id,
+            'user_name': name,
+            'total_hours': total_hours,
+            'total_cost': total_cost,
+            'hourly_rate': average_cost_per_hour(total_cost, total_hours)
+        })
+    return members
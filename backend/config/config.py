@@ -4,31 +4,67 @@ from datetime import timedelta
 class Config:
     """基础配置类"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///dev.db'
+    # SQLite相对路径基于 instance/ 目录
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///rd_cost_system.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 数据库连接池配置（仅对服务器数据库生效）
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # 秒
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # 秒
+    DB_POOL_PRE_PING = True
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))  # 毫秒，0表示不限制
+    
+    # SQLite配置（连接时通过PRAGMA设置）
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))  # 负数表示KiB
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))  # 字节
+    SQLITE_TEMP_STORE = 'MEMORY'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # 毫秒
+    
     # JWT配置
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=30)  # 访问令牌内嵌权限，保持短有效期
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
+    # 权限缓存有效期（秒）
+    PERMISSION_CACHE_TTL = int(os.environ.get('PERMISSION_CACHE_TTL', 300))
+    
+    # 成本报表后台生成：每个进程的线程数、排队上限、进行中任务的心跳间隔，以及超过多少秒没有心跳的任务视为已中断
+    REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+    REPORT_JOB_QUEUE_LIMIT = int(os.environ.get('REPORT_JOB_QUEUE_LIMIT', 20))
+    REPORT_JOB_HEARTBEAT_SECONDS = int(os.environ.get('REPORT_JOB_HEARTBEAT_SECONDS', 30))
+    REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', 300))
+    
+    # 条件请求（ETag）响应的 Cache-Control：基础数据（用户、角色、项目）与业务数据（工时、日报周报、成本）
+    # 都要求每次重新验证（未变化时返回304），基础数据在服务不可用时允许使用缓存
+    CACHE_CONTROL_REFERENCE = os.environ.get('CACHE_CONTROL_REFERENCE', 'private, no-cache, stale-if-error=3600')
+    CACHE_CONTROL_TRANSACTIONAL = os.environ.get('CACHE_CONTROL_TRANSACTIONAL', 'private, no-cache')
+    
     # CORS配置
     CORS_HEADERS = 'Content-Type'
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or 'sqlite:///dev.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or 'sqlite:///rd_cost_system.db'
 
 class ProductionConfig(Config):
     """生产环境配置"""
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
 
 class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # 内存数据库只有一个连接，报表任务在请求内同步执行
+    REPORT_JOB_EAGER = True
 
 config = {
     'development': DevelopmentConfig,
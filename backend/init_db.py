@@ -8,16 +8,33 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
+from flask_migrate import upgrade, stamp
 from app.services.init_data import init_database
+from app.services.work_rollup import rebuild_rollups
 
 app = create_app()
 
+def migrate_database():
+    """迁移数据库结构到最新版本；本次迁移新建了工时日汇总表时，由已审批工时记录回填汇总"""
+    tables = db.inspect(db.engine).get_table_names()
+    if tables and 'alembic_version' not in tables:
+        # 由 db.create_all 创建的旧数据库：先标记为基线版本，再执行后续迁移
+        print("检测到未记录版本的旧数据库，标记为基线版本 0001")
+        stamp(revision='0001')
+    upgrade()
+    
+    if 'daily_work_rollups' not in tables:
+        # 汇总成本依赖费率历史和月薪分摊，无法在迁移中用SQL计算，迁移完成后重建
+        count = rebuild_rollups()
+        db.session.commit()
+        print(f"已回填 {count} 条工时日汇总")
+
 def init_db():
     """初始化数据库"""
     with app.app_context():
-        print("开始创建数据库表...")
-        db.create_all()
-        print("数据库表创建完成")
+        print("开始迁移数据库结构...")
+        migrate_database()
+        print("数据库结构迁移完成")
         
         print("开始初始化数据...")
         init_database()
@@ -0,0 +1,43 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 02:03:37.934547
+
+"""
+from app.database import create_index_online, drop_index_online
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# (索引名, 表名, 列, 是否唯一)
+INDEXES = [
+    ('uq_time_records_user_project_date', 'time_records', ['user_id', 'project_id', 'work_date'], True),
+    ('ix_time_records_user_date', 'time_records', ['user_id', 'work_date'], False),
+    ('ix_time_records_project_status_date', 'time_records', ['project_id', 'status', 'work_date'], False),
+    ('ix_time_records_status_date', 'time_records', ['status', 'work_date'], False),
+    ('uq_daily_reports_user_date', 'daily_reports', ['user_id', 'report_date'], True),
+    ('ix_daily_reports_status_date', 'daily_reports', ['status', 'report_date'], False),
+    ('uq_weekly_reports_user_week', 'weekly_reports', ['user_id', 'week_start'], True),
+    ('ix_weekly_reports_user_week_range', 'weekly_reports', ['user_id', 'week_start', 'week_end'], False),
+    ('ix_weekly_reports_status_week', 'weekly_reports', ['status', 'week_start'], False),
+    ('uq_cost_calculations_user_project_date', 'cost_calculations', ['user_id', 'project_id', 'calculation_date'], True),
+    ('ix_cost_calculations_project_date', 'cost_calculations', ['project_id', 'calculation_date'], False),
+    ('ix_cost_calculations_date', 'cost_calculations', ['calculation_date'], False),
+    ('uq_project_costs_project_period', 'project_costs', ['project_id', 'calculation_period', 'period_start', 'period_end'], True),
+    ('uq_project_members_project_user', 'project_members', ['project_id', 'user_id'], True),
+]
+
+
+def upgrade():
+    for index_name, table_name, columns, unique in INDEXES:
+        create_index_online(index_name, table_name, columns, unique=unique)
+
+
+def downgrade():
+    for index_name, table_name, columns, unique in reversed(INDEXES):
+        drop_index_online(index_name, table_name)
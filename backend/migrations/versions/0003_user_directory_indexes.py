@@ -0,0 +1,31 @@
+"""user directory indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 02:20:11.402318
+
+"""
+from app.database import create_index_online, drop_index_online
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (索引名, 表名, 列, 是否唯一)
+INDEXES = [
+    ('ix_users_department_status', 'users', ['department', 'status'], False),
+    ('ix_users_name', 'users', ['name'], False),
+]
+
+
+def upgrade():
+    for index_name, table_name, columns, unique in INDEXES:
+        create_index_online(index_name, table_name, columns, unique=unique)
+
+
+def downgrade():
+    for index_name, table_name, columns, unique in reversed(INDEXES):
+        drop_index_online(index_name, table_name)
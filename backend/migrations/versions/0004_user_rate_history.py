@@ -0,0 +1,46 @@
+"""user rate history
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 02:14:06.061420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_rate_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('hourly_rate', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('monthly_salary', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('effective_from', sa.Date(), nullable=False),
+    sa.Column('effective_to', sa.Date(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user_rate_history', schema=None) as batch_op:
+        batch_op.create_index('uq_user_rate_history_user_from', ['user_id', 'effective_from'], unique=True)
+
+    # 以现有用户的当前费率作为初始历史（适用于所有已有日期）
+    op.execute(
+        "INSERT INTO user_rate_history (user_id, hourly_rate, monthly_salary, effective_from, created_at) "
+        "SELECT id, hourly_rate, monthly_salary, '1970-01-01', CURRENT_TIMESTAMP FROM users "
+        "WHERE hourly_rate IS NOT NULL OR monthly_salary IS NOT NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('user_rate_history', schema=None) as batch_op:
+        batch_op.drop_index('uq_user_rate_history_user_from')
+
+    op.drop_table('user_rate_history')
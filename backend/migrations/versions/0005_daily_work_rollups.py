@@ -0,0 +1,50 @@
+"""daily work rollups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 02:20:09.652199
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 汇总成本依赖费率历史和月薪分摊，不在迁移中回填：init_db.py 迁移新建此表后自动重建，
+    # 直接执行 flask db upgrade 时需再执行 flask rebuild-rollups
+    op.create_table('daily_work_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('work_date', sa.Date(), nullable=False),
+    sa.Column('work_type', sa.String(length=50), nullable=False),
+    sa.Column('hours', sa.Numeric(precision=8, scale=2), nullable=False),
+    sa.Column('record_count', sa.Integer(), nullable=False),
+    sa.Column('cost', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('daily_work_rollups', schema=None) as batch_op:
+        batch_op.create_index('uq_daily_work_rollups_key', ['user_id', 'project_id', 'work_date', 'work_type'], unique=True)
+        batch_op.create_index('ix_daily_work_rollups_project_date', ['project_id', 'work_date'], unique=False)
+        batch_op.create_index('ix_daily_work_rollups_user_date', ['user_id', 'work_date'], unique=False)
+        batch_op.create_index('ix_daily_work_rollups_date', ['work_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_work_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_work_rollups_date')
+        batch_op.drop_index('ix_daily_work_rollups_user_date')
+        batch_op.drop_index('ix_daily_work_rollups_project_date')
+        batch_op.drop_index('uq_daily_work_rollups_key')
+
+    op.drop_table('daily_work_rollups')
@@ -0,0 +1,48 @@
+"""cost report jobs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 02:23:15.857542
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cost_report_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('request_key', sa.String(length=64), nullable=False),
+    sa.Column('active_key', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.Column('message', sa.String(length=500), nullable=True),
+    sa.Column('parameters', sa.Text(), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=True),
+    sa.Column('requested_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['cost_reports.id'], ),
+    sa.ForeignKeyConstraint(['requested_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('cost_report_jobs', schema=None) as batch_op:
+        batch_op.create_index('uq_cost_report_jobs_active_key', ['active_key'], unique=True)
+        batch_op.create_index('ix_cost_report_jobs_requested_by_created', ['requested_by', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cost_report_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_cost_report_jobs_requested_by_created')
+        batch_op.drop_index('uq_cost_report_jobs_active_key')
+
+    op.drop_table('cost_report_jobs')
@@ -0,0 +1,122 @@
+"""compressed cost report payload
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 02:25:05.928982
+
+"""
+import json
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+cost_reports = sa.table('cost_reports',
+    sa.column('id', sa.Integer()),
+    sa.column('report_data', sa.Text()),
+    sa.column('report_payload', sa.LargeBinary())
+)
+
+BATCH_SIZE = 500
+COMPRESSION_LEVEL = 6
+
+
+def _convert(source, target, convert):
+    """按ID分批读取 source 列，转换后写入 target 列"""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(cost_reports.c.id, cost_reports.c[source])
+            .where(cost_reports.c.id > last_id)
+            .order_by(cost_reports.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for report_id, value in rows:
+            bind.execute(
+                cost_reports.update().where(cost_reports.c.id == report_id).values({target: convert(value)})
+            )
+        last_id = rows[-1][0]
+
+
+# 以下为本版本的列式格式编解码（冻结副本，不随 app.services.report_payload 变更，迁移不依赖应用模型）：
+#     {"fields": {标量字段...}, "sections": {分区名: {"columns": [...], "values": [[列1...], [列2...]]}}}
+
+def _is_rows(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def _to_columns(rows):
+    """行列表转换为列式结构，列顺序为各列首次出现的顺序"""
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return {
+        'columns': columns,
+        'values': [[row.get(column) for row in rows] for column in columns]
+    }
+
+
+def _to_rows(section):
+    """列式结构还原为行列表"""
+    return [dict(zip(section['columns'], row)) for row in zip(*section['values'])]
+
+
+def _encode(report_data):
+    try:
+        data = json.loads(report_data) if report_data else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {'data': data}
+
+    layout = {'fields': {}, 'sections': {}}
+    for key, value in data.items():
+        if _is_rows(value):
+            layout['sections'][key] = _to_columns(value)
+        else:
+            layout['fields'][key] = value
+    content = json.dumps(layout, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(content.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def _decode(payload):
+    if not payload:
+        return json.dumps({})
+    layout = json.loads(zlib.decompress(payload).decode('utf-8'))
+    data = dict(layout['fields'])
+    for name, section in layout['sections'].items():
+        data[name] = _to_rows(section)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def upgrade():
+    with op.batch_alter_table('cost_reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('report_payload', sa.LargeBinary(), nullable=True))
+
+    # 将原有的JSON文本转换为压缩的列式格式
+    _convert('report_data', 'report_payload', _encode)
+
+    with op.batch_alter_table('cost_reports', schema=None) as batch_op:
+        batch_op.drop_column('report_data')
+
+
+def downgrade():
+    with op.batch_alter_table('cost_reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('report_data', sa.Text(), nullable=True))
+
+    _convert('report_payload', 'report_data', _decode)
+
+    with op.batch_alter_table('cost_reports', schema=None) as batch_op:
+        batch_op.drop_column('report_payload')
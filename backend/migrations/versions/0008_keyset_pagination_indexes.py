@@ -0,0 +1,34 @@
+"""keyset pagination indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 02:27:11.747796
+
+"""
+from app.database import create_index_online, drop_index_online
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# 游标分页排序键索引：(索引名, 表名, 列, 是否唯一)
+INDEXES = [
+    ('ix_time_records_date_created', 'time_records', ['work_date', 'created_at', 'id'], False),
+    ('ix_daily_reports_date_created', 'daily_reports', ['report_date', 'created_at', 'id'], False),
+    ('ix_weekly_reports_week_created', 'weekly_reports', ['week_start', 'created_at', 'id'], False),
+    ('ix_cost_calculations_date_created', 'cost_calculations', ['calculation_date', 'created_at', 'id'], False),
+    ('ix_project_costs_project_start_created', 'project_costs', ['project_id', 'period_start', 'created_at', 'id'], False),
+]
+
+
+def upgrade():
+    for index_name, table_name, columns, unique in INDEXES:
+        create_index_online(index_name, table_name, columns, unique=unique)
+
+
+def downgrade():
+    for index_name, table_name, columns, unique in reversed(INDEXES):
+        drop_index_online(index_name, table_name)
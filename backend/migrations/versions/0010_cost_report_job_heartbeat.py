@@ -0,0 +1,29 @@
+"""cost report job heartbeat
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 03:10:42.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cost_report_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+    # 已有任务的心跳时间取更新时间
+    op.execute('UPDATE cost_report_jobs SET heartbeat_at = updated_at')
+
+
+def downgrade():
+    with op.batch_alter_table('cost_report_jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
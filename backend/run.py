@@ -1,6 +1,8 @@
 import os
-from app import create_app
+from app import create_app, db
 from app.services.init_data import init_database
+from app.services.work_rollup import rebuild_rollups
+from app.services.rate_history import apply_due_rate_changes
 
 app = create_app()
 
@@ -10,5 +12,21 @@ def init_db():
     with app.app_context():
         init_database()
 
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """重建工时日汇总表"""
+    with app.app_context():
+        count = rebuild_rollups()
+        db.session.commit()
+        print(f"已重建 {count} 条工时日汇总")
+
+@app.cli.command('apply-rate-changes')
+def apply_rate_changes_command():
+    """将已到生效日期的费率变更同步到用户当前费率"""
+    with app.app_context():
+        count = apply_due_rate_changes()
+        db.session.commit()
+        print(f"已更新 {count} 位用户的当前费率")
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001) 
\ No newline at end of file
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+JSON provider 输出测试脚本
+对比 FastJSONProvider 与 Flask 默认 provider 的输出：
+除浮点数指数写法外逐字节一致（含非ASCII字符的 \\uXXXX 转义），差异部分解析结果相同
+"""
+
+import json
+import os
+import sys
+from datetime import date, datetime, time
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from app.json_provider import FastJSONProvider, ascii_escape
+
+# 与默认 provider 逐字节一致的内容
+SAME_OUTPUT = [
+    {'b': 1, 'a': [1, 2.5, None, True, False], 'c': {'z': '', 'y': 'x"\\/\n\t'}},
+    {'amount': Decimal('12.50'), 'rate': 0.1, 'hours': 8.0, 'large': 123456789012345.6},
+    [0.0001, 1e15, -3.25, 2 ** 63 - 1],
+    {'title': 'ascii only \x00\x1f'},
+    {'name': '研发成本', 'department': '研发部', 'notes': ['é😀\x7f', 'ascii']},
+    '研发成本',
+    'é😀\x7f',
+]
+
+# (值, 默认 provider 输出, FastJSONProvider 输出)：只有写法不同
+DIFFERENT_OUTPUT = [
+    (7e-7, '7e-07', '7e-7'),
+    (1e18, '1e+18', '1e18'),
+    (1e16, '1e+16', '1e16'),
+    (-2.5e-5, '-2.5e-05', '-0.000025'),
+]
+
+def compact(provider, obj):
+    """紧凑格式输出（与响应相同）"""
+    return provider.dumps(obj, separators=(',', ':'))
+
+def test_same_output(fast, default):
+    """常规内容与默认 provider 逐字节一致（紧凑和缩进格式）"""
+    print("\n=== 测试与默认 provider 一致的输出 ===")
+    for obj in SAME_OUTPUT:
+        assert compact(fast, obj) == compact(default, obj), obj
+        assert fast.dumps(obj, indent=2) == default.dumps(obj, indent=2), obj
+    print(f"{len(SAME_OUTPUT)} 组数据输出一致")
+
+def test_different_output(fast, default):
+    """指数浮点数写法不同，解析结果相同"""
+    print("\n=== 测试与默认 provider 不同的输出 ===")
+    for value, expected_default, expected_fast in DIFFERENT_OUTPUT:
+        assert compact(default, value) == expected_default, (value, compact(default, value))
+        assert compact(fast, value) == expected_fast, (value, compact(fast, value))
+        assert json.loads(expected_fast) == json.loads(expected_default) == value
+        print(f"{value!r}: {expected_default} -> {expected_fast}")
+
+def test_responses(app, fast, default):
+    """响应 bytes 与默认 provider 一致（纯ASCII和含非ASCII字符的内容），非ASCII字符转义为 \\uXXXX"""
+    print("\n=== 测试响应与默认 provider 一致 ===")
+    for obj in SAME_OUTPUT:
+        with app.test_request_context():
+            assert fast.response(obj).data == default.response(obj).data, obj
+    with app.test_request_context():
+        data = fast.response({'name': '研发é😀\x7f'}).data
+    assert data == b'{"name":"\\u7814\\u53d1\\u00e9\\ud83d\\ude00\\u007f"}\n', data
+    
+    # 流式输出报表使用的转义与 json.dumps 相同
+    text = json.dumps({'name': '研发é😀\x7f'}, ensure_ascii=False)
+    assert ascii_escape(text) == json.dumps({'name': '研发é😀\x7f'})
+    print(f"{len(SAME_OUTPUT)} 组响应逐字节一致")
+
+def test_utf8_output(app, default):
+    """配置 ensure_ascii=False 时非ASCII字符直接输出 UTF-8，与默认 provider 同样配置时一致"""
+    print("\n=== 测试 ensure_ascii=False ===")
+    provider = FastJSONProvider(app)
+    provider.ensure_ascii = default.ensure_ascii = False
+    for obj in SAME_OUTPUT:
+        assert compact(provider, obj) == compact(default, obj), obj
+    assert compact(provider, 'é😀\x7f') == '"é😀\x7f"'
+    default.ensure_ascii = True
+    print("输出与默认 provider 一致")
+
+def test_dumps_and_response(app, fast):
+    """dumps 不带参数为紧凑格式；响应按 ISO 格式输出日期时间，结尾换行"""
+    print("\n=== 测试 dumps 与响应 ===")
+    assert fast.dumps({'b': 1, 'a': '中'}) == '{"a":"\\u4e2d","b":1}'
+    # orjson 不支持的内容（非字符串键）退回标准库，格式相同
+    assert fast.dumps({2: '中', 1: 2 ** 70}) == '{"1":1180591620717411303424,"2":"\\u4e2d"}'
+    
+    obj = {'day': date(2024, 1, 2), 'at': datetime(2024, 1, 2, 3, 4, 5), 'start': time(9, 30), 'cost': Decimal('1.50')}
+    with app.test_request_context():
+        response = fast.response(obj)
+    assert response.data == b'{"at":"2024-01-02T03:04:05","cost":"1.50","day":"2024-01-02","start":"09:30:00"}\n', response.data
+    print("dumps 与响应输出正确")
+
+def main():
+    """主测试函数"""
+    print("研发成本统计系统 - JSON provider 输出测试")
+    print("=" * 50)
+    
+    app = create_app('testing')
+    fast, default = app.json, DefaultJSONProvider(app)
+    
+    test_same_output(fast, default)
+    test_different_output(fast, default)
+    test_responses(app, fast, default)
+    test_utf8_output(app, default)
+    test_dumps_and_response(app, fast)
+    
+    print("\n=== 测试完成 ===")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+数据库迁移测试脚本
+在临时 SQLite 文件上迁移到工时日汇总表之前的版本并写入已审批工时记录，
+再执行 init_db 的迁移流程，校验汇总表已回填、统计接口结果与工时记录一致
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date, datetime, time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DATABASE_DIR = tempfile.mkdtemp()
+os.environ['DEV_DATABASE_URL'] = f"sqlite:///{os.path.join(DATABASE_DIR, 'migration.db')}"
+
+from flask_migrate import upgrade
+from app import create_app, db
+from app.models import User, Project, TimeRecord, DailyWorkRollup
+from app.services.init_data import init_database
+from init_db import migrate_database
+
+def seed_records():
+    """写入两个时薪用户的工时记录：3条已审批、1条待审核"""
+    users = [
+        User(username='dev1', email='dev1@example.com', password_hash='x', name='开发1', employee_id='M001', hourly_rate=100),
+        User(username='dev2', email='dev2@example.com', password_hash='x', name='开发2', employee_id='M002', hourly_rate=150)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    project = Project(name='迁移项目', code='M1', start_date=date(2024, 1, 1), manager_id=users[0].id)
+    db.session.add(project)
+    db.session.flush()
+    
+    for user, day, hours, status in [(users[0], 2, 8, 'approved'), (users[0], 3, 4, 'approved'),
+                                     (users[1], 2, 6, 'approved'), (users[1], 4, 8, 'pending')]:
+        db.session.add(TimeRecord(
+            user_id=user.id, project_id=project.id, work_date=date(2024, 1, day), start_time=time(9),
+            end_time=time(17), hours=hours, work_content='开发', work_type='development', status=status,
+            approved_at=datetime.utcnow() if status == 'approved' else None
+        ))
+    db.session.commit()
+    return users
+
+def test_rollup_backfill():
+    """迁移新建汇总表后由已有的已审批工时记录回填，统计接口读取到升级前的数据"""
+    print("\n=== 测试升级时回填工时日汇总 ===")
+    app = create_app('development')
+    with app.app_context():
+        # 迁移到工时日汇总表之前的版本（0003）写入数据，0004 由用户当前费率回填费率历史
+        upgrade(revision='0003')
+        users = seed_records()
+        user_ids = [user.id for user in users]
+        db.session.remove()
+        
+        with redirect_stdout(io.StringIO()):
+            migrate_database()
+            init_database()
+        
+        rows = {
+            (row.user_id, row.work_date): (row.hours, row.record_count, row.cost)
+            for row in DailyWorkRollup.query
+        }
+        assert rows == {
+            (user_ids[0], date(2024, 1, 2)): (8, 1, 800),
+            (user_ids[0], date(2024, 1, 3)): (4, 1, 400),
+            (user_ids[1], date(2024, 1, 2)): (6, 1, 900)
+        }, rows
+        print(f"回填 {len(rows)} 条汇总")
+        
+        client = app.test_client()
+        with redirect_stdout(io.StringIO()):
+            response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+            assert response.status_code == 200
+            statistics = client.get('/api/time-records/statistics').get_json()
+            costs = client.get('/api/costs/statistics').get_json()
+        assert (statistics['total_hours'], statistics['total_days']) == (18, 2), statistics
+        assert statistics['project_statistics'] == {'迁移项目': {'hours': 18, 'days': 2}}, statistics
+        assert (costs['personal_costs']['total_hours'], costs['personal_costs']['total_cost']) == (18, 2100), costs
+        print("工时统计: 18小时 / 2天，成本统计: 2100.00")
+        
+        # 汇总表已存在时再次迁移不重建
+        DailyWorkRollup.query.filter_by(user_id=user_ids[1]).delete()
+        db.session.commit()
+        with redirect_stdout(io.StringIO()):
+            migrate_database()
+        assert DailyWorkRollup.query.count() == 2
+        print("已是最新版本时不重建汇总")
+        
+        db.session.remove()
+        db.engine.dispose()
+
+def main():
+    """主测试函数"""
+    print("研发成本统计系统 - 数据库迁移测试")
+    print("=" * 50)
+    
+    test_rollup_backfill()
+    shutil.rmtree(DATABASE_DIR)
+    
+    print("\n=== 测试完成 ===")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+列表接口SQL查询次数、条件请求与计算结果测试脚本
+在进程内使用测试配置（内存数据库）启动应用，写入批量数据后，
+校验各列表接口的SQL查询次数不超过固定预算（不随每页行数增长），
+以及列表输出、游标分页、字段子集、Bearer 令牌、权限缓存失效、用户选择器翻页、成本分摊、费率历史、批量计算、工时日汇总、报告统计和报表任务合并的计算结果
+"""
+
+import base64
+import io
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager, redirect_stdout
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, TimestampSigner
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models import (User, Role, Project, ProjectMember, TimeRecord, DailyReport, WeeklyReport,
+                        CostCalculation, ProjectCost, CostReport, CostReportJob, DailyWorkRollup)
+from app.services.init_data import init_database
+from app.services.work_rollup import rebuild_rollups
+from app.services.report_payload import encode_report_data
+from app.services.cost_allocation import allocate_costs
+from app.services.rate_history import load_rate_index
+from app.services.report_jobs import _request_key
+from app.services.auth_tokens import ACCESS_TOKEN_SALT
+from app.services.user_directory import invalidate_user_directory, DEFAULT_PICKER_LIMIT
+
+ROW_COUNT = 60
+
+# (接口, 查询预算)：列表接口和统计接口的查询次数都不应随数据量增长
+ENDPOINT_BUDGETS = [
+    (f'/api/users/?per_page={ROW_COUNT}', 3),
+    (f'/api/projects/?per_page={ROW_COUNT}', 3),
+    (f'/api/time-records/?per_page={ROW_COUNT}', 2),
+    (f'/api/reports/daily?per_page={ROW_COUNT}', 2),
+    (f'/api/reports/weekly?per_page={ROW_COUNT}', 2),
+    (f'/api/costs/calculations?per_page={ROW_COUNT}', 2),
+    (f'/api/costs/project/1?per_page={ROW_COUNT}', 2),
+    (f'/api/costs/reports?per_page={ROW_COUNT}', 2),
+    # 游标模式不统计总数，只有一次分页查询
+    (f'/api/time-records/?cursor=&per_page={ROW_COUNT}', 1),
+    (f'/api/reports/daily?cursor=&per_page={ROW_COUNT}', 1),
+    (f'/api/costs/calculations?cursor=&per_page={ROW_COUNT}', 1),
+    # 字段子集：不预加载未请求的关联，项目列表不统计成员数
+    (f'/api/time-records/?fields=id,work_date,hours&per_page={ROW_COUNT}', 2),
+    (f'/api/projects/?fields=id,name,status&per_page={ROW_COUNT}', 2),
+    (f'/api/users/?fields=id,name&per_page={ROW_COUNT}', 2),
+    ('/api/time-records/statistics', 2),
+    ('/api/reports/statistics?breakdown=user,week', 8),
+    ('/api/costs/statistics', 2),
+]
+
+# 条件请求：结果集未变化时只执行校验值查询，返回304
+CONDITIONAL_URLS = [
+    f'/api/users/?per_page={ROW_COUNT}',
+    f'/api/projects/?per_page={ROW_COUNT}',
+    f'/api/time-records/?per_page={ROW_COUNT}',
+    '/api/time-records/1',
+    f'/api/costs/reports?per_page={ROW_COUNT}',
+]
+
+@contextmanager
+def count_queries():
+    """统计代码块内执行的SQL语句"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+def assert_query_budget(client, url, budget):
+    """请求接口并断言SQL查询次数不超过预算"""
+    with count_queries() as statements:
+        with redirect_stdout(io.StringIO()):
+            response = client.get(url)
+    assert response.status_code == 200, f"{url} 返回 {response.status_code}"
+    assert len(statements) <= budget, f"{url} 执行了 {len(statements)} 次查询，预算 {budget}:\n" + "\n".join(statements)
+    print(f"{url}: {len(statements)} 次查询 (预算 {budget})")
+
+def assert_not_modified(client, url):
+    """携带 ETag 重复请求，断言返回304且只执行一次校验值查询"""
+    with redirect_stdout(io.StringIO()):
+        etag = client.get(url).headers['ETag']
+    with count_queries() as statements:
+        with redirect_stdout(io.StringIO()):
+            response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304, f"{url} 返回 {response.status_code}"
+    assert len(statements) <= 1, f"{url} 返回304前执行了 {len(statements)} 次查询:\n" + "\n".join(statements)
+    print(f"{url}: 304 ({len(statements)} 次查询)")
+
+def seed_data():
+    """写入测试数据：多个用户/项目，每个列表至少 ROW_COUNT 行"""
+    with redirect_stdout(io.StringIO()):
+        init_database()
+
+    developer = Role.query.filter_by(name='developer').first()
+    password_hash = generate_password_hash('password')
+    users = []
+    for i in range(ROW_COUNT):
+        user = User(
+            username=f'user{i}', email=f'user{i}@example.com', password_hash=password_hash,
+            name=f'用户{i}', employee_id=f'E{i:04d}', department='研发部', hourly_rate=100 + i
+        )
+        user.roles = [developer]
+        users.append(user)
+    db.session.add_all(users)
+    db.session.flush()
+
+    admin = User.query.filter_by(username='admin').first()
+    projects = [Project(name=f'项目{i}', code=f'P{i}', start_date=date(2024, 1, 1), manager_id=admin.id) for i in range(6)]
+    db.session.add_all(projects)
+    db.session.flush()
+
+    start = date(2024, 1, 1)
+    for i, user in enumerate(users):
+        project = projects[i % len(projects)]
+        day = start + timedelta(days=i)
+        db.session.add(ProjectMember(project_id=project.id, user_id=user.id, start_date=start))
+        db.session.add(TimeRecord(
+            user_id=user.id, project_id=project.id, work_date=day, start_time=time(9), end_time=time(17),
+            hours=8, work_content='开发', work_type='development', status='approved',
+            approved_by=admin.id, approved_at=datetime.utcnow()
+        ))
+        db.session.add(DailyReport(user_id=user.id, report_date=day, work_content='日报', approved_by=admin.id))
+        db.session.add(WeeklyReport(user_id=user.id, week_start=day, week_end=day + timedelta(days=6),
+                                    week_summary='周报', approved_by=admin.id))
+        db.session.add(CostCalculation(user_id=user.id, project_id=project.id, calculation_date=day,
+                                       work_hours=8, hourly_rate=user.hourly_rate, total_cost=8 * user.hourly_rate))
+        db.session.add(ProjectCost(project_id=projects[0].id, calculation_period='daily', period_start=day,
+                                   period_end=day, total_hours=8, total_cost=800, member_count=1, cost_per_hour=100))
+        db.session.add(CostReport(report_name=f'报表{i}', report_type='company', report_period='daily',
+                                  period_start=day, period_end=day, report_payload=encode_report_data({}), generated_by=admin.id))
+    db.session.commit()
+    
+    # 工时记录直接写入，需要重建日汇总
+    rebuild_rollups()
+    db.session.commit()
+
+def test_list_query_budgets():
+    """校验所有列表接口的查询预算"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed_data()
+
+        client = app.test_client()
+        with redirect_stdout(io.StringIO()):
+            response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 200
+
+        for url, budget in ENDPOINT_BUDGETS:
+            # 首次请求预热权限缓存，之后的请求才计入预算
+            with redirect_stdout(io.StringIO()):
+                client.get(url)
+            assert_query_budget(client, url, budget)
+
+        for url in CONDITIONAL_URLS:
+            assert_not_modified(client, url)
+
+        # 数据变化（修改、删除）后校验值随之改变；只按 ETag 判断，If-Modified-Since 不返回304
+        url = f'/api/time-records/?per_page={ROW_COUNT}'
+        for change in ('修改', '删除'):
+            with redirect_stdout(io.StringIO()):
+                etag = client.get(url).headers['ETag']
+                record = TimeRecord.query.order_by(TimeRecord.id).first()
+                if change == '修改':
+                    record.hours = float(record.hours) + 1
+                else:
+                    db.session.delete(record)
+                db.session.commit()
+                response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 200 and response.headers['ETag'] != etag, f"{change}记录后仍返回304"
+            print(f"{url}: {change}记录后返回200")
+        with redirect_stdout(io.StringIO()):
+            response = client.get(url, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+        assert response.status_code == 200 and 'Last-Modified' not in response.headers
+
+        db.session.remove()
+        db.drop_all()
+
+def request_json(client, method, url, **kwargs):
+    """发送请求（屏蔽接口的调试输出），返回 (状态码, JSON)"""
+    with redirect_stdout(io.StringIO()):
+        response = getattr(client, method)(url, **kwargs)
+    return response.status_code, response.get_json()
+
+def check_list_serialization(client):
+    """列表接口批量预加载关联后的输出与逐条懒加载的 to_dict 一致（含用户/项目/审批人名称）"""
+    print("\n--- 列表输出与逐条序列化一致 ---")
+    for url, key, model in [('/api/time-records/', 'records', TimeRecord),
+                            ('/api/reports/daily', 'reports', DailyReport),
+                            ('/api/reports/weekly', 'reports', WeeklyReport),
+                            ('/api/costs/calculations', 'calculations', CostCalculation),
+                            ('/api/costs/project/1', 'costs', ProjectCost),
+                            ('/api/users/', 'users', User)]:
+        status, result = request_json(client, 'get', f'{url}?per_page={ROW_COUNT * 2}')
+        assert status == 200 and len(result[key]) >= ROW_COUNT, (url, status)
+        db.session.expire_all()
+        for item in result[key]:
+            expected = json.loads(current_app.json.dumps(db.session.get(model, item['id']).to_dict()))
+            assert item == expected, (url, item, expected)
+        print(f"{url}: {len(result[key])} 行与逐条序列化一致")
+    
+    # 关联名称确实已输出（种子数据：用户ID为 i+2 的用户名为 用户{i}，均由管理员审批）
+    admin = User.query.filter_by(username='admin').one()
+    status, result = request_json(client, 'get', f'/api/time-records/?status=approved&per_page={ROW_COUNT * 2}')
+    for item in result['records']:
+        assert item['user_name'] == f"用户{item['user_id'] - 2}" and item['project_name'], item
+        assert item['approver_name'] == admin.name, item
+
+def check_sparse_fields(client):
+    """fields= 只输出请求的字段，取值与完整输出相同；未知字段返回400"""
+    print("\n--- 字段子集 ---")
+    for url, key, fields in [('/api/time-records/', 'records', 'id,hours,user_name'),
+                             ('/api/time-records/?cursor=', 'records', 'work_date,approver_name'),
+                             ('/api/reports/daily', 'reports', 'id,report_date,user_name'),
+                             ('/api/costs/calculations', 'calculations', 'total_cost,project_name'),
+                             ('/api/projects/', 'projects', 'name,member_count'),
+                             ('/api/users/', 'users', 'username,roles')]:
+        separator = '&' if '?' in url else '?'
+        status, full = request_json(client, 'get', f'{url}{separator}per_page={ROW_COUNT * 2}')
+        assert status == 200
+        status, sparse = request_json(client, 'get', f'{url}{separator}per_page={ROW_COUNT * 2}&fields={fields}')
+        assert status == 200 and len(sparse[key]) == len(full[key]), (url, status)
+        names = fields.split(',')
+        for item, full_item in zip(sparse[key], full[key]):
+            assert item == {name: full_item[name] for name in names}, (url, item, full_item)
+        print(f"{url} fields={fields}: {len(sparse[key])} 行只含请求的字段")
+    
+    record = TimeRecord.query.order_by(TimeRecord.id).first()
+    for url, key, fields in [(f'/api/time-records/{record.id}', 'record', 'hours,project_name'),
+                             ('/api/projects/1', 'project', 'code'),
+                             ('/api/users/1', 'user', 'username,roles')]:
+        _, full = request_json(client, 'get', url)
+        status, sparse = request_json(client, 'get', f'{url}?fields={fields}')
+        assert status == 200 and sparse[key] == {name: full[key][name] for name in fields.split(',')}, sparse
+    print("详情接口只含请求的字段")
+    
+    for url in ['/api/time-records/?fields=id,bogus,nope', '/api/time-records/?cursor=&fields=password_hash',
+                '/api/reports/daily?fields=id,bogus', '/api/costs/calculations?fields=nope',
+                '/api/projects/?fields=nope', '/api/users/?fields=password_hash', f'/api/time-records/{record.id}?fields=nope']:
+        status, result = request_json(client, 'get', url)
+        assert status == 400 and result['message'].startswith('未知字段'), (url, status, result)
+    status, result = request_json(client, 'get', '/api/time-records/?fields=id,bogus,nope')
+    assert result['message'] == '未知字段: bogus, nope', result
+    print("未知字段返回400")
+
+def check_keyset_pagination(client):
+    """游标分页与 OFFSET 分页顺序一致，上一页游标可逐页翻回，无效游标和分页参数返回400"""
+    print("\n--- 游标分页 ---")
+    per_page = 7
+    for url, key in [('/api/time-records/', 'records'), ('/api/reports/daily', 'reports'),
+                     ('/api/costs/calculations', 'calculations')]:
+        status, result = request_json(client, 'get', f'{url}?per_page={per_page}')
+        assert status == 200
+        offset_pages = []
+        for page in range(1, result['pages'] + 1):
+            status, result = request_json(client, 'get', f'{url}?per_page={per_page}&page={page}')
+            offset_pages.append([item['id'] for item in result[key]])
+        
+        cursor_pages, cursor = [], ''
+        while True:
+            status, result = request_json(client, 'get', f'{url}?per_page={per_page}&cursor={cursor}&count=exact')
+            assert status == 200 and result['total'] == sum(map(len, offset_pages)), result
+            assert (result['prev_cursor'] is None) == (cursor == ''), result
+            cursor_pages.append([item['id'] for item in result[key]])
+            if result['next_cursor'] is None:
+                break
+            cursor = result['next_cursor']
+        assert cursor_pages == offset_pages, (url, cursor_pages, offset_pages)
+        
+        # 从最后一页按上一页游标翻回第一页
+        back_pages = [cursor_pages[-1]]
+        while result['prev_cursor'] is not None:
+            status, result = request_json(client, 'get', f"{url}?per_page={per_page}&cursor={result['prev_cursor']}")
+            assert status == 200
+            back_pages.append([item['id'] for item in result[key]])
+        assert back_pages[::-1] == cursor_pages, (url, back_pages)
+        print(f"{url}: 游标翻页 {len(cursor_pages)} 页与 OFFSET 顺序一致，上一页游标翻回首页")
+    
+    # 无法解析、方向或键数不符、键值类型不符的游标，以及无效的 per_page/count
+    def encode_cursor(values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+    
+    bad_cursors = [['n'], ['x', '2024-01-01', 'x', 1], ['n', 'x', 'x', 1]]
+    for query in ['cursor=not-a-cursor!', 'cursor=&per_page=0', 'cursor=&count=all'] + [
+            f'cursor={encode_cursor(values)}' for values in bad_cursors]:
+        status, result = request_json(client, 'get', f'/api/time-records/?{query}')
+        assert status == 400, (query, status, result)
+    status, result = request_json(client, 'get', '/api/time-records/?cursor=not-a-cursor!')
+    assert result['message'] == '分页游标无效', result
+    print("无效游标和分页参数返回400")
+
+def check_bearer_tokens(app):
+    """Bearer 令牌鉴权：按令牌内的角色/权限授权且不查询权限表；无效、过期或类型不符的令牌返回401"""
+    print("\n--- Bearer 令牌 ---")
+    client = app.test_client()
+    
+    def bearer(token):
+        return {'Authorization': f'Bearer {token}'}
+    
+    tokens = {}
+    for username, password in [('admin', 'admin123'), ('user0', 'password')]:
+        status, result = request_json(client, 'post', '/api/auth/login',
+                                      json={'username': username, 'password': password, 'mode': 'token'})
+        assert status == 200 and result['token_type'] == 'Bearer', result
+        tokens[username] = result
+    # 令牌登录不建立 Session
+    status, _ = request_json(client, 'get', '/api/costs/statistics')
+    assert status == 401
+    
+    with count_queries() as statements:
+        status, _ = request_json(client, 'get', '/api/costs/statistics', headers=bearer(tokens['user0']['access_token']))
+    assert status == 200
+    permission_queries = [statement for statement in statements if 'permissions' in statement or 'user_roles' in statement]
+    assert not permission_queries, permission_queries
+    status, _ = request_json(client, 'get', '/api/roles/', headers=bearer(tokens['user0']['access_token']))
+    assert status == 403
+    status, _ = request_json(client, 'get', '/api/roles/', headers=bearer(tokens['admin']['access_token']))
+    assert status == 200
+    print("访问令牌按内嵌的角色和权限授权，不查询权限表")
+    
+    # 篡改（管理员令牌的签名配普通用户令牌的内容）、格式错误、过期的访问令牌，以及把刷新令牌当作访问令牌
+    access_token = tokens['admin']['access_token']
+    forged_token = '.'.join(tokens['user0']['access_token'].split('.')[:2] + access_token.split('.')[2:])
+    expires = app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    
+    class ExpiredSigner(TimestampSigner):
+        def get_timestamp(self):
+            return int((datetime.now() - expires).timestamp()) - 60
+    
+    serializer = URLSafeTimedSerializer(app.config['JWT_SECRET_KEY'], salt=ACCESS_TOKEN_SALT)
+    expired_token = URLSafeTimedSerializer(app.config['JWT_SECRET_KEY'], salt=ACCESS_TOKEN_SALT,
+                                           signer=ExpiredSigner).dumps(serializer.loads(access_token))
+    for token in [forged_token, 'not-a-token', expired_token, tokens['admin']['refresh_token']]:
+        status, result = request_json(client, 'get', '/api/costs/statistics', headers=bearer(token))
+        assert status == 401, (token, status, result)
+    print("无效、过期的访问令牌及刷新令牌鉴权返回401")
+    
+    # 刷新：只接受刷新令牌，访问令牌不能用于刷新
+    status, result = request_json(client, 'post', '/api/auth/refresh', json={'refresh_token': access_token})
+    assert status == 401, result
+    status, result = request_json(client, 'post', '/api/auth/refresh', json={'refresh_token': 'not-a-token'})
+    assert status == 401, result
+    status, result = request_json(client, 'post', '/api/auth/refresh',
+                                  json={'refresh_token': tokens['admin']['refresh_token']})
+    assert status == 200 and result['access_token'], result
+    status, _ = request_json(client, 'get', '/api/roles/', headers=bearer(result['access_token']))
+    assert status == 200
+    print("访问令牌不能用于刷新，刷新令牌换取的访问令牌可用")
+
+def check_permission_cache(app, client):
+    """权限集合缓存命中时不查询权限表；修改角色权限或用户角色后立即生效（不等缓存过期）"""
+    print("\n--- 权限缓存失效 ---")
+    user = User.query.filter_by(username='user1').one()
+    developer = Role.query.filter_by(name='developer').one()
+    permissions = sorted(permission.name for permission in developer.permissions)
+    user_client = app.test_client()
+    status, _ = request_json(user_client, 'post', '/api/auth/login', json={'username': 'user1', 'password': 'password'})
+    assert status == 200
+    
+    def user_status(url):
+        status, _ = request_json(user_client, 'get', url)
+        return status
+    
+    assert user_status('/api/costs/statistics') == 200
+    with count_queries() as statements:
+        assert user_status('/api/costs/statistics') == 200
+    assert not [statement for statement in statements if 'role_permissions' in statement], statements
+    
+    # 角色权限变更
+    status, _ = request_json(client, 'put', f'/api/roles/{developer.id}',
+                             json={'permissions': [name for name in permissions if name != 'cost_read']})
+    assert status == 200
+    assert user_status('/api/costs/statistics') == 403
+    status, _ = request_json(client, 'put', f'/api/roles/{developer.id}', json={'permissions': permissions})
+    assert status == 200
+    assert user_status('/api/costs/statistics') == 200
+    print("角色移除/恢复 cost_read 后立即 403/200")
+    
+    # 用户角色变更
+    assert user_status('/api/roles/') == 403
+    status, _ = request_json(client, 'put', f'/api/users/{user.id}', json={'roles': ['developer', 'admin']})
+    assert status == 200
+    assert user_status('/api/roles/') == 200
+    status, _ = request_json(client, 'put', f'/api/users/{user.id}', json={'roles': ['developer']})
+    assert status == 200
+    assert user_status('/api/roles/') == 403
+    print("用户增加/移除 admin 角色后立即 200/403")
+
+def check_user_picker(client):
+    """用户选择器默认只返回前 DEFAULT_PICKER_LIMIT 个用户，按 after_id 翻页或按前缀搜索可取到其余用户"""
+    print("\n--- 用户选择器 ---")
+    invalidate_user_directory()
+    expected = [user_id for user_id, in db.session.query(User.id).filter_by(status='active').order_by(User.id)]
+    assert len(expected) > DEFAULT_PICKER_LIMIT
+    
+    status, result = request_json(client, 'get', '/api/users/picker')
+    assert status == 200 and result['has_more'], result
+    assert [user['id'] for user in result['users']] == expected[:DEFAULT_PICKER_LIMIT]
+    
+    # 与前端 getAllPickerUsers 相同：以本页最后一个ID作为 after_id，直到 has_more 为 false
+    ids, after_id = [], ''
+    while True:
+        status, result = request_json(client, 'get', f'/api/users/picker?limit=20&after_id={after_id}')
+        assert status == 200
+        ids.extend(user['id'] for user in result['users'])
+        if not result['has_more']:
+            break
+        after_id = result['users'][-1]['id']
+    assert ids == expected, ids
+    
+    last = db.session.get(User, expected[-1])
+    status, result = request_json(client, 'get', f'/api/users/picker?q={last.username}')
+    assert status == 200 and last.id in [user['id'] for user in result['users']], result
+    print(f"默认 {DEFAULT_PICKER_LIMIT} 个，翻页取到全部 {len(expected)} 个，搜索 {last.username} 命中")
+
+def check_rollups_and_rates(client, admin):
+    """工时日汇总随审批和费率变更更新，费率按生效日期区间取值"""
+    print("\n--- 工时日汇总与费率历史 ---")
+    rollups = DailyWorkRollup.query.order_by(DailyWorkRollup.user_id).all()
+    assert len(rollups) == ROW_COUNT
+    for i, rollup in enumerate(rollups):
+        assert (rollup.user_id, rollup.work_date) == (i + 2, date(2024, 1, 1) + timedelta(days=i))
+        assert (rollup.hours, rollup.record_count, rollup.cost) == (Decimal('8'), 1, Decimal(8 * (100 + i))), rollup
+    
+    # 用户10（时薪110）：待审核记录审批后计入日汇总
+    user = User.query.filter_by(username='user10').first()
+    project_id = TimeRecord.query.filter_by(user_id=user.id).first().project_id
+    record = TimeRecord(user_id=user.id, project_id=project_id, work_date=date(2024, 1, 3), start_time=time(9),
+                        end_time=time(17), hours=8, work_content='开发', work_type='development')
+    db.session.add(record)
+    db.session.commit()
+    assert DailyWorkRollup.query.filter_by(user_id=user.id, work_date=date(2024, 1, 3)).first() is None
+    status, _ = request_json(client, 'post', f'/api/time-records/{record.id}/approve', json={'action': 'approve'})
+    assert status == 200
+    rollup = DailyWorkRollup.query.filter_by(user_id=user.id, work_date=date(2024, 1, 3)).one()
+    assert (rollup.hours, rollup.record_count, rollup.cost) == (Decimal('8'), 1, Decimal('880')), rollup
+    
+    status, statistics = request_json(client, 'get', '/api/time-records/statistics')
+    assert status == 200 and statistics['total_hours'] == 8 * (ROW_COUNT + 1), statistics
+    print("审批后日汇总: 8小时 / 1条 / 880.00")
+    
+    # 时薪自 2024-01-05 起改为200：之前的工作日期仍按110计算
+    status, _ = request_json(client, 'put', f'/api/users/{user.id}',
+                             json={'hourly_rate': 200, 'rate_effective_from': '2024-01-05'})
+    assert status == 200
+    index = load_rate_index([user.id])
+    assert index.hourly_rate(user.id, date(2023, 12, 1)) == Decimal('110')
+    assert index.hourly_rate(user.id, date(2024, 1, 4)) == Decimal('110')
+    assert index.hourly_rate(user.id, date(2024, 1, 5)) == Decimal('200')
+    costs = dict(db.session.query(DailyWorkRollup.work_date, DailyWorkRollup.cost).filter_by(user_id=user.id))
+    assert costs == {date(2024, 1, 3): Decimal('880'), date(2024, 1, 11): Decimal('1600')}, costs
+    print("费率变更后日汇总: 2024-01-03 880.00, 2024-01-11 1600.00")
+    return user
+
+def check_bulk_calculation(client, user):
+    """批量成本计算的新增/更新/跳过计数及计算结果"""
+    print("\n--- 批量成本计算 ---")
+    body = {'start_date': '2024-01-01', 'end_date': '2024-03-31'}
+    status, result = request_json(client, 'post', '/api/costs/calculate/bulk', json=body)
+    assert status == 200
+    # 新审批的记录新增，费率变更的记录更新，其余与种子数据一致
+    assert (result['created'], result['updated'], result['skipped']) == (1, 1, ROW_COUNT - 1), result
+    calculations = {
+        row.calculation_date: (row.hourly_rate, row.total_cost)
+        for row in CostCalculation.query.filter_by(user_id=user.id)
+    }
+    assert calculations == {date(2024, 1, 3): (Decimal('110'), Decimal('880')),
+                            date(2024, 1, 11): (Decimal('200'), Decimal('1600'))}, calculations
+    
+    status, result = request_json(client, 'post', '/api/costs/calculate/bulk', json=body)
+    assert (result['created'], result['updated'], result['skipped']) == (0, 0, ROW_COUNT + 1), result
+    print(f"首次: 新增1 更新1 跳过{ROW_COUNT - 1}；重复计算: 跳过{ROW_COUNT + 1}")
+    
+    # 用户/项目筛选条件必须是整数ID列表
+    for bad in [{'user_ids': 5}, {'user_ids': '1,2'}, {'user_ids': [1, '2']}, {'project_ids': ['a']},
+                {'project_ids': [1.5]}, {'project_ids': [True]}, {'user_id': 'x'}, {'project_ids': {'id': 1}}]:
+        status, result = request_json(client, 'post', '/api/costs/calculate/bulk', json={**body, **bad})
+        assert status == 400, (bad, status, result)
+    status, result = request_json(client, 'post', '/api/costs/calculate/bulk',
+                                  json={**body, 'user_ids': [user.id], 'project_ids': [1, 2, 3, 4, 5, 6]})
+    assert status == 200 and result['skipped'] == 2, result
+    print("非整数列表的 user_ids/project_ids 返回400")
+
+def check_salary_allocation(client, admin):
+    """月薪按工时比例分摊，尾差按最大余数法补齐，合计恰好等于月薪"""
+    print("\n--- 月薪分摊 ---")
+    user = User(username='salaried', email='salaried@example.com', password_hash='x', name='月薪用户',
+                employee_id='S0001', cost_calculation_method='monthly', monthly_salary=Decimal('1000.00'))
+    db.session.add(user)
+    db.session.flush()
+    projects = Project.query.order_by(Project.id).limit(3).all()
+    # 工时 1:2:4，月薪 100000 分的理论份额为 14285.71、28571.43、57142.86
+    for day, (project, hours) in enumerate(zip(projects, (1, 2, 4)), 5):
+        db.session.add(TimeRecord(user_id=user.id, project_id=project.id, work_date=date(2024, 2, day),
+                                  start_time=time(9), end_time=time(9 + hours), hours=hours, work_content='开发',
+                                  work_type='development', status='approved', approved_by=admin.id))
+    db.session.commit()
+    
+    allocation = allocate_costs(date(2024, 2, 1), date(2024, 2, 29), user_ids=[user.id])
+    order = allocation.record_ids.argsort()
+    assert allocation.costs[order].tolist() == [14286, 28571, 57143], allocation.costs.tolist()
+    assert int(allocation.costs.sum()) == 100000 and allocation.monthly.all()
+    
+    status, result = request_json(client, 'post', '/api/costs/calculate/bulk',
+                                  json={'start_date': '2024-02-01', 'end_date': '2024-02-29', 'user_ids': [user.id]})
+    assert status == 200 and result['created'] == 3, result
+    total = db.session.query(db.func.sum(CostCalculation.total_cost)).filter_by(user_id=user.id).scalar()
+    assert total == Decimal('1000.00'), total
+    print("分摊结果: 142.86 + 285.71 + 571.43 = 1000.00")
+
+def check_report_statistics(client):
+    """报告统计的状态计数、按用户/按周分组和提交率"""
+    print("\n--- 报告统计 ---")
+    statuses = ('approved', 'rejected', 'pending')
+    reports = DailyReport.query.order_by(DailyReport.id).all()
+    expected_weeks = {}
+    for i, report in enumerate(reports):
+        report.status = statuses[i % 3]
+        week = expected_weeks.setdefault(str(report.report_date - timedelta(days=report.report_date.weekday())),
+                                         dict.fromkeys(('total', 'approved', 'pending', 'rejected'), 0))
+        week['total'] += 1
+        week[report.status] += 1
+    db.session.commit()
+    
+    status, result = request_json(client, 'get', '/api/reports/statistics?breakdown=user,week')
+    assert status == 200
+    daily = result['daily_reports']
+    third = ROW_COUNT // 3
+    assert (daily['total'], daily['approved'], daily['rejected'], daily['pending']) == (ROW_COUNT, third, third, third)
+    assert [(row['user_id'], row['total'], row[statuses[i % 3]]) for i, row in enumerate(daily['by_user'])] == \
+        [(i + 2, 1, 1) for i in range(ROW_COUNT)]
+    assert [dict(row) for row in daily['by_week']] == \
+        [dict(week_start=week, **counts) for week, counts in sorted(expected_weeks.items())], daily['by_week']
+    # 启用用户：管理员、种子用户和月薪用户，管理员和月薪用户没有日报
+    active_users = ROW_COUNT + 2
+    assert daily['submission'] == {'active_users': active_users, 'submitted_users': ROW_COUNT, 'missing_users': 2,
+                                   'rate': round(ROW_COUNT / active_users, 4)}, daily['submission']
+    weekly = result['weekly_reports']
+    assert (weekly['total'], weekly['pending'], len(weekly['by_week'])) == (ROW_COUNT, ROW_COUNT, len(expected_weeks))
+    
+    status, result = request_json(client, 'get', '/api/reports/statistics?user_id=3')
+    assert result['daily_reports']['rejected'] == 1 and result['daily_reports']['submission']['rate'] == 1
+    print(f"日报: 通过{third} 拒绝{third} 待审{third}，{len(expected_weeks)}周，提交率 {daily['submission']['rate']}")
+
+def check_report_job_dedupe(client, admin):
+    """进行中（心跳未超时）的相同报表任务被合并，心跳超时的任务被释放后重新生成"""
+    print("\n--- 报表任务合并 ---")
+    body = {'report_name': '一月报表', 'report_type': 'company', 'report_period': 'monthly',
+            'period_start': '2024-01-01', 'period_end': '2024-01-31'}
+    key = _request_key(body, admin.id)
+    job = CostReportJob(id='running', request_key=key, active_key=key, status='running', parameters='{}',
+                        requested_by=admin.id, created_at=datetime.utcnow() - timedelta(hours=2))
+    db.session.add(job)
+    db.session.commit()
+    
+    # 创建已超过两小时，但心跳仍在更新：不视为中断
+    status, result = request_json(client, 'post', '/api/costs/reports', json=body)
+    assert status == 202 and result['job']['id'] == 'running' and result['message'] == '相同的成本报表正在生成', result
+    
+    job.heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+    db.session.commit()
+    status, result = request_json(client, 'post', '/api/costs/reports', json=body)
+    assert status == 202 and result['job']['id'] != 'running' and result['job']['status'] == 'completed', result
+    db.session.refresh(job)
+    assert (job.status, job.active_key) == ('failed', None)
+    
+    report = db.session.get(CostReport, result['job']['report_id'])
+    expected = db.session.query(db.func.sum(CostCalculation.total_cost)).filter(
+        CostCalculation.calculation_date.between(date(2024, 1, 1), date(2024, 1, 31))).scalar()
+    assert report.total_cost == expected, (report.total_cost, expected)
+    # 同步执行时不启动线程池和心跳线程
+    threads = [thread.name for thread in threading.enumerate() if thread.name.startswith('cost-report')]
+    assert not threads, threads
+    print(f"合并进行中的任务，心跳超时后重新生成（总成本 {report.total_cost}），未启动后台线程")
+
+def test_computed_values():
+    """校验列表输出、游标分页、字段子集、Bearer 令牌、权限缓存失效、用户选择器翻页、成本分摊、费率历史、批量计算、工时日汇总、报告统计和报表任务合并的计算结果"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed_data()
+        
+        client = app.test_client()
+        status, _ = request_json(client, 'post', '/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+        assert status == 200
+        admin = User.query.filter_by(username='admin').first()
+        
+        check_list_serialization(client)
+        check_keyset_pagination(client)
+        check_sparse_fields(client)
+        check_bearer_tokens(app)
+        check_permission_cache(app, client)
+        check_user_picker(client)
+        user = check_rollups_and_rates(client, admin)
+        check_bulk_calculation(client, user)
+        check_salary_allocation(client, admin)
+        check_report_statistics(client)
+        check_report_job_dedupe(client, admin)
+        
+        db.session.remove()
+        db.drop_all()
+
+def main():
+    """主测试函数"""
+    print("研发成本统计系统 - 列表接口查询次数与计算结果测试")
+    print("=" * 50)
+
+    test_list_query_budgets()
+    test_computed_values()
+
+    print("\n=== 测试完成 ===")
+
+if __name__ == '__main__':
+    main()
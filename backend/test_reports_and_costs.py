@@ -5,6 +5,7 @@
 
 import requests
 import json
+import time
 
 BASE_URL = 'http://localhost:5001/api'
 
@@ -213,10 +214,23 @@ def test_cost_reports(token):
     
     response = requests.post(f'{BASE_URL}/costs/reports', headers=headers, json=report_data)
     print(f"响应状态: {response.status_code}")
-    if response.status_code == 201:
+    if response.status_code == 202:
         data = response.json()
-        print(f"成本报表生成成功: {data['message']}")
-        report_id = data['report']['id']
+        print(f"成本报表任务已提交: {data['message']}")
+        job_id = data['job']['id']
+        
+        # 轮询任务状态直到完成
+        for _ in range(30):
+            response = requests.get(f'{BASE_URL}/costs/reports/jobs/{job_id}', headers=headers)
+            job = response.json()['job']
+            if job['status'] in ('completed', 'failed'):
+                break
+            time.sleep(1)
+        print(f"任务状态: {job['status']} ({job['progress']}%)")
+        if job['status'] != 'completed':
+            print(f"成本报表生成失败: {job['message']}")
+            return None
+        report_id = job['report_id']
         
         # 3. 获取成本报表详情
         print(f"\n3. 获取成本报表详情 (ID: {report_id})...")
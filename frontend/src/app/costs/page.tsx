@@ -166,8 +166,7 @@ export default function CostsPage() {
 
   const fetchUsers = async () => {
     try {
-      const response = await userAPI.getUsers();
-      setUsers(response.data.users || response.data || []);
+      setUsers(await userAPI.getAllPickerUsers());
     } catch (error) {
       message.error('获取用户列表失败');
       setUsers([]);
@@ -252,15 +251,33 @@ export default function CostsPage() {
         period_end: values.period[1].format('YYYY-MM-DD'),
       };
       
-      await costAPI.generateCostReport(data);
-      message.success('报表生成成功');
+      const response = await costAPI.generateCostReport(data);
+      message.info('报表正在后台生成');
       setReportModalVisible(false);
-      fetchCostReports();
+      pollReportJob(response.data.job.id);
     } catch (error) {
       message.error('报表生成失败');
     }
   };
 
+  // 轮询报表生成任务，完成后刷新报表列表
+  const pollReportJob = async (jobId: string) => {
+    try {
+      const response = await costAPI.getCostReportJob(jobId);
+      const job = response.data.job;
+      if (job.status === 'completed') {
+        message.success('报表生成成功');
+        fetchCostReports();
+      } else if (job.status === 'failed') {
+        message.error('报表生成失败');
+      } else {
+        setTimeout(() => pollReportJob(jobId), 2000);
+      }
+    } catch (error) {
+      message.error('获取报表生成状态失败');
+    }
+  };
+
   const getStatusColor = (status: string) => {
     const colors: { [key: string]: string } = {
       'pending': 'orange',
@@ -771,10 +788,10 @@ export default function CostsPage() {
                     label="员工"
                     rules={[{ required: true, message: '请选择员工' }]}
                   >
-                    <Select placeholder="请选择员工">
+                    <Select placeholder="请选择员工" showSearch optionFilterProp="children">
                       {(users || []).map(user => (
                         <Option key={user.id} value={user.id}>
-                          {user.name} ({user.username})
+                          {user.name}{user.department ? ` (${user.department})` : ''}
                         </Option>
                       ))}
                     </Select>
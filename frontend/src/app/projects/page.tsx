@@ -96,8 +96,7 @@ export default function ProjectsPage() {
 
   const fetchUsers = async () => {
     try {
-      const response = await userAPI.getUsers();
-      setUsers(response.data.users || []);
+      setUsers(await userAPI.getAllPickerUsers());
     } catch (error) {
       message.error('获取用户列表失败');
     }
@@ -451,10 +450,10 @@ export default function ProjectsPage() {
                   label="项目经理"
                   rules={[{ required: true, message: '请选择项目经理' }]}
                 >
-                  <Select placeholder="请选择项目经理">
+                  <Select placeholder="请选择项目经理" showSearch optionFilterProp="children">
                     {users.map(user => (
                       <Option key={user.id} value={user.id}>
-                        {user.name} ({user.username})
+                        {user.name}{user.department ? ` (${user.department})` : ''}
                       </Option>
                     ))}
                   </Select>
@@ -549,7 +548,7 @@ export default function ProjectsPage() {
                       .filter(user => !members.some(m => m.user_id === user.id))
                       .map(user => (
                         <Option key={user.id} value={user.id}>
-                          {user.name} ({user.username})
+                          {user.name}{user.department ? ` (${user.department})` : ''}
                         </Option>
                       ))}
                   </Select>
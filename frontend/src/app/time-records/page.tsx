@@ -130,9 +130,9 @@ export default function TimeRecordsPage() {
 
   const fetchUsers = async () => {
     try {
-      const response = await userAPI.getUsers();
+      const users = await userAPI.getAllPickerUsers();
       // 这里可以设置用户列表，如果需要的话
-      console.log('Users loaded:', response.data.users?.length || 0);
+      console.log('Users loaded:', users.length);
     } catch (error) {
       message.error('获取用户列表失败');
     }
@@ -47,6 +47,7 @@ export default function UsersPage() {
   const [loading, setLoading] = useState(false);
   const [modalVisible, setModalVisible] = useState(false);
   const [editingUser, setEditingUser] = useState<User | null>(null);
+  const [pagination, setPagination] = useState({ current: 1, pageSize: 20, total: 0 });
   const [form] = Form.useForm();
 
   useEffect(() => {
@@ -57,11 +58,12 @@ export default function UsersPage() {
     }
   }, [isAuthenticated]);
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (page = pagination.current, pageSize = pagination.pageSize) => {
     setLoading(true);
     try {
-      const response = await userAPI.getUsers();
+      const response = await userAPI.getUsers({ page, per_page: pageSize });
       setUsers(response.data.users);
+      setPagination({ current: page, pageSize, total: response.data.total });
     } catch (error) {
       message.error('获取用户列表失败');
     } finally {
@@ -237,9 +239,13 @@ export default function UsersPage() {
             rowKey="id"
             loading={loading}
             pagination={{
+              current: pagination.current,
+              pageSize: pagination.pageSize,
+              total: pagination.total,
               showSizeChanger: true,
               showQuickJumper: true,
               showTotal: (total) => `共 ${total} 条记录`,
+              onChange: (page, pageSize) => fetchUsers(page, pageSize),
             }}
           />
         </Card>
@@ -44,7 +44,22 @@ export const authAPI = {
 
 // 用户管理API
 export const userAPI = {
-  getUsers: () => api.get('/users/'),
+  getUsers: (params?: any) => api.get('/users/', { params }),
+  getUserPicker: (params?: any) => api.get('/users/picker', { params }), // 下拉选择用户（精简字段，分页）
+  // 按 after_id 逐页读取用户选择器，直到 has_more 为 false，返回全部启用用户
+  getAllPickerUsers: async (params?: any) => {
+    const users: any[] = [];
+    let afterId: number | undefined;
+    for (;;) {
+      const response = await api.get('/users/picker', { params: { ...params, limit: 200, after_id: afterId } });
+      const page = response.data.users || [];
+      users.push(...page);
+      if (!response.data.has_more || page.length === 0) {
+        return users;
+      }
+      afterId = page[page.length - 1].id;
+    }
+  },
   getUser: (id: number) => api.get(`/users/${id}`),
   createUser: (data: any) => api.post('/users/', data),
   updateUser: (id: number, data: any) => api.put(`/users/${id}`, data),
@@ -76,7 +91,7 @@ export const projectAPI = {
     api.delete(`/projects/${projectId}/members/${userId}`),
   updateProjectStatus: (id: number, status: string) => 
     api.put(`/projects/${id}/status`, { status }),
-  getUsers: () => api.get('/users/'), // 用于选择项目经理和成员
+  getUsers: (params?: any) => api.get('/users/picker', { params }), // 用于选择项目经理和成员
 };
 
 // 工时记录API
@@ -117,6 +132,7 @@ export const reportAPI = {
 export const costAPI = {
   // 个人成本计算
   calculatePersonalCost: (data: any) => api.post('/costs/calculate', data),
+  bulkCalculatePersonalCost: (data: any) => api.post('/costs/calculate/bulk', data),
   getPersonalCalculations: () => api.get('/costs/calculations'),
   updatePersonalCalculation: (id: number, data: any) => api.put(`/costs/calculations/${id}`, data),
   deletePersonalCalculation: (id: number) => api.delete(`/costs/calculations/${id}`),
@@ -127,8 +143,11 @@ export const costAPI = {
   
   // 成本报表
   getCostReports: () => api.get('/costs/reports'),
-  createCostReport: (data: any) => api.post('/costs/reports', data),
-  getCostReport: (id: number) => api.get(`/costs/reports/${id}`),
+  // 提交后台生成任务，返回任务ID，通过 getCostReportJob 轮询
+  generateCostReport: (data: any) => api.post('/costs/reports', data),
+  getCostReportJob: (jobId: string) => api.get(`/costs/reports/jobs/${jobId}`),
+  // params.section/page/per_page 分页获取报表明细行，params.data=none 只获取报表信息
+  getCostReport: (id: number, params?: any) => api.get(`/costs/reports/${id}`, { params }),
   
   // 统计
   getStatistics: () => api.get('/costs/statistics'),